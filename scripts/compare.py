@@ -0,0 +1,104 @@
+"""Compare two saved benchmark runs and flag the metrics that regressed
+
+    python scripts/compare.py [baseline_run_id] [candidate_run_id]
+
+Without run ids the latest run is compared to the run before it with the same
+mode. Exits with 1 if any metric regressed.
+"""
+
+import json
+import os
+import sys
+
+import polars as pl
+
+from crypto_data_benchmark.results import (
+    CONFIDENCE,
+    NOISE_THRESHOLD,
+    RESULTS_DIR,
+    compare_runs,
+    load_runs,
+)
+
+NOISE_THRESHOLD = float(os.getenv("NOISE_THRESHOLD", NOISE_THRESHOLD))
+
+
+def pick_runs(runs: pl.DataFrame, run_ids: list[str]) -> tuple[str, str]:
+    """The baseline and candidate run ids, by default the latest two of one mode"""
+    if len(run_ids) == 2:
+        return run_ids[0], run_ids[1]
+    history = runs.select("run_id", "started_at", "mode").unique().sort("started_at")
+    candidate = run_ids[0] if run_ids else history["run_id"][-1]
+    run = history.filter(pl.col("run_id") == candidate).row(0, named=True)
+    earlier = history.filter(
+        (pl.col("mode") == run["mode"]) & (pl.col("started_at") < run["started_at"])
+    )
+    if earlier.height == 0:
+        raise SystemExit(f"No earlier {run['mode']} run to compare {candidate} to")
+    return earlier["run_id"][-1], candidate
+
+
+def describe_differences(baseline: pl.DataFrame, candidate: pl.DataFrame) -> str:
+    """Package versions, host, dataset and config that changed between the runs"""
+    lines = []
+    before = json.loads(baseline["versions"][0])
+    after = json.loads(candidate["versions"][0])
+    for package in sorted(before.keys() | after.keys()):
+        if before.get(package) != after.get(package):
+            lines.append(f"{package}: {before.get(package)} -> {after.get(package)}")
+    for column in ["commit", "dataset", "host", "config"]:
+        if baseline[column][0] != candidate[column][0]:
+            lines.append(f"{column}: {baseline[column][0]} -> {candidate[column][0]}")
+    return "\n".join(lines) or "Same versions, host, dataset and config"
+
+
+def format_comparison(comparison: pl.DataFrame) -> str:
+    pl.Config.set_tbl_hide_column_data_types(True)
+    pl.Config.set_tbl_hide_dataframe_shape(True)
+    pl.Config.set_tbl_rows(-1)
+    pl.Config.set_tbl_width_chars(200)
+
+    def percent(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(lambda x: f"{x:+.1%}", return_dtype=pl.String)
+
+    def number(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(lambda x: f"{x:,.4g}", return_dtype=pl.String)
+
+    df = comparison.select(
+        "case",
+        "metric",
+        number("baseline"),
+        number("candidate"),
+        percent("change"),
+        pl.format("[{}, {}]", percent("change_low"), percent("change_high")).alias(
+            f"{CONFIDENCE:.0%} interval"
+        ),
+        "status",
+    )
+    return str(df)
+
+
+if __name__ == "__main__":
+    runs = load_runs(RESULTS_DIR)
+    baseline_id, candidate_id = pick_runs(runs, sys.argv[1:])
+    baseline = runs.filter(pl.col("run_id") == baseline_id)
+    candidate = runs.filter(pl.col("run_id") == candidate_id)
+
+    comparison = compare_runs(baseline, candidate, NOISE_THRESHOLD)
+    trials = f"{baseline['trial'].n_unique()} vs {candidate['trial'].n_unique()} trials"
+    print(f"{baseline_id} -> {candidate_id}, {trials}")
+    print(describe_differences(baseline, candidate))
+    if min(baseline["trial"].n_unique(), candidate["trial"].n_unique()) < 2:
+        print(
+            "A single trial has no interval, its changes are never flagged, "
+            "run with TRIALS=n to separate noise"
+        )
+    print(
+        f"Flagged when the whole interval is beyond {NOISE_THRESHOLD:.0%}, "
+        "negative is faster or smaller, except for throughput and recall"
+    )
+    print(format_comparison(comparison))
+    regressions = comparison.filter(pl.col("status") == "regression").height
+    if regressions:
+        print(f"{regressions} metrics regressed")
+        sys.exit(1)
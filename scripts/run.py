@@ -1,4 +1,7 @@
+import functools
+import math
 import os
+import pathlib
 import re
 import subprocess
 import sys
@@ -6,40 +9,167 @@ import sys
 import polars as pl
 from humanize import naturalsize, precisedelta
 
-from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
-from crypto_data_benchmark.dbs.clickhouse_provider import ClickHouseProvider
-from crypto_data_benchmark.dbs.deltalake_provider import DeltaLakeProvider
-from crypto_data_benchmark.dbs.duckdb_provider import DuckDBProvider
-from crypto_data_benchmark.dbs.lancedb_provider import LanceDBProvider
-from crypto_data_benchmark.dbs.parquet_provider import ParquetProvider
-from crypto_data_benchmark.dbs.sqlite_provider import SQLiteProvider
-from crypto_data_benchmark.scalene_profiler import profile
+from crypto_data_benchmark.data.arrow_ipc import read_ipc
+from crypto_data_benchmark.data.normalize import normalize
+from crypto_data_benchmark.data.synthetic import synthetic_transfers_path
+from crypto_data_benchmark.data.usdt_transfers import (
+    scaled_usdt_transfers_path,
+    usdt_transfer_batches,
+    usdt_transfers,
+)
+from crypto_data_benchmark.dbs.registry import (
+    get_name,
+    installed_providers,
+    load_provider,
+)
+from crypto_data_benchmark.matrix import DEFAULT_CONFIG
+from crypto_data_benchmark.results import dataset_fingerprint, save_run
+from crypto_data_benchmark.workloads.appends import benchmark_appends
+from crypto_data_benchmark.workloads.block_scan import (
+    SCAN_RANGES,
+    benchmark_scans,
+    sample_block_ranges,
+)
+from crypto_data_benchmark.workloads.isolation import run_isolated
+from crypto_data_benchmark.workloads.load_test import benchmark_load
+from crypto_data_benchmark.workloads.memory_budget import (
+    HEAVY_QUERIES,
+    benchmark_memory_budgets,
+)
+from crypto_data_benchmark.workloads.parquet_matrix import benchmark_parquet_matrix
+from crypto_data_benchmark.workloads.point_lookup import (
+    benchmark_lookups,
+    sample_tx_hashes,
+)
+from crypto_data_benchmark.workloads.queries import QUERIES
+from crypto_data_benchmark.workloads.reorgs import REORG_DEPTH, benchmark_reorgs
+from crypto_data_benchmark.workloads.similarity import (
+    NEIGHBORS,
+    NumpyVectors,
+    address_features,
+    benchmark_vector_search,
+    ivf_pq_configs,
+    lance_search_grid,
+    sample_queries,
+)
+from crypto_data_benchmark.workloads.steps import (
+    BENCHMARK_STEPS,
+    LOOKUP_SAMPLES,
+    UNINDEXED_LOOKUP_SAMPLES,
+    profile,
+)
+from crypto_data_benchmark.workloads.versions import benchmark_versions
 
+SCALE = DEFAULT_CONFIG["scales"][-1]
+# shift every copy of the dataset to new blocks and hashes instead of repeating it
+DISTINCT_REPLICAS = bool(os.getenv("DISTINCT_REPLICAS"))
+# generate this many synthetic transfers instead of scaling the downloaded window
+SYNTHETIC_ROWS = int(os.getenv("SYNTHETIC_ROWS", "0"))
+# decimal or limbs, also benchmark the normalized schema next to the raw one
+NORMALIZE = os.getenv("NORMALIZE")
+# rss, tracemalloc, arrow or scalene, see crypto_data_benchmark.profilers
+PROFILER = os.getenv("PROFILER", "rss")
+# repeat the provider comparison, compare.py needs several trials for its intervals
+TRIALS = int(os.getenv("TRIALS", "1"))
+# environment variables that select and configure a run, saved with its results
+CONFIG_VARIABLES = [
+    "DISTINCT_REPLICAS",
+    "SYNTHETIC_ROWS",
+    "NORMALIZE",
+    "PROFILER",
+    "TRIALS",
+    "PARQUET_MATRIX",
+    "APPEND_BLOCKS",
+    "VERSIONS",
+    "REORGS",
+    "REORG_DEPTH",
+    "CONCURRENCY",
+    "PARTITIONS",
+    "ISOLATE",
+    "SIMILARITY",
+    "BATCH_SIZE",
+    "MEMORY_BUDGETS",
+]
+# seconds every concurrency level of the load test runs for
+LOAD_TEST_DURATION = 10.0
 
-def get_name_from_class(cls: type) -> str:
-    """Get the name of the class without the module name and the Provider suffix"""
-    return cls.__name__.lower().replace("provider", "")
+# hive partition counts swept in partitioned mode, by block_number bucket
+PARTITION_COUNTS = [1, 10, 100, 1_000]
+PARTITIONED_PROVIDERS = ["parquet", "deltalake"]
 
 
-def run_benchmarks(data: pl.DataFrame):
-    dbs = [
-        ParquetProvider(),
-        LanceDBProvider(),
-        DeltaLakeProvider(),
-        DuckDBProvider(),
-        ClickHouseProvider(),
-        SQLiteProvider(),
-    ]
+@functools.cache
+def benchmark_provider_classes() -> list:
+    """Providers of the default matrix, their engines are only imported once a
+    run mode needs them and the ones that are not installed are skipped"""
+    return installed_providers(DEFAULT_CONFIG["providers"])
 
+
+def dataset_path() -> pathlib.Path:
+    """Arrow IPC file of the configured dataset, written on first use"""
+    if SYNTHETIC_ROWS:
+        return synthetic_transfers_path(SYNTHETIC_ROWS)
+    return scaled_usdt_transfers_path(SCALE, DISTINCT_REPLICAS)
+
+
+def benchmark_providers():
+    # every provider runs once with the natural order and once sorted by block_number
+    providers = benchmark_provider_classes()
+    dbs = [provider() for provider in providers]
+    dbs += [provider(sorted_by_block=True) for provider in providers]
+    return dbs
+
+
+def run_benchmarks(data: pl.DataFrame, suffix: str = ""):
     results = []
-    for db in dbs:
+    for db in benchmark_providers():
         db.setup()
-        name = get_name_from_class(db.__class__)
+        name = get_name(db) + suffix
         print(f"Benchmarking {name}")
-        if name == "clickhouse":
-            # there is a bug in the Python chdb engine with large_binary columns so we use strings instead
-            data = data.evm.binary_to_hex()
-        metrics = profile(db.add, data)
+        metrics = {"name": name}
+        for step in BENCHMARK_STEPS:
+            metrics.update(step(db, data))
+        results.append(metrics)
+        db.teardown()
+
+    return results
+
+
+def run_isolated_benchmarks(data_path: pathlib.Path, cold: bool = False):
+    """Run every step of every provider in a fresh interpreter
+
+    The children memory map the data from the Arrow IPC file, the values are
+    shared and only the views of binary columns are private to each process,
+    see read_ipc. With cold the
+    provider's files are dropped from the page cache before every step that
+    only reads.
+    """
+    results = []
+    for db in benchmark_providers():
+        name = get_name(db) + (" (cold)" if cold else "")
+        print(f"Benchmarking {name} in isolated processes")
+        metrics = {"name": name}
+        for i, step in enumerate(BENCHMARK_STEPS):
+            step_metrics, db = run_isolated(
+                step, db, data_path, setup=i == 0, cold=cold
+            )
+            metrics.update(step_metrics)
+        results.append(metrics)
+        db.teardown()
+
+    return results
+
+
+def run_streaming_benchmarks(scale: int, batch_size: int):
+    """Ingest the dataset as a stream of record batches so memory is bounded by batch_size"""
+    results = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        db.setup()
+        name = get_name(db)
+        print(f"Benchmarking {name} with batches of {batch_size} rows")
+        batches = usdt_transfer_batches(scale, batch_size)
+        metrics = profile(db.add_batches, batches)
         metrics["name"] = name
         metrics["disk_usage"] = db.disk_usage()
         results.append(metrics)
@@ -48,10 +178,178 @@ def run_benchmarks(data: pl.DataFrame):
     return results
 
 
-def format_results(results: list[dict], data: pl.DataFrame) -> str:
+def run_partition_benchmarks(
+    data: pl.DataFrame, partition_counts: list[int] = PARTITION_COUNTS
+):
+    """Write partitioned datasets and measure ingestion and queries against the partition count"""
+    block_span = data["block_number"].max() - data["block_number"].min() + 1
+    configs = [("block", math.ceil(block_span / count)) for count in partition_counts]
+    configs.append(("address", 1))
+    tx_hashes = sample_tx_hashes(data, UNINDEXED_LOOKUP_SAMPLES)
+
+    results = []
+    for provider in installed_providers(PARTITIONED_PROVIDERS):
+        for partition_by, bucket_size in configs:
+            db = provider(partition_by=partition_by, bucket_size=bucket_size)
+            db.setup()
+            name = f"{get_name(db)} by {partition_by}"
+            print(f"Benchmarking {name} with buckets of {bucket_size} blocks")
+            metrics = profile(db.add, data)
+            metrics["name"] = name
+            metrics["disk_usage"] = db.disk_usage()
+            files = list(db.data_dir.rglob("*.parquet"))
+            metrics["partitions"] = len({path.parent for path in files})
+            metrics["files"] = len(files)
+            metrics.update(benchmark_scans(db, data))
+            metrics.update(benchmark_lookups(db, tx_hashes, "lookup"))
+            results.append(metrics)
+            db.teardown()
+
+    return results
+
+
+def run_append_benchmarks(data: pl.DataFrame, blocks: int):
+    """Append one block at a time through every provider, then compact"""
+    results = []
+    growth = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        db.setup()
+        name = get_name(db)
+        print(f"Appending {blocks} blocks to {name}")
+        metrics, samples = benchmark_appends(db, data, blocks)
+        metrics["name"] = name
+        results.append(metrics)
+        growth += [{"name": name, **sample} for sample in samples]
+        db.teardown()
+
+    return results, growth
+
+
+def run_version_benchmarks(data: pl.DataFrame, blocks: int):
+    """Snapshot after every appended block on the providers with versioned storage"""
+    results = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        if not hasattr(db, "snapshot"):
+            continue
+        db.setup()
+        name = get_name(db)
+        print(f"Snapshotting {blocks} appended blocks in {name}")
+        metrics = benchmark_versions(db, data, blocks)
+        metrics["name"] = name
+        results.append(metrics)
+        db.teardown()
+
+    return results
+
+
+def run_reorg_benchmarks(data: pl.DataFrame, reorgs: int, depth: int):
+    """Replace and delete block ranges in every provider, then compact"""
+    results = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        db.setup()
+        name = get_name(db)
+        print(f"Running {reorgs} reorgs of {depth} blocks in {name}")
+        metrics = benchmark_reorgs(db, data, reorgs, depth)
+        metrics["name"] = name
+        results.append(metrics)
+        db.teardown()
+
+    return results
+
+
+def run_memory_budget_benchmarks(
+    data: pl.DataFrame, data_path: pathlib.Path, budgets: list[int]
+):
+    """Ingest and aggregate in every provider under decreasing memory budgets"""
+    results = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        name = get_name(db)
+        print(f"Running {name} under {', '.join(f'{b} MiB' for b in budgets)}")
+        for metrics in benchmark_memory_budgets(db, data, data_path, budgets):
+            metrics["name"] = name
+            results.append(metrics)
+
+    return results
+
+
+def run_load_tests(data: pl.DataFrame, concurrency_levels: list[int]):
+    """Hit every indexed provider with concurrent thread and process clients"""
+    tx_hashes = sample_tx_hashes(data, LOOKUP_SAMPLES)
+    block_ranges = sample_block_ranges(data, SCAN_RANGES["narrow"], LOOKUP_SAMPLES)
+
+    results = []
+    for provider in benchmark_provider_classes():
+        db = provider()
+        db.setup()
+        name = get_name(db)
+        print(f"Load testing {name}")
+        db.add(data)
+        db.build_index()
+        for metrics in benchmark_load(
+            db, tx_hashes, block_ranges, concurrency_levels, LOAD_TEST_DURATION
+        ):
+            metrics["name"] = name
+            results.append(metrics)
+        db.teardown()
+
+    return results
+
+
+def run_similarity_benchmarks(data: pl.DataFrame):
+    """Nearest neighbor search over address feature vectors, exact and indexed"""
+    addresses, vectors = address_features(data)
+    queries = sample_queries(addresses)
+    print(f"Searching {len(addresses)} address vectors of {vectors.shape[1]} floats")
+
+    def named(name: str, rows: list[dict]) -> list[dict]:
+        return [{"name": name, **row} for row in rows]
+
+    results = named(
+        "numpy (exact)",
+        benchmark_vector_search(NumpyVectors(), addresses, vectors, queries),
+    )
+
+    db = load_provider("lancedb")()
+    db.setup()
+    for index_params in ivf_pq_configs(len(addresses), vectors.shape[1]):
+        print(f"Building LanceDB IVF-PQ index {index_params}")
+        results += named(
+            "lancedb (ivf_pq)",
+            benchmark_vector_search(
+                db, addresses, vectors, queries, index_params, lance_search_grid()
+            ),
+        )
+    db.teardown()
+
+    import duckdb
+
+    db = load_provider("duckdb")()
+    db.setup()
+    results += named(
+        "duckdb (exact)", benchmark_vector_search(db, addresses, vectors, queries)
+    )
+    try:
+        results += named(
+            "duckdb (hnsw)",
+            benchmark_vector_search(db, addresses, vectors, queries, {}),
+        )
+    except duckdb.Error as e:
+        # the vss extension is downloaded on first use
+        print(f"Skipping DuckDB HNSW, vss is not available: {e}")
+    db.teardown()
+
+    return results
+
+
+def format_results(results: list[dict], data_size: int) -> str:
     pl.Config.set_tbl_hide_column_data_types(True)
     pl.Config.set_tbl_hide_dataframe_shape(True)
     pl.Config.set_fmt_str_lengths(1000)
+    pl.Config.set_tbl_rows(-1)
     df = pl.DataFrame(results).sort("ingestion_time")
     # now add relative to the min of the ingestion time and the disk usage
     min_ingestion_time = df["ingestion_time"].min()
@@ -104,26 +402,510 @@ def format_results(results: list[dict], data: pl.DataFrame) -> str:
                     pl.col("ingestion_time_relative"),
                 ]
             ).alias("ingestion time"),
+            # the scalene backend doesn't measure CPU time
+            *(
+                [
+                    pl.col("cpu_time")
+                    .map_elements(
+                        lambda x: f"{precisedelta(x)}", return_dtype=pl.String
+                    )
+                    .alias("cpu time")
+                ]
+                if "cpu_time" in df.columns
+                else []
+            ),
+        ]
+    )
+    output = f"Test data size: {naturalsize(data_size)}\n\n"
+    output += str(df)
+    return output
+
+
+def format_lookup_results(results: list[dict]) -> str:
+    df = pl.DataFrame(results).sort("indexed_lookup_p50")
+
+    def latency(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String
+        )
+
+    df = df.select(
+        [
+            "name",
+            latency("lookup_p50").alias("lookup p50"),
+            latency("lookup_p99").alias("lookup p99"),
+            pl.col("index_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("index time"),
+            pl.col("index_disk_change")
+            .map_elements(
+                lambda x: f"{'+' if x >= 0 else ''}{naturalsize(x, gnu=True)}",
+                return_dtype=pl.String,
+            )
+            .alias("disk change"),
+            latency("indexed_lookup_p50").alias("indexed lookup p50"),
+            latency("indexed_lookup_p99").alias("indexed lookup p99"),
+        ]
+    )
+    output = f"Point lookups by transaction hash ({LOOKUP_SAMPLES} random hashes)\n"
+    output += str(df)
+    return output
+
+
+def format_scan_results(results: list[dict]) -> str:
+    df = pl.DataFrame(results).sort("scan_medium_rows_per_s", descending=True)
+    columns = ["name"]
+    for name in SCAN_RANGES:
+        columns += [
+            pl.col(f"scan_{name}_rows_per_s")
+            .map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+            .alias(f"{name} rows/s"),
+            pl.col(f"scan_{name}_bytes_read")
+            .map_elements(lambda x: f"{naturalsize(x)}", return_dtype=pl.String)
+            .alias(f"{name} read/scan"),
+        ]
+    ranges = ", ".join(f"{name} {fraction:.1%}" for name, fraction in SCAN_RANGES.items())
+    output = f"Block range scans ({ranges} of all blocks)\n"
+    output += str(df.select(columns))
+    return output
+
+
+def format_query_results(results: list[dict]) -> str:
+    df = pl.DataFrame(results)
+    columns = ["name"]
+    for query in QUERIES:
+        prefix = f"query_{query.name}"
+        # cold / warm latency, marked when the result differs from the reference
+        columns.append(
+            pl.struct(f"{prefix}_cold", f"{prefix}_warm", f"{prefix}_matches")
+            .map_elements(
+                lambda x, prefix=prefix: f"{x[f'{prefix}_cold'] * 1000:,.1f} / "
+                f"{x[f'{prefix}_warm'] * 1000:,.1f} ms"
+                + ("" if x[f"{prefix}_matches"] else " (wrong)"),
+                return_dtype=pl.String,
+            )
+            .alias(query.name)
+        )
+    output = "Analytics queries, cold / warm latency\n"
+    output += str(df.select(columns))
+    return output
+
+
+def format_parquet_matrix_results(results: list[dict], data_size: int) -> str:
+    set_wide_table_format()
+    df = pl.DataFrame(results).sort("disk_usage")
+    df = df.select(
+        [
+            pl.concat_str(
+                [
+                    pl.col("compression"),
+                    pl.col("compression_level")
+                    .cast(pl.String)
+                    .map_elements(lambda x: f"-{x}", return_dtype=pl.String)
+                    .fill_null(""),
+                ]
+            ).alias("codec"),
+            pl.col("row_group_size")
+            .map_elements(lambda x: f"{x:,}", return_dtype=pl.String)
+            .alias("row group"),
+            pl.col("statistics").alias("stats"),
+            pl.col("dictionary").alias("dict"),
+            pl.when(pl.col("use_pyarrow"))
+            .then(pl.lit("pyarrow"))
+            .otherwise(pl.lit("polars"))
+            .alias("writer"),
+            pl.col("disk_usage")
+            .map_elements(
+                lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+            )
+            .alias("disk usage"),
+            pl.col("write_mb_per_s")
+            .map_elements(lambda x: f"{x:,.0f} MB/s", return_dtype=pl.String)
+            .alias("write"),
+            *[
+                pl.col(f"scan_{name}_rows_per_s")
+                .map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+                .alias(f"{name} rows/s")
+                for name in SCAN_RANGES
+            ],
+        ]
+    )
+    output = f"Parquet write options, test data size: {naturalsize(data_size)}\n"
+    output += str(df)
+    return output
+
+
+def set_wide_table_format() -> None:
+    """Print every row and column of the wide sweep tables"""
+    pl.Config.set_tbl_hide_column_data_types(True)
+    pl.Config.set_tbl_hide_dataframe_shape(True)
+    pl.Config.set_tbl_rows(-1)
+    pl.Config.set_tbl_cols(-1)
+    pl.Config.set_tbl_width_chars(200)
+
+
+def format_append_results(results: list[dict]) -> str:
+    set_wide_table_format()
+
+    def size(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+        )
+
+    def rows_per_s(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+
+    df = pl.DataFrame(results).sort("append_p50")
+    df = df.select(
+        [
+            "name",
+            pl.col("append_p50")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("append p50"),
+            pl.col("append_p99")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("append p99"),
+            pl.col("write_amplification")
+            .map_elements(lambda x: f"{x:,.1f}x", return_dtype=pl.String)
+            .alias("write amp"),
+            pl.concat_str(
+                [pl.col("files"), pl.lit(" -> "), pl.col("compacted_files")]
+            ).alias("files"),
+            pl.concat_str(
+                [size("disk_usage"), pl.lit(" -> "), size("compacted_disk_usage")]
+            ).alias("disk usage"),
+            pl.col("compact_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("compact time"),
+            pl.concat_str(
+                [
+                    rows_per_s("scan_rows_per_s"),
+                    pl.lit(" -> "),
+                    rows_per_s("compacted_scan_rows_per_s"),
+                ]
+            ).alias("scan rows/s"),
+        ]
+    )
+    appends = results[0]["appends"]
+    output = f"One block per append ({appends} appends), before -> after compaction\n"
+    output += str(df)
+    return output
+
+
+def format_append_growth(growth: list[dict]) -> str:
+    set_wide_table_format()
+    df = pl.DataFrame(growth).select(
+        [
+            "name",
+            "appends",
+            "files",
+            pl.col("disk_usage")
+            .map_elements(
+                lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+            )
+            .alias("disk usage"),
+            pl.col("write_amplification")
+            .map_elements(lambda x: f"{x:,.1f}x", return_dtype=pl.String)
+            .alias("write amp"),
+            pl.col("append_p50")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("append p50"),
+        ]
+    )
+    output = "Growth over the appends\n"
+    output += str(df)
+    return output
+
+
+def format_memory_budget_results(results: list[dict]) -> str:
+    set_wide_table_format()
+
+    def size(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+        )
+
+    def duration(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{x:.2f} s", return_dtype=pl.String
+        )
+
+    queries = [f"query_{name}" for name in HEAVY_QUERIES]
+    columns = ["ingestion_time", "ingest_spill"]
+    columns += [f"{query}_time" for query in queries]
+    columns += [f"{query}_spill" for query in queries]
+    # a budget that crashed or failed early has none of the later metrics
+    df = pl.DataFrame(results, infer_schema_length=None)
+    df = df.with_columns(
+        pl.lit(None, pl.Float64).alias(column)
+        for column in columns
+        if column not in df.columns
+    )
+    df = df.with_columns(
+        work_time=pl.sum_horizontal(
+            "ingestion_time", *(f"{query}_time" for query in queries)
+        ),
+        spill=pl.sum_horizontal(
+            "ingest_spill", *(f"{query}_spill" for query in queries)
+        ),
+        status=pl.when(pl.col("failed_step").is_null())
+        .then(pl.lit("ok"))
+        .otherwise(pl.format("{} failed: {}", "failed_step", "error")),
+    )
+
+    output = "Ingestion and heavy aggregations under a memory budget\n\n"
+    output += str(
+        df.sort("budget", "name", descending=[True, False]).select(
+            "name",
+            pl.format("{} MiB", "budget").alias("budget"),
+            duration("ingestion_time").alias("ingestion"),
+            *(
+                duration(f"query_{name}_time").alias(name.replace("_", " "))
+                for name in HEAVY_QUERIES
+            ),
+            size("spill").alias("spilled"),
+            "limit",
+            "status",
+        )
+    )
+    fastest = (
+        df.filter(pl.col("failed_step").is_null())
+        .sort("work_time")
+        .group_by("budget", maintain_order=True)
+        .first()
+        .sort("budget", descending=True)
+    )
+    output += "\n\nFastest provider that finished under each budget\n\n"
+    output += str(
+        fastest.select(
+            pl.format("{} MiB", "budget").alias("budget"),
+            "name",
+            duration("work_time").alias("time"),
+        )
+    )
+    return output
+
+
+def format_version_results(results: list[dict]) -> str:
+    set_wide_table_format()
+
+    def size(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+        )
+
+    df = pl.DataFrame(results).select(
+        [
+            "name",
+            "snapshots",
+            pl.col("snapshot_p50")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("snapshot p50"),
+            pl.col("snapshot_p99")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("snapshot p99"),
+            pl.concat_str(
+                [size("versioned_bytes"), pl.lit(" -> "), size("pruned_bytes")]
+            ).alias("stored, versions kept -> pruned"),
+            pl.col("prune_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("prune time"),
+            pl.col("snapshot_read_time")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("first snapshot read"),
+            pl.col("snapshot_read_matches")
+            .map_elements(lambda x: "ok" if x else "wrong", return_dtype=pl.String)
+            .alias("time travel"),
         ]
     )
-    output = f"Test data size: {naturalsize(data.estimated_size())}\n"
+    output = "A snapshot after every appended block\n"
     output += str(df)
     return output
 
 
+def format_reorg_results(results: list[dict]) -> str:
+    set_wide_table_format()
+
+    def size(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+        )
+
+    def latency(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String
+        )
+
+    def rows_per_s(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+
+    df = pl.DataFrame(results).sort("replace_p50")
+    df = df.select(
+        [
+            "name",
+            latency("replace_p50").alias("replace p50"),
+            latency("replace_p99").alias("replace p99"),
+            latency("delete_p50").alias("delete p50"),
+            pl.concat_str(
+                [
+                    pl.col("files"),
+                    pl.lit(" -> "),
+                    pl.col("reorged_files"),
+                    pl.lit(" -> "),
+                    pl.col("compacted_files"),
+                ]
+            ).alias("files"),
+            pl.concat_str(
+                [
+                    size("disk_usage"),
+                    pl.lit(" -> "),
+                    size("reorged_disk_usage"),
+                    pl.lit(" -> "),
+                    size("compacted_disk_usage"),
+                ]
+            ).alias("disk usage"),
+            pl.concat_str(
+                [
+                    rows_per_s("scan_rows_per_s"),
+                    pl.lit(" -> "),
+                    rows_per_s("reorged_scan_rows_per_s"),
+                    pl.lit(" -> "),
+                    rows_per_s("compacted_scan_rows_per_s"),
+                ]
+            ).alias("scan rows/s"),
+            pl.col("compact_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("compact time"),
+            pl.col("reorg_matches")
+            .map_elements(lambda x: "ok" if x else "wrong", return_dtype=pl.String)
+            .alias("result"),
+        ]
+    )
+    reorgs, depth = results[0]["reorgs"], results[0]["depth"]
+    output = (
+        f"{reorgs} reorgs of {depth} blocks, half replaced and half deleted, "
+        "before -> after the reorgs -> after compaction\n"
+    )
+    output += str(df)
+    return output
+
+
+def format_load_results(results: list[dict]) -> str:
+    set_wide_table_format()
+
+    def latency(column: str) -> pl.Expr:
+        return pl.col(column).map_elements(
+            lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String
+        )
+
+    df = pl.DataFrame(results).select(
+        [
+            "name",
+            "mode",
+            "clients",
+            pl.col("ops_per_s")
+            .map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+            .alias("ops/s"),
+            latency("lookup_p50").alias("lookup p50"),
+            latency("lookup_p99").alias("lookup p99"),
+            latency("scan_p50").alias("scan p50"),
+            latency("scan_p99").alias("scan p99"),
+        ]
+    )
+    output = f"Concurrent clients ({LOAD_TEST_DURATION:.0f}s per level)\n"
+    output += str(df)
+    return output
+
+
+def format_partition_results(results: list[dict]) -> str:
+    set_wide_table_format()
+    df = pl.DataFrame(results).select(
+        [
+            "name",
+            "partitions",
+            "files",
+            pl.col("ingestion_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("ingestion time"),
+            pl.col("disk_usage")
+            .map_elements(
+                lambda x: f"{naturalsize(x, gnu=True)}", return_dtype=pl.String
+            )
+            .alias("disk usage"),
+            *[
+                pl.col(f"scan_{name}_rows_per_s")
+                .map_elements(lambda x: f"{x:,.0f}", return_dtype=pl.String)
+                .alias(f"{name} rows/s")
+                for name in SCAN_RANGES
+            ],
+            pl.col("lookup_p50")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("lookup p50"),
+        ]
+    )
+    output = "Partitioned datasets\n"
+    output += str(df)
+    return output
+
+
+def format_similarity_results(results: list[dict]) -> str:
+    set_wide_table_format()
+    df = pl.DataFrame(results).select(
+        [
+            "name",
+            "index",
+            "search",
+            pl.col("build_time")
+            .map_elements(lambda x: f"{precisedelta(x)}", return_dtype=pl.String)
+            .alias("build time"),
+            pl.col("recall")
+            .map_elements(lambda x: f"{x:.3f}", return_dtype=pl.String)
+            .alias(f"recall@{NEIGHBORS}"),
+            pl.col("search_p50")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("search p50"),
+            pl.col("search_p99")
+            .map_elements(lambda x: f"{x * 1000:,.2f} ms", return_dtype=pl.String)
+            .alias("search p99"),
+        ]
+    )
+    output = "Similar addresses, nearest neighbors of the transfer behavior vectors\n"
+    output += str(df)
+    return output
+
+
+def save(
+    mode: str,
+    trials: list[list[dict]],
+    data: pl.DataFrame,
+    keys: tuple[str, ...] = ("name",),
+):
+    """Store the raw metrics of every trial with the run's context"""
+    config = {"SCALE": SCALE}
+    config.update(
+        {name: os.environ[name] for name in CONFIG_VARIABLES if name in os.environ}
+    )
+    path = save_run(mode, trials, keys, dataset_fingerprint(data), config)
+    print(f"Saved the results to {path}")
+
+
 def update_readme(output: str):
     with open("README.md", "r") as file:
         content = file.read()
 
-    pattern = r"\nData size:.*┘\n"
-    updated_content = re.sub(pattern, output, content, flags=re.DOTALL)
+    # the results table runs from the test data line to the next section
+    pattern = r"\nTest data.*?\n(?=\n## )"
+    updated_content = re.sub(
+        pattern, lambda _: f"\n{output}\n", content, flags=re.DOTALL
+    )
 
     with open("README.md", "w") as file:
         file.write(updated_content)
 
 
 if __name__ == "__main__":
-    if not os.getenv("SCALE_PROFILING"):
+    if PROFILER == "scalene" and not os.getenv("SCALE_PROFILING"):
+        # the scalene backend only works under the scalene launcher
         subprocess.run(
             [
                 "scalene",
@@ -132,9 +914,105 @@ if __name__ == "__main__":
             ],
             env={"SCALE_PROFILING": "1", **os.environ},
         )
+    elif os.getenv("PARQUET_MATRIX"):
+        # sweep the Parquet write options instead of comparing providers
+        data = read_ipc(dataset_path())
+        results = benchmark_parquet_matrix(data)
+        save(
+            "parquet_matrix",
+            [results],
+            data,
+            (
+                "compression",
+                "compression_level",
+                "row_group_size",
+                "statistics",
+                "dictionary",
+                "use_pyarrow",
+            ),
+        )
+        print(format_parquet_matrix_results(results, data.estimated_size()))
+    elif os.getenv("APPEND_BLOCKS"):
+        # live ingestion, scaled copies would repeat the same blocks
+        data = usdt_transfers()
+        results, growth = run_append_benchmarks(data, int(os.environ["APPEND_BLOCKS"]))
+        save("appends", [results], data)
+        save("append_growth", [growth], data, ("name", "appends"))
+        print(format_append_results(results))
+        print(format_append_growth(growth))
+    elif os.getenv("VERSIONS"):
+        # number of appended blocks, each followed by a snapshot
+        data = usdt_transfers()
+        results = run_version_benchmarks(data, int(os.environ["VERSIONS"]))
+        save("versions", [results], data)
+        print(format_version_results(results))
+    elif os.getenv("REORGS"):
+        # number of block ranges replaced or deleted, REORG_DEPTH blocks each
+        depth = int(os.getenv("REORG_DEPTH", REORG_DEPTH))
+        reorgs = int(os.environ["REORGS"])
+        data = usdt_transfers()
+        results = run_reorg_benchmarks(data, reorgs, depth)
+        save("reorgs", [results], data)
+        print(format_reorg_results(results))
+    elif os.getenv("MEMORY_BUDGETS"):
+        # comma separated budgets in MiB, e.g. MEMORY_BUDGETS=4096,2048,1024,512
+        budgets = [int(budget) for budget in os.environ["MEMORY_BUDGETS"].split(",")]
+        data_path = dataset_path()
+        data = read_ipc(data_path)
+        results = run_memory_budget_benchmarks(data, data_path, budgets)
+        save("memory_budgets", [results], data, ("name", "budget"))
+        print(format_memory_budget_results(results))
+    elif os.getenv("CONCURRENCY"):
+        # comma separated client counts, e.g. CONCURRENCY=1,2,4,8
+        levels = [int(level) for level in os.environ["CONCURRENCY"].split(",")]
+        data = read_ipc(dataset_path())
+        results = run_load_tests(data, levels)
+        save("load", [results], data, ("name", "mode", "clients"))
+        print(format_load_results(results))
+    elif os.getenv("PARTITIONS"):
+        # comma separated partition counts, e.g. PARTITIONS=1,10,100,1000
+        counts = [int(count) for count in os.environ["PARTITIONS"].split(",")]
+        data = read_ipc(dataset_path())
+        results = run_partition_benchmarks(data, counts)
+        save("partitions", [results], data, ("name", "partitions"))
+        print(format_partition_results(results))
+    elif os.getenv("ISOLATE"):
+        # ISOLATE=warm or ISOLATE=cold, one fresh interpreter per provider and step
+        data_path = dataset_path()
+        data = read_ipc(data_path)
+        results = run_isolated_benchmarks(data_path, os.environ["ISOLATE"] == "cold")
+        save(f"isolated_{os.environ['ISOLATE']}", [results], data)
+        print(format_results(results, data.estimated_size()))
+        print(format_scan_results(results))
+        print(format_lookup_results(results))
+        print(format_query_results(results))
+    elif os.getenv("SIMILARITY"):
+        # recall and latency of nearest neighbor search over address features
+        data = read_ipc(dataset_path())
+        results = run_similarity_benchmarks(data)
+        save("similarity", [results], data, ("name", "index", "search"))
+        print(format_similarity_results(results))
+    elif os.getenv("BATCH_SIZE"):
+        # streaming ingestion, the full dataset is never materialized
+        data = usdt_transfers()
+        results = run_streaming_benchmarks(SCALE, int(os.environ["BATCH_SIZE"]))
+        save("streaming", [results], data)
+        print(format_results(results, data.estimated_size() * SCALE))
     else:
-        data = usdt_transfers(scale=102)
-        results = run_benchmarks(data)
-        output = format_results(results, data)
-        update_readme(output)
-        print(output)
+        data = read_ipc(dataset_path())
+        normalized = normalize(data, NORMALIZE) if NORMALIZE else None
+        trials = []
+        for _ in range(TRIALS):
+            results = run_benchmarks(data)
+            if normalized is not None:
+                results += run_benchmarks(normalized, " (normalized)")
+            trials.append(results)
+        save("providers", trials, data)
+        # the tables show the first trial, the saved records hold all of them
+        results = trials[0]
+        with pl.Config(tbl_formatting="ASCII_MARKDOWN"):
+            update_readme(format_results(results, data.estimated_size()))
+        print(format_results(results, data.estimated_size()))
+        print(format_scan_results(results))
+        print(format_lookup_results(results))
+        print(format_query_results(results))
@@ -0,0 +1,6 @@
+def main() -> None:
+    """Entry point of the crypto-data-benchmark command, imported lazily so
+    importing the package stays cheap"""
+    from crypto_data_benchmark.cli import main
+
+    main()
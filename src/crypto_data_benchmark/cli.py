@@ -0,0 +1,139 @@
+import argparse
+import pathlib
+
+# the columns that identify a cell in the saved results of a matrix run
+MATRIX_KEYS = ("name", "scale", "threads")
+
+
+def comma_list(convert=str):
+    """argparse type for a comma separated list"""
+    return lambda value: [convert(item) for item in value.split(",")]
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="crypto-data-benchmark",
+        description="Benchmark embedded databases on crypto transfer data",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("providers", help="list the providers found in dbs/")
+
+    run = commands.add_parser(
+        "run", help="run every provider, scale and repetition of a matrix"
+    )
+    run.add_argument("-c", "--config", type=pathlib.Path, help="TOML config file")
+    run.add_argument("--providers", type=comma_list(), help="e.g. duckdb,parquet")
+    run.add_argument("--workloads", type=comma_list(), help="scan,lookup,index,query")
+    run.add_argument("--scales", type=comma_list(int), help="e.g. 1,10,100")
+    run.add_argument("--threads", type=comma_list(int), help="e.g. 1,2,4,8")
+    run.add_argument("--repetitions", type=int)
+    run.add_argument("--jobs", type=int, help="cells that run in parallel")
+    run.add_argument("--cpus-per-job", type=int)
+
+    scaling = commands.add_parser(
+        "scaling", help="fit scaling curves to the results of a saved matrix run"
+    )
+    scaling.add_argument("path", type=pathlib.Path, help="results/<run>.parquet")
+    return parser
+
+
+def list_providers() -> None:
+    from crypto_data_benchmark.dbs.registry import providers
+
+    for name, (module, class_name) in providers().items():
+        print(f"{name:12} {module}.{class_name}")
+
+
+def run(args: argparse.Namespace) -> None:
+    import polars as pl
+
+    from crypto_data_benchmark.matrix import load_config, run_matrix
+    from crypto_data_benchmark.results import save_run
+
+    config = load_config(
+        args.config,
+        providers=args.providers,
+        workloads=args.workloads,
+        scales=args.scales,
+        threads=args.threads,
+        repetitions=args.repetitions,
+        jobs=args.jobs,
+        cpus_per_job=args.cpus_per_job,
+    )
+    results = run_matrix(config)
+    if not results:
+        raise SystemExit("Every cell failed")
+
+    trials = [
+        [result for result in results if result["repetition"] == repetition]
+        for repetition in range(config["repetitions"])
+    ]
+    path = save_run("matrix", trials, MATRIX_KEYS, config=config)
+    print(f"Saved the results to {path}")
+
+    pl.Config.set_tbl_rows(-1)
+    pl.Config.set_tbl_cols(-1)
+    summary = [
+        "ingestion_time",
+        "disk_usage",
+        "scan_medium_rows_per_s",
+        "lookup_p50",
+        "indexed_lookup_p50",
+    ]
+    df = pl.DataFrame(results)
+    print(
+        df.group_by("name", "scale", maintain_order=True)
+        .agg(pl.col(column).mean() for column in summary if column in df.columns)
+        .sort("scale", "name")
+    )
+    if len(config["scales"]) > 1 or len(config["threads"]) > 1:
+        print_scaling(df)
+
+
+def print_scaling(results) -> None:
+    """Fitted complexity over the scales at the most threads, and parallel
+    efficiency of every thread limit at the largest scale"""
+    import polars as pl
+
+    from crypto_data_benchmark.scaling import (
+        fit_complexity,
+        parallel_efficiency,
+        scaling_curves,
+    )
+
+    curves = scaling_curves(results)
+    fits = fit_complexity(curves)
+    if not fits.is_empty():
+        print(
+            "Fitted complexity, cost ~ scale^exponent, "
+            "throughputs as time per row so linear is 0"
+        )
+        print(fits.filter(pl.col("threads") == pl.col("threads").max()))
+    efficiency = parallel_efficiency(curves).filter(
+        pl.col("scale") == pl.col("scale").max()
+    )
+    if efficiency["threads"].n_unique() > 1:
+        print("Parallel efficiency at the largest scale")
+        print(efficiency.sort("name", "metric", "threads"))
+
+
+def scaling(args: argparse.Namespace) -> None:
+    import polars as pl
+
+    from crypto_data_benchmark.results import case_frame
+
+    pl.Config.set_tbl_rows(-1)
+    results = case_frame(pl.read_parquet(args.path), MATRIX_KEYS).with_columns(
+        pl.col("scale", "threads").cast(pl.Int64)
+    )
+    print_scaling(results)
+
+
+def main() -> None:
+    args = parser().parse_args()
+    if args.command == "providers":
+        list_providers()
+    elif args.command == "scaling":
+        scaling(args)
+    else:
+        run(args)
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import pathlib
+import re
+
+import polars as pl
+
+TRANSFER_SIGNATURE = "Transfer(address indexed from, address indexed to, uint256 value)"
+CONTRACTS = {
+    "USDT": "0xdAC17F958D2ee523a2206206994597C13D831ec7",
+    "USDC": "0xA0b86991c6218b36c1D19D4a2e9Eb0cE3606eB48",
+    "WETH": "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2",
+}
+# event signature -> contracts that emit it
+EVENTS = {TRANSFER_SIGNATURE: list(CONTRACTS.values())}
+EVENTS_PATH = pathlib.Path.cwd().parent / "data" / "events"
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def event_name(signature: str) -> str:
+    """Name of the event, the part of the signature before the parameters"""
+    return signature.split("(")[0]
+
+
+def float_fields(signature: str) -> list[str]:
+    """Decoded uint256 parameters, mapped to float64 so we can do calculations with them"""
+    return re.findall(r"uint256\s+(?:indexed\s+)?(\w+)", signature)
+
+
+def read_checkpoint(output_dir: pathlib.Path) -> dict[str, int]:
+    """Next block to fetch for every event signature that has started"""
+    path = output_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def write_checkpoint(output_dir: pathlib.Path, checkpoint: dict[str, int]) -> None:
+    """Replace the checkpoint file in one rename so a crash never leaves half of it"""
+    path = output_dir / CHECKPOINT_FILE
+    partial_path = path.with_suffix(".partial")
+    partial_path.write_text(json.dumps(checkpoint, indent=2))
+    partial_path.rename(path)
+
+
+def batch_path(
+    event_dir: pathlib.Path, address: str, start: int, end: int
+) -> pathlib.Path:
+    return event_dir / f"address={address}" / f"{start:010d}-{end:010d}.parquet"
+
+
+def remove_uncommitted(event_dir: pathlib.Path, next_block: int) -> None:
+    """Delete files written after the last checkpoint, the range is fetched again"""
+    for path in event_dir.glob("address=*/*.parquet"):
+        if int(path.stem.split("-")[0]) >= next_block:
+            path.unlink()
+
+
+def write_batch(
+    event_dir: pathlib.Path, logs, decoded_logs, start: int, end: int
+) -> int:
+    """Write one streamed response as one Parquet file per contract, returns the rows"""
+    if logs.num_rows == 0:
+        return 0
+    data = pl.concat(
+        [pl.from_arrow(logs), pl.from_arrow(decoded_logs)], how="horizontal"
+    )
+    for (address,), part in data.partition_by("address", as_dict=True).items():
+        path = batch_path(event_dir, address.hex(), start, end)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        part.write_parquet(path)
+    return data.height
+
+
+async def stream_event(
+    client,
+    signature: str,
+    addresses: list[str],
+    from_block: int,
+    to_block: int,
+    output_dir: pathlib.Path,
+    checkpoint: dict[str, int],
+) -> int:
+    """Stream one event of the given contracts to Parquet, checkpointing every response"""
+    import hypersync as hs
+
+    event_dir = output_dir / event_name(signature)
+    start = checkpoint.get(signature, from_block)
+    if start >= to_block:
+        return 0
+    remove_uncommitted(event_dir, start)
+
+    query = hs.Query(
+        from_block=start,
+        to_block=to_block,
+        logs=[
+            hs.LogSelection(
+                address=addresses,
+                topics=[[hs.signature_to_topic0(signature)]],
+            )
+        ],
+        field_selection=hs.FieldSelection(
+            log=[e.value for e in hs.LogField],
+        ),
+    )
+    config = hs.StreamConfig(
+        column_mapping=hs.ColumnMapping(
+            decoded_log={
+                field: hs.DataType.FLOAT64 for field in float_fields(signature)
+            },
+        ),
+        # give event signature so client can decode logs into decoded_logs
+        event_signature=signature,
+    )
+
+    rows = 0
+    stream = await client.stream_arrow(query, config)
+    try:
+        while (response := await stream.recv()) is not None:
+            rows += write_batch(
+                event_dir,
+                response.data.logs,
+                response.data.decoded_logs,
+                start,
+                response.next_block,
+            )
+            start = checkpoint[signature] = response.next_block
+            write_checkpoint(output_dir, checkpoint)
+    finally:
+        await stream.close()
+    return rows
+
+
+async def stream_events(
+    events: dict[str, list[str]],
+    from_block: int,
+    to_block: int,
+    output_dir: pathlib.Path,
+    client=None,
+) -> int:
+    """Stream every event to hive partitioned Parquet, resuming from the checkpoint
+
+    Responses are written one at a time, so memory is bounded by the response
+    size rather than the block range. Files are named by the block range of
+    the response and the checkpoint only advances after a file is written.
+    The checkpoint belongs to the output folder, use a new folder for another
+    block range or list of contracts.
+    """
+    if client is None:
+        import hypersync as hs
+
+        client = hs.HypersyncClient(hs.ClientConfig())
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = read_checkpoint(output_dir)
+    rows = 0
+    for signature, addresses in events.items():
+        rows += await stream_event(
+            client, signature, addresses, from_block, to_block, output_dir, checkpoint
+        )
+    return rows
+
+
+def download_events(
+    from_block: int,
+    to_block: int,
+    events: dict[str, list[str]] = EVENTS,
+    output_dir: pathlib.Path = EVENTS_PATH,
+    client=None,
+) -> int:
+    """Download [from_block, to_block) of the events, returns the rows written this run"""
+    rows = asyncio.run(stream_events(events, from_block, to_block, output_dir, client))
+    print(f"Downloaded {rows} events to {output_dir}")
+    return rows
+
+
+def read_events(
+    signature: str = TRANSFER_SIGNATURE, output_dir: pathlib.Path = EVENTS_PATH
+) -> pl.LazyFrame:
+    """Scan the downloaded events of one signature, the address partition is dropped"""
+    return pl.scan_parquet(
+        output_dir / event_name(signature) / "**" / "*.parquet", hive_partitioning=False
+    )
+
+
+if __name__ == "__main__":
+    download_events(20_000_000, 20_100_000)
@@ -0,0 +1,102 @@
+import polars as pl
+
+# byte width of every binary column of the logs
+HASH_COLUMNS = ["transaction_hash", "block_hash", "topic0", "topic1", "topic2", "topic3"]
+ADDRESS_COLUMNS = ["address", "from", "to"]
+BINARY_WIDTHS = {
+    **{column: 32 for column in HASH_COLUMNS},
+    **{column: 20 for column in ADDRESS_COLUMNS},
+    "data": 32,
+}
+# indexed event parameters that duplicate a decoded column, as 32 byte words
+DUPLICATE_TOPICS = {"topic1": "from", "topic2": "to"}
+VALUE_LIMBS = [f"value_{i}" for i in range(4)]
+
+
+def decode_hex(data: pl.DataFrame) -> pl.DataFrame:
+    """Turn 0x prefixed hex strings, as left by binary_to_hex, back into binary"""
+    return data.with_columns(
+        pl.col(column).str.strip_prefix("0x").str.decode("hex")
+        for column in BINARY_WIDTHS
+        if column in data.columns and data.schema[column] == pl.String
+    )
+
+
+def check_widths(data: pl.DataFrame) -> None:
+    """Raise if a hash or address column holds values of another width"""
+    columns = [column for column in BINARY_WIDTHS if column in data.columns]
+    widths = data.select(
+        pl.col(column).bin.size().is_in([BINARY_WIDTHS[column]]).all()
+        # an all null column like topic3 has no width
+        | pl.col(column).is_null().all()
+        for column in columns
+    ).row(0)
+    wrong = [column for column, ok in zip(columns, widths) if not ok]
+    if wrong:
+        raise ValueError(f"Unexpected byte widths in {wrong}")
+
+
+def drop_duplicate_topics(data: pl.DataFrame) -> pl.DataFrame:
+    """Drop indexed topics that only repeat the zero padded decoded address"""
+    duplicates = [
+        topic
+        for topic, column in DUPLICATE_TOPICS.items()
+        if topic in data.columns
+        and column in data.columns
+        and data.select(
+            (
+                (pl.col(topic).bin.slice(0, 12) == bytes(12))
+                & (pl.col(topic).bin.slice(12) == pl.col(column))
+            ).all()
+        ).item()
+    ]
+    return data.drop(duplicates)
+
+
+def exact_value(data: pl.DataFrame, value_type: str) -> pl.DataFrame:
+    """Replace the float value with the exact uint256 from the data word
+
+    decimal stores it as decimal128(38, 0) and drops data, which covers every
+    realistic token amount and fails loudly otherwise. Polars decimals stop
+    at 38 digits, so there is no decimal256(76, 0) mode. limbs splits data into
+    four uint64 limbs, most significant first, and keeps the float value for
+    arithmetic since no engine can sum limbs.
+    """
+    word = pl.col("data")
+    if value_type == "limbs":
+        limbs = [
+            word.bin.slice(8 * i, 8)
+            .bin.reinterpret(dtype=pl.UInt64, endianness="big")
+            .alias(name)
+            for i, name in enumerate(VALUE_LIMBS)
+        ]
+        return data.with_columns(limbs).drop("data")
+    if value_type != "decimal":
+        raise ValueError(f"Unknown value type {value_type!r}, use decimal or limbs")
+
+    low = word.bin.slice(16, 16).bin.reinterpret(dtype=pl.UInt128, endianness="big")
+    value = low.cast(pl.Decimal(38, 0), strict=False)
+    fits = data.select(
+        ((word.bin.slice(0, 16) == bytes(16)) & value.is_not_null()).all()
+    ).item()
+    if not fits:
+        raise ValueError("Values exceed decimal(38, 0), use value_type='limbs'")
+    return data.with_columns(value=value).drop("data")
+
+
+def normalize(data: pl.DataFrame, value_type: str = "decimal") -> pl.DataFrame:
+    """Typed and deduplicated schema of the logs before ingestion
+
+    Hex strings become binary again, hashes and addresses are checked to be
+    exactly 32 and 20 bytes, topics that repeat from and to are dropped and
+    value becomes exact.
+
+    The providers ingest Polars frames, and Polars reads fixed_size_binary and
+    dictionary encoded binary as plain binary. So hashes and addresses stay
+    binary and address is not dictionary encoded here. Engines with those
+    types (ClickHouse, Lance) map the checked columns themselves.
+    """
+    data = decode_hex(data)
+    check_widths(data)
+    data = drop_duplicate_topics(data)
+    return exact_value(data, value_type)
@@ -0,0 +1,176 @@
+import pathlib
+from typing import Iterator
+
+import numpy as np
+import polars as pl
+import pyarrow as pa
+
+from crypto_data_benchmark.data.arrow_ipc import read_ipc
+from crypto_data_benchmark.data.usdt_transfers import DATA_PATH
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC0 = bytes.fromhex(
+    "ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+)
+# token contracts and their share of all transfers
+TOKENS = {
+    "dac17f958d2ee523a2206206994597c13d831ec7": 0.55,  # USDT
+    "a0b86991c6218b36c1d19d4a2e9eb0ce3606eb48": 0.25,  # USDC
+    "c02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": 0.12,  # WETH
+    "6b175474e89094c44da98b954eedeac495271d0f": 0.08,  # DAI
+}
+FIRST_BLOCK = 20_000_000
+# transfers per block follow a Poisson distribution with this mean
+LOGS_PER_BLOCK = 17
+ADDRESSES = 1_000_000
+# exponent of the Zipf distribution of address popularity, a larger exponent puts
+# more transfers on the top addresses, closer to 1 the tail is heavier
+ZIPF_EXPONENT = 1.2
+# values are log normal in the token's smallest unit, median 500 USDT
+VALUE_MEDIAN = 5e8
+VALUE_SIGMA = 3.0
+
+SCHEMA = pa.schema(
+    [
+        ("removed", pa.bool_()),
+        ("log_index", pa.uint64()),
+        ("transaction_index", pa.uint64()),
+        ("transaction_hash", pa.large_binary()),
+        ("block_hash", pa.large_binary()),
+        ("block_number", pa.uint64()),
+        ("address", pa.large_binary()),
+        ("data", pa.large_binary()),
+        ("topic0", pa.large_binary()),
+        ("topic1", pa.large_binary()),
+        ("topic2", pa.large_binary()),
+        ("topic3", pa.large_binary()),
+        ("from", pa.large_binary()),
+        ("to", pa.large_binary()),
+        ("value", pa.float64()),
+    ]
+)
+
+
+def binary_array(values: np.ndarray) -> pa.Array:
+    """Arrow binary array from a uint8 matrix with one row per value"""
+    n, width = values.shape
+    array = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(width), n, [None, pa.py_buffer(np.ascontiguousarray(values))]
+    )
+    return array.cast(pa.large_binary())
+
+
+def address_table(n: int, seed: int) -> np.ndarray:
+    """n random 20 byte addresses, row i is the i-th most popular one"""
+    rng = np.random.default_rng([seed, 0])
+    return rng.integers(0, 256, size=(n, 20), dtype=np.uint8)
+
+
+def zipf_ranks(rng: np.random.Generator, n: int, addresses: int) -> np.ndarray:
+    """n draws of address ranks from a Zipf distribution truncated to the table"""
+    ranks = rng.zipf(ZIPF_EXPONENT, n) - 1
+    # fold the unbounded tail back onto the table instead of redrawing it
+    return ranks % addresses
+
+
+def pad_to_word(values: np.ndarray) -> np.ndarray:
+    """Left pad byte rows to 32 bytes, the ABI encoding of addresses and integers"""
+    words = np.zeros((len(values), 32), dtype=np.uint8)
+    words[:, 32 - values.shape[1] :] = values
+    return words
+
+
+def synthetic_chunk(
+    chunk: int, blocks: int, addresses: np.ndarray, seed: int
+) -> pa.RecordBatch:
+    """The transfers of one chunk of consecutive blocks
+
+    Every chunk has its own random stream derived from the seed and the chunk
+    number, so chunks can be generated in any order and still come out the same.
+    """
+    rng = np.random.default_rng([seed, chunk + 1])
+    counts = rng.poisson(LOGS_PER_BLOCK, blocks)
+    n = int(counts.sum())
+    first_block = FIRST_BLOCK + chunk * blocks
+    block_numbers = np.repeat(np.arange(first_block, first_block + blocks), counts)
+
+    # other logs of the block sit in random gaps before every transfer
+    steps = rng.geometric(0.5, n)
+    before = np.append(np.cumsum(steps) - steps, 0)
+    block_start = np.repeat(before[np.cumsum(counts) - counts], counts)
+    log_index = before[:n] + steps - 1 - block_start
+    transaction_index = log_index // 2
+
+    token_addresses = np.array(
+        [np.frombuffer(bytes.fromhex(token), dtype=np.uint8) for token in TOKENS]
+    )
+    topic0 = np.frombuffer(TRANSFER_TOPIC0, dtype=np.uint8)
+    tokens = rng.choice(len(TOKENS), n, p=list(TOKENS.values()))
+    senders = addresses[zipf_ranks(rng, n, len(addresses))]
+    receivers = addresses[zipf_ranks(rng, n, len(addresses))]
+    values = np.floor(rng.lognormal(np.log(VALUE_MEDIAN), VALUE_SIGMA, n))
+    values = np.minimum(values, np.iinfo(np.uint64).max // 2).astype(np.uint64)
+
+    block_hashes = np.repeat(
+        rng.integers(0, 256, size=(blocks, 32), dtype=np.uint8), counts, axis=0
+    )
+    tx_hashes = rng.integers(0, 256, size=(n, 32), dtype=np.uint8)
+    value_bytes = values.astype(">u8").view(np.uint8).reshape(n, 8)
+
+    return pa.record_batch(
+        [
+            pa.array(np.zeros(n, dtype=bool)),
+            pa.array(log_index.astype(np.uint64)),
+            pa.array(transaction_index.astype(np.uint64)),
+            binary_array(tx_hashes),
+            binary_array(block_hashes),
+            pa.array(block_numbers.astype(np.uint64)),
+            binary_array(token_addresses[tokens]),
+            binary_array(pad_to_word(value_bytes)),
+            binary_array(np.broadcast_to(topic0, (n, 32))),
+            binary_array(pad_to_word(senders)),
+            binary_array(pad_to_word(receivers)),
+            pa.nulls(n, pa.large_binary()),
+            binary_array(senders),
+            binary_array(receivers),
+            pa.array(values.astype(np.float64)),
+        ],
+        schema=SCHEMA,
+    )
+
+
+def synthetic_transfer_batches(
+    rows: int,
+    seed: int = 42,
+    batch_size: int = 1_000_000,
+    addresses: int = ADDRESSES,
+) -> Iterator[pa.RecordBatch]:
+    """Stream rows synthetic transfers in block order, about batch_size rows at a time"""
+    table = address_table(addresses, seed)
+    blocks = max(1, batch_size // LOGS_PER_BLOCK)
+    remaining = rows
+    chunk = 0
+    while remaining > 0:
+        batch = synthetic_chunk(chunk, blocks, table, seed)
+        batch = batch.slice(0, min(remaining, batch.num_rows))
+        remaining -= batch.num_rows
+        chunk += 1
+        yield batch
+
+
+def synthetic_transfers_path(rows: int, seed: int = 42) -> pathlib.Path:
+    """Arrow IPC file with rows synthetic transfers, written chunk by chunk on first use"""
+    path = DATA_PATH.with_name(f"synthetic-{rows}-{seed}.arrow")
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial_path = path.with_suffix(".partial")
+        with pa.ipc.new_file(partial_path, SCHEMA) as writer:
+            for batch in synthetic_transfer_batches(rows, seed):
+                writer.write_batch(batch)
+        partial_path.rename(path)
+    return path
+
+
+def synthetic_transfers(rows: int, seed: int = 42) -> pl.DataFrame:
+    """rows synthetic transfers, memory mapped like the scaled dataset"""
+    return read_ipc(synthetic_transfers_path(rows, seed))
@@ -1,6 +1,11 @@
 import pathlib
+from typing import Iterator
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from crypto_data_benchmark.data.arrow_ipc import read_ipc
 
 DATA_PATH = pathlib.Path.cwd().parent / "data" / "logs.parquet"
 
@@ -70,6 +75,101 @@ def usdt_transfers(scale: int = 1, hex=False):
     return df
 
 
+def usdt_transfer_batches(
+    scale: int = 1, batch_size: int = 100_000, hex=False
+) -> Iterator[pa.RecordBatch]:
+    """Stream the dataset scale times as record batches instead of concatenating it"""
+    if not DATA_PATH.exists():
+        download_usdt_transfers()
+
+    parquet_file = pq.ParquetFile(DATA_PATH)
+    for _ in range(scale):
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            if hex:
+                import polars_evm
+
+                yield from pl.from_arrow(batch).evm.binary_to_hex().to_arrow().to_batches()
+            else:
+                yield batch
+
+
+def block_span(path: pathlib.Path = DATA_PATH) -> int:
+    """Number of blocks the dataset covers, read without loading the data"""
+    blocks = pl.scan_parquet(path).select(
+        pl.col("block_number").max() - pl.col("block_number").min() + 1
+    )
+    return blocks.collect().item()
+
+
+def replica_batch(batch: pa.RecordBatch, replica: int, span: int) -> pa.RecordBatch:
+    """Move a batch behind the blocks of the previous replicas and give it new hashes
+
+    The first four bytes of the transaction and block hashes are replaced by
+    the replica number, so no replica repeats the keys of another.
+    """
+    if batch.num_rows == 0:
+        # nothing to move, and an empty table converts to no batches at all
+        return batch
+    prefix = f"{replica:08x}"
+
+    def rehash(column: str) -> pl.Expr:
+        return pl.concat_str(
+            [pl.lit(prefix), pl.col(column).bin.encode("hex").str.slice(8)]
+        ).str.decode("hex")
+
+    df = pl.from_arrow(batch).with_columns(
+        block_number=pl.col("block_number") + replica * span,
+        transaction_hash=rehash("transaction_hash"),
+        block_hash=rehash("block_hash"),
+    )
+    table = df.to_arrow(compat_level=pl.CompatLevel.oldest()).cast(batch.schema)
+    return table.combine_chunks().to_batches()[0]
+
+
+def write_scaled_ipc(
+    path: pathlib.Path, scale: int, distinct: bool = False, batch_size: int = 100_000
+) -> pathlib.Path:
+    """Stream the dataset scale times into an Arrow IPC file, one batch in memory at a time
+
+    With distinct every replica after the first is shifted to new blocks and
+    hashes, so engines can't profit from exact duplicates when compressing,
+    deduplicating or looking up. The file is renamed into place at the end,
+    an interrupted write is never picked up.
+    """
+    parquet_file = pq.ParquetFile(DATA_PATH)
+    span = block_span() if distinct else 0
+    partial_path = path.with_suffix(".partial")
+    with pa.ipc.new_file(partial_path, parquet_file.schema_arrow) as writer:
+        for replica in range(scale):
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                if distinct and replica > 0:
+                    batch = replica_batch(batch, replica, span)
+                writer.write_batch(batch)
+    partial_path.rename(path)
+    return path
+
+
+def scaled_usdt_transfers_path(scale: int = 1, distinct: bool = False) -> pathlib.Path:
+    """Arrow IPC file with the dataset scale times, written on first use"""
+    if not DATA_PATH.exists():
+        download_usdt_transfers()
+
+    suffix = "-distinct" if distinct else ""
+    path = DATA_PATH.with_name(f"{DATA_PATH.stem}-x{scale}{suffix}.arrow")
+    if not path.exists():
+        write_scaled_ipc(path, scale, distinct)
+    return path
+
+
+def scaled_usdt_transfers(scale: int = 1, distinct: bool = False) -> pl.DataFrame:
+    """The dataset scale times, memory mapped instead of concatenated in RAM
+
+    Only the pages the engines touch are loaded and they live in the page
+    cache, so the scale is bounded by disk space rather than memory.
+    """
+    return read_ipc(scaled_usdt_transfers_path(scale, distinct))
+
+
 if __name__ == "__main__":
     df = usdt_transfers(scale=100)
     print(df.schema)
@@ -0,0 +1,253 @@
+import shutil
+import time
+from typing import Iterable
+
+import arcticdb as adb
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+
+from crypto_data_benchmark.dbs.common import ROOT_DATA_DIR, disk_usage
+
+ROWS_PER_SEGMENT = 100_000
+
+
+def block_index(block_numbers: pa.ChunkedArray) -> pd.DatetimeIndex:
+    """Block numbers as nanoseconds since the epoch
+
+    ArcticDB only range reads, updates and checks append order on a datetime
+    index, so every block gets its own nanosecond.
+    """
+    return pd.DatetimeIndex(
+        block_numbers.to_numpy().astype("datetime64[ns]"), name="block"
+    )
+
+
+def block_range(start: int, end: int) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """The date_range of blocks [start, end), ArcticDB ranges include their end"""
+    return pd.Timestamp(start, unit="ns"), pd.Timestamp(end - 1, unit="ns")
+
+
+def storable_schema(schema: pa.Schema) -> pa.Schema:
+    """ArcticDB has no decimal type, decimals are stored as strings"""
+    return pa.schema(
+        field.with_type(pa.string()) if pa.types.is_decimal(field.type) else field
+        for field in schema
+    )
+
+
+class ArcticDBProvider:
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        rows_per_segment: int = ROWS_PER_SEGMENT,
+        prune_previous_versions: bool = False,
+    ):
+        """Transfers in one symbol of a local LMDB library, indexed by block
+
+        The index has to be sorted for range reads, so every write is sorted by
+        block whether sorted_by_block is set or not. Every write creates a new
+        version, prune_previous_versions deletes the old ones right away.
+        """
+        self.sorted_by_block = sorted_by_block
+        self.rows_per_segment = rows_per_segment
+        self.prune_previous_versions = prune_previous_versions
+        self.symbol = "transfers"
+        # the Arrow schema of the transfers, pickled next to them
+        self.schema_symbol = "transfers_schema"
+        self.schema = None
+
+    def setup(self) -> None:
+        """Create a fresh LMDB library"""
+        self.data_dir = ROOT_DATA_DIR / "arcticdb"
+        self.schema = None
+        self.teardown()
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.open()
+
+    def open(self, read_only: bool = False) -> None:
+        """Connect to the LMDB folder and open the library"""
+        self.arctic = adb.Arctic(f"lmdb://{self.data_dir.absolute()}")
+        self.lib = self.arctic.get_library(
+            "benchmarks",
+            create_if_missing=True,
+            library_options=adb.LibraryOptions(rows_per_segment=self.rows_per_segment),
+        )
+
+    def close(self) -> None:
+        """Drop the library and the LMDB environment, keep the data"""
+        if hasattr(self, "lib"):
+            del self.lib
+            del self.arctic
+
+    def reader(self) -> "ArcticDBProvider":
+        """The library can be read from several threads at once"""
+        return self
+
+    def teardown(self) -> None:
+        """Delete the data folder if it exists"""
+        self.close()
+        if self.data_dir.exists():
+            shutil.rmtree(self.data_dir)
+
+    def _to_pandas(self, table: pa.Table) -> pd.DataFrame:
+        """Sorted pandas frame with the block index, storing the Arrow schema
+        the first time this handle writes it"""
+        if self.schema != table.schema:
+            schema = table.schema.serialize().to_pybytes()
+            self.lib.write_pickle(
+                self.schema_symbol, schema, prune_previous_versions=True
+            )
+            self.schema = table.schema
+        table = table.cast(storable_schema(table.schema))
+        table = table.sort_by("block_number")
+        df = table.to_pandas()
+        df.index = block_index(table["block_number"])
+        return df
+
+    def _to_polars(self, df: pd.DataFrame) -> pl.DataFrame:
+        """Query result in the schema the transfers were written with"""
+        schema = self._arrow_schema()
+        table = pa.Table.from_pandas(
+            df, schema=storable_schema(schema), preserve_index=False
+        )
+        return pl.from_arrow(table.cast(schema))
+
+    def _arrow_schema(self) -> pa.Schema:
+        """Schema of the transfers, read from the library by handles that
+        haven't written them"""
+        if self.schema is None:
+            schema = self.lib.read(self.schema_symbol).data
+            self.schema = pa.ipc.read_schema(pa.py_buffer(schema))
+        return self.schema
+
+    def add(self, data: pl.DataFrame) -> None:
+        """Append blocks after the last stored one, the first add writes the symbol"""
+        df = self._to_pandas(data.to_arrow())
+        if self.lib.has_symbol(self.symbol):
+            self.lib.append(
+                self.symbol, df, prune_previous_versions=self.prune_previous_versions
+            )
+        else:
+            self.lib.write(self.symbol, df)
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Stage every batch as incomplete segments, then sort and append them at once
+
+        Batches may overlap in blocks, only the finalize step needs them in order.
+        """
+        for batch in batches:
+            df = self._to_pandas(pa.Table.from_batches([batch]))
+            self.lib.write(self.symbol, df, staged=True)
+        self.lib.sort_and_finalize_staged_data(
+            self.symbol,
+            mode=adb.StagedDataFinalizeMethod.APPEND,
+            prune_previous_versions=self.prune_previous_versions,
+        )
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Write a new version with blocks [start, end) replaced by the data
+
+        Only the segments overlapping the range are rewritten, the new
+        version references the others.
+        """
+        if data.height == 0:
+            self.lib.delete_data_in_range(
+                self.symbol,
+                block_range(start, end),
+                prune_previous_versions=self.prune_previous_versions,
+            )
+            return
+        self.lib.update(
+            self.symbol,
+            self._to_pandas(data.to_arrow()),
+            date_range=block_range(start, end),
+            prune_previous_versions=self.prune_previous_versions,
+        )
+
+    def compact(self) -> None:
+        """Merge small appended segments once ArcticDB considers the symbol
+        fragmented and delete the versions no snapshot refers to"""
+        if self.lib.is_symbol_fragmented(self.symbol):
+            self.lib.defragment_symbol_data(self.symbol)
+        self.lib.prune_previous_versions(self.symbol)
+
+    def snapshot(self, name: str) -> float:
+        """Snapshot the current version of every symbol, returns the time it took"""
+        start_time = time.perf_counter()
+        self.lib.snapshot(name)
+        return time.perf_counter() - start_time
+
+    def read_snapshot(self, name: str, start: int, end: int) -> pl.DataFrame:
+        """Blocks [start, end) as they were when the snapshot was taken"""
+        df = self.lib.read(
+            self.symbol, as_of=name, date_range=block_range(start, end)
+        ).data
+        return self._to_polars(df)
+
+    def delete_snapshots(self) -> None:
+        """Delete all snapshots so the versions they hold on to can be pruned"""
+        for name in self.lib.list_snapshots():
+            self.lib.delete_snapshot(name)
+
+    def stored_bytes(self) -> int:
+        """Compressed size of every key in the library
+
+        LMDB reuses freed pages instead of shrinking its file, so the folder
+        size does not go down when versions are pruned.
+        """
+        sizes = self.lib.admin_tools().get_sizes()
+        return sum(size.bytes_compressed for size in sizes.values())
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        self.lib.write("labels", labels.to_pandas(), prune_previous_versions=True)
+
+    def disk_usage(self) -> str:
+        """Return the size of the data folder"""
+        return disk_usage(self.data_dir)
+
+    def build_index(self) -> None:
+        """ArcticDB only indexes the block, lookups filter every segment"""
+        pass
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        query = adb.QueryBuilder()
+        query = query[query["transaction_hash"] == tx_hash]
+        return self._to_polars(self.lib.read(self.symbol, query_builder=query).data)
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        query = None
+        if address is not None:
+            query = adb.QueryBuilder()
+            query = query[query["address"] == address]
+        df = self.lib.read(
+            self.symbol, date_range=block_range(start, end), query_builder=query
+        ).data
+        return self._to_polars(df)
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Blocks [start, end) read by ArcticDB, queries continue in Polars"""
+        return self.scan_block_range(start, end, address).lazy()
+
+    def lazy_labels(self) -> pl.LazyFrame:
+        """The address labels, read into Polars for the joins"""
+        return pl.from_pandas(self.lib.read("labels").data).lazy()
+
+
+if __name__ == "__main__":
+    from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
+
+    data = usdt_transfers()
+    db = ArcticDBProvider()
+    db.setup()
+    db.add(data)
+    print(db.disk_usage())
+    print(db.lookup_by_tx_hash(data["transaction_hash"][0]))
+    db.teardown()
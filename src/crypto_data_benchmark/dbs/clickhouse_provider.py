@@ -1,16 +1,125 @@
+import copy
 import shutil
 from pathlib import Path
+from typing import Iterable
 
 import polars as pl
+import chdb
+import pyarrow as pa
 from chdb.session import Session
 
 from crypto_data_benchmark.dbs.common import (
     ROOT_DATA_DIR,
+    cpu_count,
     disk_usage,
+    record_batch_reader,
 )
 
+# ClickHouse types for the known log columns, hashes and addresses are stored
+# as fixed size strings instead of hex
+COLUMN_TYPES = {
+    "removed": "Nullable(Bool)",
+    "log_index": "UInt64",
+    "transaction_index": "UInt64",
+    "transaction_hash": "FixedString(32)",
+    "block_hash": "FixedString(32)",
+    "block_number": "UInt64",
+    "address": "LowCardinality(FixedString(20))",
+    "data": "String",
+    "topic0": "LowCardinality(FixedString(32))",
+    "topic1": "FixedString(32)",
+    "topic2": "FixedString(32)",
+    "topic3": "Nullable(FixedString(32))",
+    "from": "FixedString(20)",
+    "to": "FixedString(20)",
+}
+
+DEFAULT_CODECS = {
+    "log_index": "T64, ZSTD",
+    "transaction_index": "T64, ZSTD",
+    "transaction_hash": "ZSTD",
+    "block_hash": "ZSTD",
+    "block_number": "Delta, ZSTD",
+    "data": "ZSTD",
+    "topic1": "ZSTD",
+    "topic2": "ZSTD",
+    "from": "ZSTD",
+    "to": "ZSTD",
+    "value": "ZSTD",
+}
+
+INTEGER_TYPES = {
+    pa.int8(): "Int8",
+    pa.int16(): "Int16",
+    pa.int32(): "Int32",
+    pa.int64(): "Int64",
+    pa.uint8(): "UInt8",
+    pa.uint16(): "UInt16",
+    pa.uint32(): "UInt32",
+    pa.uint64(): "UInt64",
+}
+
+
+def clickhouse_type(arrow_type: pa.DataType) -> str:
+    """ClickHouse type for an Arrow type, used for columns not in COLUMN_TYPES"""
+    if pa.types.is_dictionary(arrow_type):
+        return f"LowCardinality({clickhouse_type(arrow_type.value_type)})"
+    if pa.types.is_boolean(arrow_type):
+        return "Bool"
+    if arrow_type in INTEGER_TYPES:
+        return INTEGER_TYPES[arrow_type]
+    if pa.types.is_float32(arrow_type):
+        return "Float32"
+    if pa.types.is_float64(arrow_type):
+        return "Float64"
+    if pa.types.is_fixed_size_binary(arrow_type):
+        return f"FixedString({arrow_type.byte_width})"
+    if pa.types.is_decimal(arrow_type):
+        return f"Decimal({arrow_type.precision}, {arrow_type.scale})"
+    if (
+        pa.types.is_binary(arrow_type)
+        or pa.types.is_large_binary(arrow_type)
+        or pa.types.is_string(arrow_type)
+        or pa.types.is_large_string(arrow_type)
+    ):
+        return "String"
+    raise ValueError(f"No ClickHouse type for {arrow_type}")
+
+
+def regular_binary(data: pa.Table | pa.RecordBatch) -> pa.Table | pa.RecordBatch:
+    """Cast large_binary columns to binary, older chdb versions fail on large_binary"""
+    schema = pa.schema(
+        field.with_type(pa.binary())
+        if pa.types.is_large_binary(field.type)
+        else field
+        for field in data.schema
+    )
+    return data.cast(schema)
+
 
 class ClickHouseProvider:
+    sql_dialect = "clickhouse"
+    # limit_memory sets a cap the engine enforces itself, spilling beyond it
+    caps_memory = True
+    # chdb runs one embedded server per process, which locks the data folder
+    process_safe = False
+
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        engine: str = "MergeTree",
+        order_by: tuple[str, ...] | None = None,
+        codecs: dict[str, str] | None = None,
+    ):
+        """order_by defaults to (block_number, log_index) when sorted_by_block is set"""
+        self.sorted_by_block = sorted_by_block
+        self.engine = engine
+        if order_by is None:
+            order_by = ("block_number", "log_index") if sorted_by_block else ()
+        self.order_by = order_by
+        self.codecs = DEFAULT_CODECS if codecs is None else codecs
+        self.memory_limit = None
+
     def setup(self) -> None:
         """Create a fresh ClickHouse database"""
         self.data_dir = ROOT_DATA_DIR / "clickhouse"
@@ -22,47 +131,204 @@ class ClickHouseProvider:
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
         # Initialize session
-        self.session = Session(str(self.db_path))
+        self.open()
         self.session.query("CREATE DATABASE IF NOT EXISTS benchmarks ENGINE = Atomic")
 
+    def open(self, read_only: bool = False) -> None:
+        """Start the embedded server on the data folder"""
+        self.session = Session(str(self.db_path))
+        self._configure()
+
+    def close(self) -> None:
+        """Stop the embedded server and keep the data"""
+        if hasattr(self, "session"):
+            self.session.close()
+            del self.session
+
+    def reader(self) -> "ClickHouseProvider":
+        """Handle for one client thread, query parameters race on a shared connection
+
+        All connections in a process talk to the same embedded server.
+        """
+        reader = copy.copy(self)
+        reader.session = chdb.connect(str(self.db_path))
+        reader._configure()
+        return reader
+
+    def limit_memory(self, limit: int) -> None:
+        """Fail queries above limit bytes, aggregations and sorts spill to the
+        tmp folder of the embedded server before that"""
+        self.memory_limit = limit
+        self.spill_dir = self.db_path / "tmp"
+        self._configure()
+
+    def _configure(self) -> None:
+        """Settings for every connection"""
+        # return String columns as Arrow binary, they hold raw bytes and not utf8
+        self.session.query("SET output_format_arrow_string_as_string = 0")
+        self.session.query(f"SET max_threads = {cpu_count()}")
+        if self.memory_limit is not None:
+            # spill aggregations and sorts at half the limit, so the merge of
+            # the spilled parts still fits
+            spill_at = self.memory_limit // 2
+            self.session.query(f"SET max_memory_usage = {self.memory_limit}")
+            self.session.query(f"SET max_bytes_before_external_group_by = {spill_at}")
+            self.session.query(f"SET max_bytes_before_external_sort = {spill_at}")
+
     def teardown(self) -> None:
         """Delete the data folder if it exists"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
         # Convert Polars DataFrame to Arrow table
-        arrow_table = data.to_arrow()
+        self._insert(regular_binary(data.to_arrow()))
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, chdb scans the reader incrementally"""
+        self._insert(record_batch_reader(regular_binary(b) for b in batches))
 
-        # Create view and table using type inference
+    def _insert(self, arrow_data: pa.Table | pa.RecordBatchReader) -> None:
+        """Create the table if needed and insert the Arrow data into it"""
+        self._create_table(arrow_data.schema)
+
+        # binary columns arrive as String and are converted to FixedString on insert
         self.session.query("""
-            CREATE VIEW benchmarks.view
-            AS SELECT * FROM Python(arrow_table)
+            INSERT INTO benchmarks.transfers
+            SELECT * FROM Python(arrow_data)
         """)
 
-        self.session.query("""
-            CREATE TABLE IF NOT EXISTS benchmarks.transfers ENGINE = Log AS benchmarks.view
+    def _create_table(self, schema: pa.Schema) -> None:
+        """Create the table with explicit column types and codecs"""
+        columns = []
+        for field in schema:
+            column_type = COLUMN_TYPES.get(field.name) or clickhouse_type(field.type)
+            column = f"`{field.name}` {column_type}"
+            if field.name in self.codecs:
+                column += f" CODEC({self.codecs[field.name]})"
+            columns.append(column)
+
+        engine = self.engine
+        if engine.endswith("MergeTree"):
+            engine += f" ORDER BY ({', '.join(self.order_by)})"
+        self.session.query(f"""
+            CREATE TABLE IF NOT EXISTS benchmarks.transfers ({", ".join(columns)})
+            ENGINE = {engine}
         """)
 
-        # Insert data from view into table
+    def compact(self) -> None:
+        """Merge all parts, the replaced parts are removed by the server later"""
+        if not self.engine.endswith("MergeTree"):
+            # only the MergeTree family has parts to merge
+            return
+        self.session.query("OPTIMIZE TABLE benchmarks.transfers FINAL")
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Delete blocks [start, end), then insert the data as a new part
+
+        On the MergeTree family this is a lightweight delete that only masks
+        the rows, merges drop them later. Other engines have no mutations, the
+        rows outside the range are copied to a new table that replaces the old.
+        """
+        params = {"start": start, "end": end}
+        in_range = "block_number >= {start:UInt64} AND block_number < {end:UInt64}"
+        if self.engine.endswith("MergeTree"):
+            self.session.query(
+                f"""
+                DELETE FROM benchmarks.transfers WHERE {in_range}
+                SETTINGS mutations_sync = 2
+                """,
+                params=params,
+            )
+        else:
+            self.session.query(
+                "CREATE TABLE benchmarks.transfers_rewrite AS benchmarks.transfers"
+            )
+            self.session.query(
+                f"""
+                INSERT INTO benchmarks.transfers_rewrite
+                SELECT * FROM benchmarks.transfers WHERE NOT ({in_range})
+                """,
+                params=params,
+            )
+            self.session.query(
+                "EXCHANGE TABLES benchmarks.transfers AND benchmarks.transfers_rewrite"
+            )
+            self.session.query("DROP TABLE benchmarks.transfers_rewrite")
+        if data.height:
+            self.add(data)
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        labels = regular_binary(labels.to_arrow())
+        self.session.query("""
+            CREATE OR REPLACE TABLE benchmarks.address_labels (
+                address FixedString(20), label LowCardinality(String)
+            ) ENGINE = MergeTree ORDER BY address
+        """)
         self.session.query("""
-            INSERT INTO benchmarks.transfers 
-            SELECT * FROM benchmarks.view
-            FORMAT Native
+            INSERT INTO benchmarks.address_labels SELECT * FROM Python(labels)
         """)
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
 
+    def build_index(self) -> None:
+        """Add and materialize a bloom filter skip index on the transaction hash"""
+        if not self.engine.endswith("MergeTree"):
+            # skip indexes are only supported by the MergeTree family
+            return
+        self.session.query("""
+            ALTER TABLE benchmarks.transfers
+            ADD INDEX tx_hash_idx transaction_hash TYPE bloom_filter(0.01) GRANULARITY 1
+        """)
+        self.session.query("""
+            ALTER TABLE benchmarks.transfers MATERIALIZE INDEX tx_hash_idx
+            SETTINGS mutations_sync = 2
+        """)
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self._query(
+            """
+            SELECT * FROM benchmarks.transfers
+            WHERE transaction_hash = unhex({tx_hash:String})
+            """,
+            {"tx_hash": tx_hash.hex()},
+        )
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        query = """
+            SELECT * FROM benchmarks.transfers
+            WHERE block_number >= {start:UInt64} AND block_number < {end:UInt64}
+        """
+        params = {"start": start, "end": end}
+        if address is not None:
+            query += " AND address = unhex({address:String})"
+            params["address"] = address.hex()
+        return self._query(query, params)
+
+    def query_sql(self, query: str) -> pl.DataFrame:
+        """Run an analytics query"""
+        return self._query(query, {})
+
+    def _query(self, query: str, params: dict) -> pl.DataFrame:
+        """Run a parameterized query and collect the result"""
+        return pl.from_arrow(self.session.query(query, "ArrowTable", params=params))
+
 
 if __name__ == "__main__":
     from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
 
     db = ClickHouseProvider()
     db.setup()
-    data = usdt_transfers(scale=1, hex=True)
+    data = usdt_transfers(scale=1)
     db.add(data)
     print(db.disk_usage())
     db.teardown()
@@ -1,10 +1,16 @@
+import itertools
+import os
 import pathlib
 import subprocess
-from typing import Protocol
+from typing import Iterable, Protocol
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 ROOT_DATA_DIR = pathlib.Path("data")
+# rows written to measure the compressed row size that file sizes are based on
+FILE_SIZE_SAMPLE_ROWS = 100_000
 
 
 def disk_usage(path: str) -> str:
@@ -13,6 +19,101 @@ def disk_usage(path: str) -> str:
     return int(blocks) * 512
 
 
+def cpu_count() -> int:
+    """CPUs this process may run on, for engines that would size their thread
+    pools from every CPU of the machine"""
+    return len(os.sched_getaffinity(0))
+
+
+def record_batch_reader(
+    batches: Iterable[pa.RecordBatch], schema: pa.Schema | None = None
+) -> pa.RecordBatchReader:
+    """Wrap a stream of record batches in a reader, using the first batch for the schema
+
+    An empty stream needs the schema, without it a ValueError is raised
+    rather than letting StopIteration escape into the caller.
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        if schema is None:
+            raise ValueError("No record batches, pass the schema of an empty stream")
+        return pa.RecordBatchReader.from_batches(schema, [])
+    return pa.RecordBatchReader.from_batches(
+        schema or first.schema, itertools.chain([first], batches)
+    )
+
+
+def block_range_filter(start: int, end: int, address: bytes | None = None) -> pl.Expr:
+    """Polars predicate selecting blocks in [start, end), optionally for one contract"""
+    predicate = (pl.col("block_number") >= start) & (pl.col("block_number") < end)
+    if address is not None:
+        predicate &= pl.col("address") == address
+    return predicate
+
+
+# hive partition column for each partitioning scheme, the column is derived on
+# write and dropped again from query results
+PARTITION_COLUMNS = {
+    "block": "block_bucket",
+    "address": "address_partition",
+}
+
+
+def with_partition_column(
+    data: pl.DataFrame, partition_by: str, bucket_size: int
+) -> pl.DataFrame:
+    """Add the partition column, a block_number bucket or the hex encoded address"""
+    if partition_by == "block":
+        bucket = pl.col("block_number") // bucket_size * bucket_size
+        return data.with_columns(bucket.alias(PARTITION_COLUMNS["block"]))
+    if partition_by == "address":
+        address = pl.col("address").bin.encode("hex")
+        return data.with_columns(address.alias(PARTITION_COLUMNS["address"]))
+    raise ValueError(f"Unknown partitioning {partition_by!r}")
+
+
+def partition_filter(
+    partition_by: str,
+    bucket_size: int,
+    start: int,
+    end: int,
+    address: bytes | None = None,
+) -> pl.Expr:
+    """Predicate on the partition column matching block_range_filter, used for pruning"""
+    if partition_by == "block":
+        first_bucket = start // bucket_size * bucket_size
+        return pl.col(PARTITION_COLUMNS["block"]).is_between(first_bucket, end - 1)
+    if address is not None:
+        return pl.col(PARTITION_COLUMNS["address"]) == address.hex()
+    return pl.lit(True)
+
+
+def split_partitions(data: pl.DataFrame, column: str, n: int) -> list[pl.DataFrame]:
+    """Split the data into at most n parts, each partition ends up in exactly one part"""
+    partitions = data.partition_by(column, maintain_order=True)
+    return [pl.concat(partitions[i::n]) for i in range(min(n, len(partitions)))]
+
+
+def rows_per_file(
+    data: pl.DataFrame,
+    target_file_size: int,
+    file_options: dict,
+    sample_rows: int = FILE_SIZE_SAMPLE_ROWS,
+) -> int:
+    """Rows per file for a target size on disk
+
+    The first sample_rows rows are written to memory with the pyarrow Parquet
+    file_options, the in memory size of a row is many times its compressed
+    size.
+    """
+    sample = data.head(sample_rows).to_arrow()
+    buffer = pa.BufferOutputStream()
+    pq.write_table(sample, buffer, **file_options)
+    row_size = buffer.getvalue().size / max(1, sample.num_rows)
+    return max(1, int(target_file_size / max(1, row_size)))
+
+
 class DatabaseInterface(Protocol):
     def setup(self) -> None:
         """Establish connection to the database and create the table"""
@@ -22,14 +123,56 @@ class DatabaseInterface(Protocol):
         """Delete the data folder if it exists"""
         ...
 
+    def open(self, read_only: bool = False) -> None:
+        """Open the existing data, read only handles can be held by other processes"""
+        ...
+
+    def close(self) -> None:
+        """Close all handles but keep the data"""
+        ...
+
+    def reader(self) -> "DatabaseInterface":
+        """Handle that one client thread can query through"""
+        ...
+
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
         ...
 
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches without holding more than one in memory"""
+        ...
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        ...
+
+    def compact(self) -> None:
+        """Merge the small files or parts that many appends leave behind"""
+        ...
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Delete all rows in blocks [start, end) and add the data in their place"""
+        ...
+
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         ...
 
+    def build_index(self) -> None:
+        """Build the structures used to speed up point lookups"""
+        ...
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        ...
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        ...
+
 
 if __name__ == "__main__":
     print(disk_usage("data"))
@@ -1,36 +1,238 @@
 # ... existing imports ...
+import multiprocessing
 import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+from typing import Iterable
 
 import pandas as pd
+import polars as pl
+import pyarrow as pa
 from deltalake import DeltaTable, write_deltalake
 
 from crypto_data_benchmark.dbs.common import (
+    PARTITION_COLUMNS,
     ROOT_DATA_DIR,
+    block_range_filter,
+    cpu_count,
     disk_usage,
+    partition_filter,
+    record_batch_reader,
+    split_partitions,
+    with_partition_column,
 )
 
+SORTED_TARGET_FILE_SIZE = 32 * 1024 * 1024
+TARGET_FILE_SIZE = 128 * 1024 * 1024
+
+
+def append_partitions(
+    table: pa.Table, table_uri: str, column: str, target_file_size: int
+) -> None:
+    """Append a table to the partitioned Delta table, runs in a writer process"""
+    write_deltalake(
+        table_uri,
+        table,
+        mode="append",
+        partition_by=[column],
+        target_file_size=target_file_size,
+    )
+
 
 class DeltaLakeProvider:
+    # "streaming" once limit_memory was called
+    polars_engine = "auto"
+
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        partition_by: str | None = None,
+        bucket_size: int = 1_000,
+        target_file_size: int | None = None,
+        writers: int | None = None,
+    ):
+        """partition_by "block" or "address" appends partitions from writer processes"""
+        if partition_by is not None and partition_by not in PARTITION_COLUMNS:
+            raise ValueError(f"Unknown partitioning {partition_by!r}")
+        if target_file_size is None:
+            # a Z-order on one column is a sort, smaller files give each file
+            # a narrow block_number range that the reader can skip on
+            target_file_size = (
+                SORTED_TARGET_FILE_SIZE if sorted_by_block else TARGET_FILE_SIZE
+            )
+
+        self.sorted_by_block = sorted_by_block
+        self.partition_by = partition_by
+        self.bucket_size = bucket_size
+        self.target_file_size = target_file_size
+        self.writers = writers or cpu_count()
+
     def setup(self) -> None:
         """Initialize Delta Lake table"""
 
         self.data_dir = ROOT_DATA_DIR / "deltalake"
+        self.table_uri = str(self.data_dir / "transfers")
+        self.labels_uri = str(self.data_dir / "labels")
         self.teardown()
 
+    def open(self, read_only: bool = False) -> None:
+        """Nothing to open, every query scans the table again"""
+
+    def close(self) -> None:
+        """Shut down the writer processes and keep the data"""
+        if hasattr(self, "pool"):
+            self.pool.shutdown()
+            del self.pool
+
+    def reader(self) -> "DeltaLakeProvider":
+        """Polars scans can run from several threads at once"""
+        return self
+
     def teardown(self) -> None:
         """Delete the Delta Lake table"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pd.DataFrame) -> None:
-        """Add new data to the Delta Lake table"""
-        write_deltalake(str(self.data_dir), data.to_arrow(), mode="overwrite")
+        """Append new data to the Delta Lake table"""
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        if self.partition_by:
+            self._append_partitions(data)
+            return
+        write_deltalake(
+            self.table_uri,
+            data.to_arrow(),
+            mode="append",
+            target_file_size=self.target_file_size,
+        )
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Append a stream of record batches to the Delta Lake table"""
+        if self.partition_by:
+            for batch in batches:
+                self._append_partitions(pl.from_arrow(batch))
+            return
+        write_deltalake(self.table_uri, record_batch_reader(batches), mode="append")
+
+    def _append_partitions(self, data: pl.DataFrame) -> None:
+        """Append partitions in parallel, each writer commits its own transaction"""
+        column = PARTITION_COLUMNS[self.partition_by]
+        data = with_partition_column(data, self.partition_by, self.bucket_size)
+        if not (Path(self.table_uri) / "_delta_log").exists():
+            # create the table first so the writers only race on appends
+            write_deltalake(
+                self.table_uri,
+                data.to_arrow().schema.empty_table(),
+                partition_by=[column],
+            )
+        if not hasattr(self, "pool"):
+            # spawn instead of fork, the Polars thread pool is not fork safe
+            self.pool = ProcessPoolExecutor(
+                self.writers, mp_context=multiprocessing.get_context("spawn")
+            )
+        results = self.pool.map(
+            append_partitions,
+            [part.to_arrow() for part in split_partitions(data, column, self.writers)],
+            repeat(self.table_uri),
+            repeat(column),
+            repeat(self.target_file_size),
+        )
+        # raise the first error from a writer
+        list(results)
+
+    def compact(self) -> None:
+        """Bin-pack small files, then drop the replaced files and checkpoint the log"""
+        table = DeltaTable(self.table_uri)
+        table.optimize.compact(target_size=self.target_file_size)
+        table.vacuum(retention_hours=0, dry_run=False, enforce_retention_duration=False)
+        table.create_checkpoint()
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Overwrite the rows matching blocks [start, end) with the data
+
+        One commit that rewrites every file holding rows of the range without
+        them and adds the data, readers see either the old or the new blocks.
+        """
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        predicate = f"block_number >= {start} AND block_number < {end}"
+        partition_by = None
+        if self.partition_by:
+            partition_by = [PARTITION_COLUMNS[self.partition_by]]
+            data = with_partition_column(data, self.partition_by, self.bucket_size)
+        write_deltalake(
+            self.table_uri,
+            data.to_arrow(),
+            mode="overwrite",
+            predicate=predicate,
+            partition_by=partition_by,
+            target_file_size=self.target_file_size,
+        )
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        write_deltalake(self.labels_uri, labels.to_arrow(), mode="overwrite")
 
     def disk_usage(self) -> str:
         """Return the size of the Delta Lake table"""
         return disk_usage(self.data_dir)
 
+    def build_index(self) -> None:
+        """Delta Lake has no secondary indexes, lookups rely on file statistics"""
+        pass
+
+    def limit_memory(self, limit: int) -> None:
+        """Polars has no memory limit, run the queries on its streaming engine
+        which processes the files in batches instead of loading them whole"""
+        self.polars_engine = "streaming"
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self._collect(
+            pl.scan_delta(self.table_uri).filter(
+                pl.col("transaction_hash") == tx_hash
+            )
+        )
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        return self.lazy_block_range(start, end, address).collect(
+            engine=self.polars_engine
+        )
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Lazy scan of blocks [start, end) that queries can build on"""
+        query = pl.scan_delta(self.table_uri).filter(
+            block_range_filter(start, end, address)
+        )
+        if self.partition_by:
+            pruning = partition_filter(
+                self.partition_by, self.bucket_size, start, end, address
+            )
+            query = query.filter(pruning)
+        return self._drop_partition_column(query)
+
+    def lazy_labels(self) -> pl.LazyFrame:
+        """Lazy scan of the address labels"""
+        return pl.scan_delta(self.labels_uri)
+
+    def _collect(self, query: pl.LazyFrame) -> pl.DataFrame:
+        """Collect a query, dropping the derived partition column"""
+        return self._drop_partition_column(query).collect(engine=self.polars_engine)
+
+    def _drop_partition_column(self, query: pl.LazyFrame) -> pl.LazyFrame:
+        """Drop the partition column that was derived on write"""
+        if self.partition_by:
+            return query.drop(PARTITION_COLUMNS[self.partition_by])
+        return query
+
 
 # ... existing code ...
 
@@ -1,15 +1,29 @@
+import copy
 import shutil
+from typing import Iterable
 
 import duckdb
+import numpy as np
 import polars as pl
+import pyarrow as pa
 
 from crypto_data_benchmark.dbs.common import (
     ROOT_DATA_DIR,
+    cpu_count,
     disk_usage,
+    record_batch_reader,
 )
 
 
 class DuckDBProvider:
+    sql_dialect = "duckdb"
+    # limit_memory sets a cap the engine enforces itself, spilling beyond it
+    caps_memory = True
+
+    def __init__(self, sorted_by_block: bool = False):
+        self.sorted_by_block = sorted_by_block
+        self.memory_limit = None
+
     def setup(self) -> None:
         """Establish connection to the database and create the table"""
         self.data_dir = ROOT_DATA_DIR / "duckdb"
@@ -21,24 +35,148 @@ class DuckDBProvider:
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
         # Create a new DuckDB database
-        self.conn = duckdb.connect(str(self.db_path))
+        self.open()
 
-    def teardown(self) -> None:
-        """Delete the data folder if it exists"""
+    def open(self, read_only: bool = False) -> None:
+        """Connect to the database, several processes can only share it read only"""
+        config = {"threads": cpu_count()}
+        if self.memory_limit is not None:
+            config["memory_limit"] = f"{self.memory_limit}B"
+            config["temp_directory"] = str(self.spill_dir)
+        self.conn = duckdb.connect(
+            str(self.db_path), read_only=read_only, config=config
+        )
+
+    def close(self) -> None:
+        """Close the connection and keep the data"""
         if hasattr(self, "conn"):
             self.conn.close()
+            del self.conn
+
+    def limit_memory(self, limit: int) -> None:
+        """Cap the buffer manager at limit bytes, larger sorts, joins and
+        aggregations spill to spill_dir"""
+        self.memory_limit = limit
+        self.spill_dir = self.data_dir / "spill"
+        self.close()
+        self.open()
+
+    def reader(self) -> "DuckDBProvider":
+        """Handle for one client thread, a connection must not be shared between threads"""
+        reader = copy.copy(self)
+        reader.conn = self.conn.cursor()
+        return reader
+
+    def teardown(self) -> None:
+        """Delete the data folder if it exists"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
-        self.conn.execute("CREATE TABLE transfers AS SELECT * FROM data")
-        # self.conn.execute("INSERT INTO transfers SELECT * FROM data")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS transfers AS SELECT * FROM data LIMIT 0"
+        )
+        if self.sorted_by_block:
+            # inserting in block order gives tight zonemaps for range filters
+            self.conn.execute(
+                "INSERT INTO transfers SELECT * FROM data ORDER BY block_number"
+            )
+        else:
+            self.conn.execute("INSERT INTO transfers SELECT * FROM data")
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, DuckDB scans the reader incrementally"""
+        reader = record_batch_reader(batches)
+        empty = reader.schema.empty_table()
+        self.conn.execute("CREATE TABLE IF NOT EXISTS transfers AS SELECT * FROM empty")
+        self.conn.execute("INSERT INTO transfers SELECT * FROM reader")
+
+    def compact(self) -> None:
+        """Write the WAL into the database file and reclaim free blocks"""
+        self.conn.execute("CHECKPOINT")
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Delete blocks [start, end) and insert the data in one transaction"""
+        self.conn.execute("BEGIN TRANSACTION")
+        self.conn.execute(
+            "DELETE FROM transfers WHERE block_number >= ? AND block_number < ?",
+            [start, end],
+        )
+        self.add(data)
+        self.conn.execute("COMMIT")
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        self.conn.execute("CREATE OR REPLACE TABLE address_labels AS SELECT * FROM labels")
+
+    def add_vectors(self, addresses: list[bytes], vectors: np.ndarray) -> None:
+        """Store one feature vector per address as a fixed size FLOAT array"""
+        self.dim = vectors.shape[1]
+        vector_table = pa.table(
+            {
+                "address": pa.array(addresses, pa.binary()),
+                "vector": pa.FixedSizeListArray.from_arrays(
+                    pa.array(vectors.ravel()), self.dim
+                ),
+            }
+        )
+        self.conn.execute(f"""
+            CREATE OR REPLACE TABLE address_vectors AS
+            SELECT address, vector::FLOAT[{self.dim}] AS vector FROM vector_table
+        """)
+
+    def build_vector_index(self) -> None:
+        """Create an HNSW index, needs the vss extension to be installable"""
+        self.conn.execute("INSTALL vss")
+        self.conn.execute("LOAD vss")
+        # vss keeps the index in memory, persisting it to a file is experimental
+        self.conn.execute("SET hnsw_enable_experimental_persistence = true")
+        self.conn.execute(
+            "CREATE INDEX vectors_idx ON address_vectors USING HNSW (vector)"
+        )
+
+    def nearest(self, vector: np.ndarray, k: int) -> list[bytes]:
+        """The k addresses nearest to the vector, an HNSW index is used if there is one"""
+        rows = self.conn.execute(
+            f"""
+            SELECT address FROM address_vectors
+            ORDER BY array_distance(vector, ?::FLOAT[{self.dim}]) LIMIT {k}
+            """,
+            [vector.tolist()],
+        ).fetchall()
+        return [address for (address,) in rows]
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
 
+    def build_index(self) -> None:
+        """Create an ART index on the transaction hash"""
+        self.conn.execute("CREATE INDEX tx_hash_idx ON transfers (transaction_hash)")
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self.conn.execute(
+            "SELECT * FROM transfers WHERE transaction_hash = ?", [tx_hash]
+        ).pl()
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        query = "SELECT * FROM transfers WHERE block_number >= ? AND block_number < ?"
+        params = [start, end]
+        if address is not None:
+            query += " AND address = ?"
+            params.append(address)
+        return self.conn.execute(query, params).pl()
+
+    def query_sql(self, query: str) -> pl.DataFrame:
+        """Run an analytics query"""
+        return self.conn.execute(query).pl()
+
 
 if __name__ == "__main__":
     from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
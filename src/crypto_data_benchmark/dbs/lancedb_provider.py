@@ -1,15 +1,30 @@
 import shutil
+from datetime import timedelta
+from typing import Iterable
 
 import lancedb
+import numpy as np
 import polars as pl
+import pyarrow as pa
 
 from crypto_data_benchmark.dbs.common import (
     ROOT_DATA_DIR,
     disk_usage,
+    record_batch_reader,
 )
 
 
+def fixed_size_tx_hash(data: pa.Table | pa.RecordBatch) -> pa.Table | pa.RecordBatch:
+    """Lance can only build scalar indexes on fixed size binary columns"""
+    index = data.schema.get_field_index("transaction_hash")
+    schema = data.schema.set(index, pa.field("transaction_hash", pa.binary(32)))
+    return data.cast(schema)
+
+
 class LanceDBProvider:
+    def __init__(self, sorted_by_block: bool = False):
+        self.sorted_by_block = sorted_by_block
+
     def setup(self) -> None:
         """Create a LanceDB connection and table"""
         self.data_dir = ROOT_DATA_DIR / "lancedb"
@@ -21,25 +36,143 @@ class LanceDBProvider:
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
         # Connect to LanceDB
+        self.open()
+
+    def open(self, read_only: bool = False) -> None:
+        """Connect to the LanceDB folder"""
         self.db = lancedb.connect(str(self.data_dir))
 
+    def close(self) -> None:
+        """Drop the connection and keep the data"""
+        if hasattr(self, "db"):
+            del self.db
+
+    def reader(self) -> "LanceDBProvider":
+        """Lance tables can be queried from several threads at once"""
+        return self
+
     def teardown(self) -> None:
         """Delete the data folder if it exists"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+
         # Convert Polars DataFrame to PyArrow Table
-        pa_table = data.to_arrow()
+        pa_table = fixed_size_tx_hash(data.to_arrow())
+        self._write(pa_table)
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, Lance writes the reader incrementally"""
+        self._write(record_batch_reader(fixed_size_tx_hash(b) for b in batches))
 
-        # Create or append to the table
+    def _write(self, data: pa.Table | pa.RecordBatchReader) -> None:
+        """Create or append to the table"""
         if self.table_name not in self.db.table_names():
-            self.db.create_table(self.table_name, pa_table)
+            self.db.create_table(self.table_name, data)
         else:
             table = self.db[self.table_name]
-            table.add(pa_table)
+            table.add(data)
+
+    def compact(self) -> None:
+        """Merge small fragments and delete the old versions right away"""
+        self.db[self.table_name].optimize(cleanup_older_than=timedelta(0))
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Mark blocks [start, end) deleted and append the data as a new fragment
+
+        Lance records deleted rows in a deletion file next to the fragment
+        instead of rewriting it, compact removes them.
+        """
+        self.db[self.table_name].delete(
+            f"block_number >= {start} AND block_number < {end}"
+        )
+        if data.height:
+            self.add(data)
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        self.db.create_table("labels", labels.to_arrow(), mode="overwrite")
+
+    def add_vectors(self, addresses: list[bytes], vectors: np.ndarray) -> None:
+        """Store one feature vector per address for the similarity searches"""
+        table = pa.table(
+            {
+                "address": pa.array(addresses, pa.binary(20)),
+                "vector": pa.FixedSizeListArray.from_arrays(
+                    pa.array(vectors.ravel()), vectors.shape[1]
+                ),
+            }
+        )
+        self.db.create_table("vectors", table, mode="overwrite")
+
+    def build_vector_index(self, num_partitions: int, num_sub_vectors: int) -> None:
+        """Create an IVF-PQ index on the feature vectors"""
+        self.db["vectors"].create_index(
+            metric="l2",
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors,
+            index_type="IVF_PQ",
+        )
+
+    def nearest(
+        self,
+        vector: np.ndarray,
+        k: int,
+        nprobes: int = 20,
+        refine_factor: int | None = None,
+    ) -> list[bytes]:
+        """The k addresses nearest to the vector, refine_factor * k candidates are
+        re-ranked by their exact distance"""
+        query = self.db["vectors"].search(vector).limit(k).nprobes(nprobes)
+        if refine_factor is not None:
+            query = query.refine_factor(refine_factor)
+        # selecting _distance as well silences the scoring autoprojection warning
+        result = query.select(["address", "_distance"]).to_arrow()
+        return result["address"].to_pylist()
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
+
+    def build_index(self) -> None:
+        """Create a BTree scalar index on the transaction hash"""
+        self.db[self.table_name].create_scalar_index("transaction_hash")
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self._filter(f"transaction_hash = X'{tx_hash.hex()}'")
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        return self.lazy_block_range(start, end, address).collect()
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Blocks [start, end) filtered by Lance, queries continue in Polars"""
+        predicate = f"block_number >= {start} AND block_number < {end}"
+        if address is not None:
+            predicate += f" AND address = X'{address.hex()}'"
+        return self._filter(predicate).lazy()
+
+    def lazy_labels(self) -> pl.LazyFrame:
+        """The address labels, Lance has no joins so they are read into Polars"""
+        return pl.from_arrow(self.db["labels"].to_arrow()).lazy()
+
+    def _filter(self, predicate: str) -> pl.DataFrame:
+        """Return all rows matching a SQL predicate"""
+        table = (
+            self.db[self.table_name]
+            .search()
+            .where(predicate)
+            .limit(None)
+            .to_arrow()
+        )
+        return pl.from_arrow(table)
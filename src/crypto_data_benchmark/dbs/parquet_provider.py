@@ -1,38 +1,329 @@
+import itertools
+import multiprocessing
 import os
 import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+from typing import Iterable
 
 import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 from crypto_data_benchmark.dbs.common import (
+    PARTITION_COLUMNS,
     ROOT_DATA_DIR,
+    block_range_filter,
+    cpu_count,
     disk_usage,
+    partition_filter,
+    record_batch_reader,
+    rows_per_file,
+    split_partitions,
+    with_partition_column,
 )
 
+INDEX_ROW_GROUP_SIZE = 20_000
+SORTED_ROW_GROUP_SIZE = 100_000
+DEFAULT_ROW_GROUP_SIZE = 1_000_000
+TARGET_FILE_SIZE = 128 * 1024 * 1024
+
+
+def write_partitions(
+    table: pa.Table,
+    directory: str,
+    column: str,
+    max_rows_per_file: int,
+    row_group_size: int,
+    file_options: dict,
+) -> None:
+    """Write a table as hive partitions, runs in a writer process"""
+    ds.write_dataset(
+        table,
+        directory,
+        format="parquet",
+        partitioning=[column],
+        partitioning_flavor="hive",
+        # unique names so parallel writers and later appends never collide
+        basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+        max_rows_per_file=max_rows_per_file,
+        max_rows_per_group=min(row_group_size, max_rows_per_file),
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(**file_options),
+    )
+
 
 class ParquetProvider:
+    # "streaming" once limit_memory was called
+    polars_engine = "auto"
+
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        compression: str = "zstd",
+        compression_level: int | None = None,
+        row_group_size: int | None = None,
+        statistics: bool = True,
+        dictionary: bool = True,
+        use_pyarrow: bool = False,
+        partition_by: str | None = None,
+        bucket_size: int = 1_000,
+        target_file_size: int = TARGET_FILE_SIZE,
+        writers: int | None = None,
+    ):
+        """Write options for the Polars writer, or for pyarrow with use_pyarrow
+
+        The native Polars writer picks dictionary encoding itself, so it can
+        only be turned off together with use_pyarrow. With partition_by set to
+        "block" or "address" the data is written as a hive partitioned dataset
+        by a pool of writer processes instead.
+        """
+        if partition_by is not None and partition_by not in PARTITION_COLUMNS:
+            raise ValueError(f"Unknown partitioning {partition_by!r}")
+        if not dictionary and not use_pyarrow:
+            raise ValueError("dictionary=False is only supported with use_pyarrow")
+        if row_group_size is None and sorted_by_block:
+            # sorted row groups let readers skip by their block_number statistics
+            row_group_size = SORTED_ROW_GROUP_SIZE
+
+        self.sorted_by_block = sorted_by_block
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.statistics = statistics
+        self.dictionary = dictionary
+        self.use_pyarrow = use_pyarrow
+        self.partition_by = partition_by
+        self.bucket_size = bucket_size
+        self.target_file_size = target_file_size
+        self.writers = writers or cpu_count()
+
     def setup(self) -> None:
-        """Create an empty Parquet file if it doesn't exist"""
+        """Create a fresh data folder, every add writes new files into it"""
         self.data_dir = ROOT_DATA_DIR / "parquet"
-        self.file_path = self.data_dir / "data.parquet"
+        # the dataset lives in its own folder so scans never pick up the labels
+        self.dataset_dir = self.data_dir / "transfers"
+        self.labels_path = self.data_dir / "labels.parquet"
+        self.next_part = 0
 
         self.teardown()
 
         # create a fresh data directory
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
+    def open(self, read_only: bool = False) -> None:
+        """Nothing to open, every query scans the files again"""
+
+    def close(self) -> None:
+        """Shut down the writer processes and keep the data"""
+        if hasattr(self, "pool"):
+            self.pool.shutdown()
+            del self.pool
+
+    def reader(self) -> "ParquetProvider":
+        """Polars scans can run from several threads at once"""
+        return self
+
     def teardown(self) -> None:
         """Delete the data folder if it exists"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
-        data.write_parquet(self.file_path)
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        if self.partition_by:
+            self._write_partitions(data)
+            return
+        self._write_file(data, self._next_part_path())
+
+    def _write_file(self, data: pl.DataFrame, path: Path) -> None:
+        """Write one Parquet file with the configured writer and options"""
+        data.write_parquet(
+            path,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            statistics=self.statistics,
+            row_group_size=self.row_group_size,
+            use_pyarrow=self.use_pyarrow,
+            pyarrow_options=(
+                {"use_dictionary": self.dictionary} if self.use_pyarrow else None
+            ),
+        )
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, each batch becomes at least one row group"""
+        if self.partition_by:
+            for batch in batches:
+                self._write_partitions(pl.from_arrow(batch))
+            return
+        reader = record_batch_reader(batches)
+        with pq.ParquetWriter(
+            self._next_part_path(),
+            reader.schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=self.dictionary,
+            write_statistics=self.statistics,
+        ) as writer:
+            for batch in reader:
+                writer.write_batch(batch, row_group_size=self.row_group_size)
+
+    def _write_partitions(self, data: pl.DataFrame) -> None:
+        """Write hive partitions in parallel, every partition goes to a single writer"""
+        column = PARTITION_COLUMNS[self.partition_by]
+        data = with_partition_column(data, self.partition_by, self.bucket_size)
+        parts = split_partitions(data, column, self.writers)
+        file_options = {
+            "compression": self.compression,
+            "compression_level": self.compression_level,
+            "use_dictionary": self.dictionary,
+            "write_statistics": self.statistics,
+        }
+        if not hasattr(self, "pool"):
+            # spawn instead of fork, the Polars thread pool is not fork safe
+            self.pool = ProcessPoolExecutor(
+                self.writers, mp_context=multiprocessing.get_context("spawn")
+            )
+        results = self.pool.map(
+            write_partitions,
+            [part.to_arrow() for part in parts],
+            repeat(str(self.dataset_dir)),
+            repeat(column),
+            repeat(rows_per_file(data, self.target_file_size, file_options)),
+            repeat(self.row_group_size or DEFAULT_ROW_GROUP_SIZE),
+            repeat(file_options),
+        )
+        # raise the first error from a writer
+        list(results)
+
+    def _next_part_path(self) -> Path:
+        """Path of the next file of an unpartitioned dataset, appends never overwrite"""
+        self.dataset_dir.mkdir(parents=True, exist_ok=True)
+        path = self.dataset_dir / f"part-{self.next_part:06d}.parquet"
+        self.next_part += 1
+        return path
+
+    def _scan(self) -> pl.LazyFrame:
+        """Lazily scan all files or the hive partitioned dataset"""
+        if self.partition_by:
+            return pl.scan_parquet(self.dataset_dir, hive_partitioning=True)
+        return pl.scan_parquet(self.dataset_dir / "*.parquet")
+
+    def _files(self) -> list[Path]:
+        """All Parquet files of the dataset, files of one partition are adjacent"""
+        return sorted(self.dataset_dir.rglob("*.parquet"))
+
+    def compact(self) -> None:
+        """Merge all files of each partition, or of the whole dataset, into one"""
+        for directory, files in itertools.groupby(self._files(), lambda f: f.parent):
+            files = list(files)
+            if len(files) < 2:
+                continue
+            data = pl.read_parquet(files, hive_partitioning=False)
+            if self.sorted_by_block:
+                data = data.sort("block_number")
+            self._write_file(data, directory / f"{uuid.uuid4().hex}.parquet")
+            for path in files:
+                path.unlink()
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Rewrite every file with rows in blocks [start, end) without them, then
+        add the data as new files
+
+        Parquet files are immutable, one changed row rewrites its whole file.
+        Files whose row group statistics rule out the range are not read.
+        """
+        in_range = block_range_filter(start, end)
+        for path in self._files():
+            file = pl.scan_parquet(path, hive_partitioning=False)
+            if file.filter(in_range).select(pl.len()).collect().item() == 0:
+                continue
+            kept = file.filter(~in_range).collect()
+            if kept.height:
+                # write next to the file and swap, so scans never see a partial file
+                rewritten = path.with_suffix(".tmp")
+                self._write_file(kept, rewritten)
+                os.replace(rewritten, path)
+            else:
+                path.unlink()
+        if data.height:
+            self.add(data)
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        labels.write_parquet(self.labels_path)
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
 
+    def build_index(self) -> None:
+        """Rewrite every file sorted by transaction hash in small row groups
+
+        Parquet has no secondary indexes, but with sorted data the reader can
+        skip row groups using their min/max statistics.
+        """
+        for path in self._files():
+            data = pl.read_parquet(path, hive_partitioning=False)
+            data.sort("transaction_hash").write_parquet(
+                path,
+                compression=self.compression,
+                compression_level=self.compression_level,
+                row_group_size=INDEX_ROW_GROUP_SIZE,
+                statistics=True,
+            )
+
+    def limit_memory(self, limit: int) -> None:
+        """Polars has no memory limit, run the queries on its streaming engine
+        which processes the files in batches instead of loading them whole"""
+        self.polars_engine = "streaming"
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self._collect(
+            self._scan().filter(pl.col("transaction_hash") == tx_hash)
+        )
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        return self.lazy_block_range(start, end, address).collect(
+            engine=self.polars_engine
+        )
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Lazy scan of blocks [start, end) that queries can build on"""
+        query = self._scan().filter(block_range_filter(start, end, address))
+        if self.partition_by:
+            pruning = partition_filter(
+                self.partition_by, self.bucket_size, start, end, address
+            )
+            query = query.filter(pruning)
+        return self._drop_partition_column(query)
+
+    def lazy_labels(self) -> pl.LazyFrame:
+        """Lazy scan of the address labels"""
+        return pl.scan_parquet(self.labels_path)
+
+    def _collect(self, query: pl.LazyFrame) -> pl.DataFrame:
+        """Collect a query, dropping the derived partition column"""
+        return self._drop_partition_column(query).collect(engine=self.polars_engine)
+
+    def _drop_partition_column(self, query: pl.LazyFrame) -> pl.LazyFrame:
+        """Drop the partition column that was derived on write"""
+        if self.partition_by:
+            return query.drop(PARTITION_COLUMNS[self.partition_by])
+        return query
+
 
 if __name__ == "__main__":
     from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
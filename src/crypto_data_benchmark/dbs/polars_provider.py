@@ -1,26 +1,185 @@
+from typing import Iterable
+
 import polars as pl
 import pyarrow as pa
 
-
-def deepcopy_arrow(arr: pa.Array) -> pa.Array:
-    return arr.take(pa.array(range(len(arr))))
+from crypto_data_benchmark.dbs.common import ROOT_DATA_DIR, block_range_filter
 
 
 class PolarsProvider:
+    # the data lives in the memory of one process
+    process_safe = False
+
+    def __init__(self, sorted_by_block: bool = False):
+        """In-memory reference engine, the upper bound for the engines on disk
+        and the layout of a hot cache tier in front of them"""
+        self.sorted_by_block = sorted_by_block
+        # nothing is written, the folder only exists for the file counts
+        self.data_dir = ROOT_DATA_DIR / "polars"
+        self.data = pl.DataFrame()
+        self.chunks = []
+        self.labels = pl.DataFrame()
+        self.indexed = False
+        self.tx_index = None
+        self.block_order = None
+
     def setup(self) -> None:
-        """Initialize an empty DataFrame"""
-        pass
+        """Start with no data"""
+        self.teardown()
+
+    def open(self, read_only: bool = False) -> None:
+        """Nothing to open, the data stays in memory until teardown"""
+
+    def close(self) -> None:
+        """Nothing to close, the data stays in memory until teardown"""
+
+    def reader(self) -> "PolarsProvider":
+        """Reads never modify the frames, threads can share them"""
+        self._merge_chunks()
+        self._block_index()
+        if self.indexed:
+            self._tx_index()
+        return self
 
     def teardown(self) -> None:
-        """Clear the DataFrame"""
-        pass
+        """Drop the data and the indexes"""
+        self.data = pl.DataFrame()
+        self.chunks = []
+        self.labels = pl.DataFrame()
+        self.indexed = False
+        self._invalidate()
 
     def add(self, data: pl.DataFrame) -> None:
-        fake_allocation = bytes(data.estimated_size("bytes"))
+        """Add new data to the existing dataset, merged into one buffer per
+        column and with the block index rebuilt, so ingestion pays for both"""
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        self.chunks.append(data)
+        self._invalidate()
+        self._block_index()
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, merged once at the end instead of
+        copying all data for every batch"""
+        for batch in batches:
+            batch = pl.from_arrow(batch)
+            self.chunks.append(
+                batch.sort("block_number") if self.sorted_by_block else batch
+            )
+        self._invalidate()
+        self._block_index()
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        self.labels = labels.rechunk()
+
+    def compact(self) -> None:
+        """Nothing to do, add already merged the data into one buffer per column"""
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Drop blocks [start, end) and add the data in their place"""
+        self._merge_chunks()
+        self.data = self.data.filter(~block_range_filter(start, end))
+        self._invalidate()
+        if data.height:
+            self.add(data)
+        else:
+            self._block_index()
 
     def disk_usage(self) -> str:
-        """Return the size of the in-memory DataFrame"""
-        return 0
+        """Size of the data in memory, nothing is stored on disk"""
+        return sum(
+            frame.estimated_size() for frame in [self.data, self.labels, *self.chunks]
+        )
+
+    def build_index(self) -> None:
+        """Build the hash index from transaction hash to row ids"""
+        self.indexed = True
+        self._tx_index()
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        if not self.indexed:
+            return self.lazy().filter(pl.col("transaction_hash") == tx_hash).collect()
+        rows = pl.Series(self._tx_index().get(tx_hash, []), dtype=pl.UInt32)
+        return self._gather(rows)
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        return self.lazy_block_range(start, end, address).collect()
+
+    def lazy(self) -> pl.LazyFrame:
+        """All transfers as a lazy frame"""
+        self._merge_chunks()
+        return self.data.lazy()
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Rows of blocks [start, end) found through the block index, in the
+        order they were added"""
+        blocks, order = self._block_index()
+        first = blocks.search_sorted(start, "left")
+        last = blocks.search_sorted(end, "left")
+        if order is None:
+            query = self.data.slice(first, last - first).lazy()
+        else:
+            query = self._gather(order.slice(first, last - first).sort()).lazy()
+        if address is not None:
+            query = query.filter(pl.col("address") == address)
+        return query
+
+    def lazy_labels(self) -> pl.LazyFrame:
+        """The address labels as a lazy frame"""
+        return self.labels.lazy()
+
+    def _gather(self, rows: pl.Series) -> pl.DataFrame:
+        """The rows at the given ids, eagerly, a lazy gather costs milliseconds
+        of planning even for a single row"""
+        return self.data.select(pl.all().gather(rows))
+
+    def _invalidate(self) -> None:
+        """Drop the indexes after the data changed, they are rebuilt on use"""
+        self.tx_index = None
+        self.block_order = None
+
+    def _merge_chunks(self) -> None:
+        """Concatenate the added chunks to the data as one chunk per column"""
+        if self.chunks:
+            frames = [self.data] if self.data.width else []
+            # concat leaves a single frame as it is, rechunk copies it anyway
+            self.data = pl.concat([*frames, *self.chunks]).rechunk()
+            self.chunks = []
+
+    def _block_index(self) -> tuple[pl.Series, pl.Series | None]:
+        """Sorted block numbers and the row of each, the rows are None when the
+        data itself is sorted and a range is just a slice"""
+        self._merge_chunks()
+        if self.block_order is None:
+            blocks = self.data["block_number"] if self.data.width else pl.Series([])
+            if blocks.is_sorted():
+                self.block_order = (blocks, None)
+            else:
+                order = blocks.arg_sort()
+                self.block_order = (blocks.gather(order), order)
+        return self.block_order
+
+    def _tx_index(self) -> dict[bytes, list[int]]:
+        """Row ids of every transaction hash, one entry per transaction"""
+        self._merge_chunks()
+        if self.tx_index is None:
+            groups = (
+                self.data.select("transaction_hash")
+                .with_row_index("row")
+                .group_by("transaction_hash")
+                .agg("row")
+            )
+            self.tx_index = dict(
+                zip(groups["transaction_hash"].to_list(), groups["row"].to_list())
+            )
+        return self.tx_index
 
 
 if __name__ == "__main__":
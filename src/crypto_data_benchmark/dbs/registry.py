@@ -0,0 +1,83 @@
+import ast
+import functools
+import importlib
+import pathlib
+from typing import Callable
+
+DBS_DIR = pathlib.Path(__file__).parent
+PROVIDER_SUFFIX = "_provider"
+
+
+def get_name_from_class(cls: type) -> str:
+    """Get the name of the class without the module name and the Provider suffix"""
+    return cls.__name__.lower().replace("provider", "")
+
+
+def get_name(db) -> str:
+    """Get the name of the provider including the variant it was configured with"""
+    name = get_name_from_class(db.__class__)
+    if getattr(db, "native", False):
+        name += " (native)"
+    if db.sorted_by_block:
+        name += " (sorted)"
+    return name
+
+
+def class_methods(tree: ast.Module) -> dict[str, set[str]]:
+    """Method names of every class defined in a module"""
+    return {
+        node.name: {
+            item.name for item in node.body if isinstance(item, ast.FunctionDef)
+        }
+        for node in tree.body
+        if isinstance(node, ast.ClassDef)
+    }
+
+
+@functools.cache
+def providers() -> dict[str, tuple[str, str]]:
+    """Module and class of every provider in dbs/, by provider name
+
+    The modules are parsed instead of imported, so listing the providers
+    doesn't import any engine. A class counts as a provider when it
+    implements every method of DatabaseInterface.
+    """
+    common = ast.parse((DBS_DIR / "common.py").read_text())
+    interface = class_methods(common)["DatabaseInterface"]
+    found = {}
+    for path in sorted(DBS_DIR.glob(f"*{PROVIDER_SUFFIX}.py")):
+        tree = ast.parse(path.read_text())
+        for class_name, methods in class_methods(tree).items():
+            if class_name.endswith("Provider") and interface <= methods:
+                name = class_name.lower().replace("provider", "")
+                found[name] = (f"crypto_data_benchmark.dbs.{path.stem}", class_name)
+    return found
+
+
+def load_provider(name: str) -> type:
+    """Import the module of one provider and return its class"""
+    if name not in providers():
+        raise ValueError(f"Unknown provider {name!r}, use one of {list(providers())}")
+    module, class_name = providers()[name]
+    return getattr(importlib.import_module(module), class_name)
+
+
+def provider_factory(spec: str | dict) -> Callable:
+    """Provider class for a name, or for a table with the name and constructor
+    options such as {name = "sqlite", native = true}"""
+    if isinstance(spec, str):
+        return load_provider(spec)
+    options = dict(spec)
+    return functools.partial(load_provider(options.pop("name")), **options)
+
+
+def installed_providers(specs: list[str | dict]) -> list[Callable]:
+    """Provider factories of the specs whose engine can be imported, the others
+    are skipped with a message, like arcticdb without the optional extra"""
+    factories = []
+    for spec in specs:
+        try:
+            factories.append(provider_factory(spec))
+        except ImportError as e:
+            print(f"Skipping {spec}, its engine is not installed: {e}")
+    return factories
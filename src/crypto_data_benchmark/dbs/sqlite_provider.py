@@ -1,16 +1,64 @@
+import copy
+import decimal
 import os
 import shutil
 import sqlite3
+from typing import Iterable
 
 import polars as pl
+import pyarrow as pa
 
 from crypto_data_benchmark.dbs.common import (
     ROOT_DATA_DIR,
     disk_usage,
+    record_batch_reader,
 )
 
+# settings for the native loader, durability is traded for bulk load speed
+DEFAULT_PRAGMAS = {
+    "page_size": 16384,
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "cache_size": -262_144,  # negative values are in KiB, so 256 MiB
+}
+NATIVE_BATCH_SIZE = 100_000
+
+# sqlite3 has no decimal type, bind decimals as text into TEXT columns, NUMERIC
+# affinity would turn values from 2**63 on into lossy REALs. sum() still
+# returns a REAL, results_match reports those sums as different
+sqlite3.register_adapter(decimal.Decimal, str)
+
+
+def sqlite_type(arrow_type: pa.DataType) -> str:
+    """SQLite column affinity for an Arrow type"""
+    if pa.types.is_boolean(arrow_type) or pa.types.is_integer(arrow_type):
+        return "INTEGER"
+    if pa.types.is_floating(arrow_type):
+        return "REAL"
+    if (
+        pa.types.is_decimal(arrow_type)
+        or pa.types.is_string(arrow_type)
+        or pa.types.is_large_string(arrow_type)
+    ):
+        return "TEXT"
+    return "BLOB"
+
 
 class SQLiteProvider:
+    sql_dialect = "sqlite"
+
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        native: bool = False,
+        pragmas: dict | None = None,
+    ):
+        """native loads through sqlite3 directly instead of pandas and SQLAlchemy"""
+        self.sorted_by_block = sorted_by_block
+        self.native = native
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.read_only = False
+
     def setup(self) -> None:
         """Establish connection to the database and create the table"""
         self.data_dir = ROOT_DATA_DIR / "sqlite"
@@ -22,21 +70,150 @@ class SQLiteProvider:
         # Create a fresh data directory
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
+    def open(self, read_only: bool = False) -> None:
+        """The native connection is opened lazily by the thread that uses it"""
+        self.read_only = read_only
+
+    def close(self) -> None:
+        """Close the native connection and keep the data"""
+        if hasattr(self, "conn"):
+            self.conn.close()
+            del self.conn
+
+    def reader(self) -> "SQLiteProvider":
+        """Handle for one client thread, sqlite3 connections belong to their thread"""
+        reader = copy.copy(self)
+        reader.__dict__.pop("conn", None)
+        return reader
+
     def teardown(self) -> None:
         """Delete the data folder if it exists"""
+        self.close()
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
     def add(self, data: pl.DataFrame) -> None:
         """Add new data to the existing dataset"""
-        data.write_database(
-            "transfers", connection=self.connection_string, if_table_exists="append"
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        if self.native:
+            self._bulk_insert(data.to_arrow().to_batches(NATIVE_BATCH_SIZE))
+        else:
+            data.write_database(
+                "transfers",
+                connection=self.connection_string,
+                if_table_exists="append",
+            )
+        if self.sorted_by_block:
+            # rows are stored in rowid order, so the index points at contiguous pages
+            self._connect().execute(
+                "CREATE INDEX IF NOT EXISTS block_number_idx ON transfers (block_number)"
+            )
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Add a stream of record batches, without native one write_database call each"""
+        if self.native:
+            self._bulk_insert(batches)
+            return
+        for batch in batches:
+            pl.from_arrow(batch).write_database(
+                "transfers",
+                connection=self.connection_string,
+                if_table_exists="append",
+            )
+
+    def compact(self) -> None:
+        """Rebuild the database file without free pages"""
+        self._connect().execute("VACUUM")
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Delete blocks [start, end) and insert the data in one transaction"""
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        conn = self._connect()
+        # sqlite3 opens a transaction for the DELETE, the insert commits it
+        conn.execute(
+            "DELETE FROM transfers WHERE block_number >= ? AND block_number < ?",
+            (start, end),
         )
+        if data.height:
+            self._bulk_insert(data.to_arrow().to_batches(NATIVE_BATCH_SIZE))
+        else:
+            conn.commit()
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address label table used by the join queries"""
+        self._connect().execute("DROP TABLE IF EXISTS address_labels")
+        self._bulk_insert(labels.to_arrow().to_batches(), "address_labels")
+
+    def _bulk_insert(
+        self, batches: Iterable[pa.RecordBatch], table: str = "transfers"
+    ) -> None:
+        """Insert all batches with executemany in a single transaction"""
+        reader = record_batch_reader(batches)
+        columns = ", ".join(
+            f'"{field.name}" {sqlite_type(field.type)}' for field in reader.schema
+        )
+        placeholders = ", ".join("?" for _ in reader.schema)
+
+        conn = self._connect()
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+        # sqlite3 prepares the statement once and reuses it for every row
+        insert = f"INSERT INTO {table} VALUES ({placeholders})"
+        with conn:
+            for batch in reader:
+                rows = zip(*(column.to_pylist() for column in batch.columns))
+                conn.executemany(insert, rows)
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
 
+    def build_index(self) -> None:
+        """Create a B-tree index on the transaction hash"""
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS tx_hash_idx ON transfers (transaction_hash)"
+        )
+
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash"""
+        return self._query(
+            "SELECT * FROM transfers WHERE transaction_hash = ?", (tx_hash,)
+        )
+
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        query = "SELECT * FROM transfers WHERE block_number >= ? AND block_number < ?"
+        params = (start, end)
+        if address is not None:
+            query += " AND address = ?"
+            params += (address,)
+        return self._query(query, params)
+
+    def query_sql(self, query: str) -> pl.DataFrame:
+        """Run an analytics query"""
+        return self._query(query, ())
+
+    def _query(self, query: str, params: tuple) -> pl.DataFrame:
+        """Run a query on the native connection and collect the rows"""
+        cursor = self._connect().execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return pl.DataFrame(cursor.fetchall(), schema=columns, orient="row")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the native connection, applying the PRAGMAs for the native loader"""
+        if not hasattr(self, "conn"):
+            if self.read_only:
+                self.conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            else:
+                self.conn = sqlite3.connect(self.db_path)
+            if self.native:
+                for pragma, value in self.pragmas.items():
+                    self.conn.execute(f"PRAGMA {pragma} = {value}")
+        return self.conn
+
     def read_all(self) -> pl.DataFrame:
         """Read all data from the database"""
         return pl.read_database(
@@ -1,94 +1,415 @@
-"""
-TileDB provider (WIP)
-"""
-
 import shutil
+from typing import Iterable
 
 import numpy as np
+import polars as pl
+import pyarrow as pa
+import pyarrow.compute as pc
 import tiledb
 
-from crypto_data_benchmark.dbs.common import (
-    ROOT_DATA_DIR,
-    disk_usage,
-)
+from crypto_data_benchmark.dbs.common import ROOT_DATA_DIR, disk_usage
+
+# the sparse array is indexed by these columns, every other column is an attribute
+DIMENSIONS = ["block_number", "log_index"]
+BLOCK_TILE = 1_000
+# cells per data tile, a read decompresses whole tiles so smaller ones favor
+# narrow scans and lookups
+CAPACITY = 10_000
+BATCH_SIZE = 1_000_000
+# bytes of the transaction hash used as the coordinate of the hash index
+HASH_PREFIX = 8
+
+
+def filters(arrow_type: pa.DataType) -> tiledb.FilterList:
+    """Compression per attribute type, counters are delta encoded first and
+    floats are byte shuffled so the exponents compress together"""
+    if pa.types.is_integer(arrow_type):
+        return tiledb.FilterList([tiledb.DeltaFilter(), tiledb.ZstdFilter()])
+    if pa.types.is_floating(arrow_type):
+        return tiledb.FilterList([tiledb.ByteShuffleFilter(), tiledb.ZstdFilter()])
+    return tiledb.FilterList([tiledb.ZstdFilter()])
+
+
+def fixed_width(column: pa.ChunkedArray) -> int | None:
+    """Byte width shared by every non null value of a binary column, if any"""
+    lengths = pc.binary_length(column)
+    low, high = pc.min_max(lengths).values()
+    if low.as_py() is None:
+        # all null, like topic3 of the transfers, any width will do
+        return 1
+    return high.as_py() if low == high else None
+
 
+def attribute(field: pa.Field, column: pa.ChunkedArray) -> tiledb.Attr:
+    """TileDB attribute for one column
+
+    TileDB reads variable sized binary cell by cell into Python objects, so
+    hashes and addresses are stored as fixed width byte strings whenever all
+    values have the same width, and decimals as their 16 byte values.
+    """
+    arrow_type = field.type
+    if pa.types.is_decimal128(arrow_type):
+        dtype, var = "S16", False
+    elif pa.types.is_fixed_size_binary(arrow_type):
+        dtype, var = f"S{arrow_type.byte_width}", False
+    elif pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        width = fixed_width(column)
+        dtype, var = (f"S{width}", False) if width else ("blob", True)
+    elif pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        dtype, var = "ascii", True
+    else:
+        dtype, var = arrow_type.to_pandas_dtype(), False
+    return tiledb.Attr(
+        field.name,
+        dtype=dtype,
+        var=var,
+        # TileDB checks every value of a nullable attribute in Python on write
+        nullable=column.null_count > 0,
+        filters=filters(arrow_type),
+    )
 
-class SimpleTileDBProvider:
-    def __init__(self):
-        self.data_dir = ROOT_DATA_DIR / "tiledb_simple"
-        self.path = self.data_dir / "data"
+
+def to_tiledb(column: pa.ChunkedArray, attr: tiledb.Attr) -> np.ndarray:
+    """Column as the NumPy array TileDB writes, nulls become None"""
+    array = column.combine_chunks()
+    if array.null_count and not attr.isnullable:
+        raise ValueError(
+            f"{attr.name} has nulls but the first batch had none, the array schema"
+            " is fixed by the first write"
+        )
+    if attr.isvar:
+        values = np.array(array.to_pylist(), dtype=object)
+    elif attr.dtype.kind == "S":
+        if pa.types.is_decimal128(array.type):
+            fixed = array.view(pa.binary(16))
+        else:
+            width = attr.dtype.itemsize
+            try:
+                fixed = array.fill_null(bytes(width)).cast(pa.binary(width))
+            except pa.ArrowInvalid as e:
+                raise ValueError(
+                    f"{attr.name} values are not all {width} bytes, the array schema"
+                    " is fixed by the first write"
+                ) from e
+        values = np.frombuffer(
+            fixed.buffers()[1], dtype=attr.dtype, count=fixed.offset + len(fixed)
+        )[fixed.offset :]
+    else:
+        zero = pa.scalar(0).cast(array.type)
+        values = array.fill_null(zero).to_numpy(zero_copy_only=False)
+    if array.null_count:
+        values = values.astype(object)
+        values[array.is_null().to_numpy(zero_copy_only=False)] = None
+    return values
+
+
+def from_tiledb(values: np.ndarray, arrow_type: pa.DataType) -> pa.Array:
+    """Arrow array of the given type from the NumPy array TileDB read"""
+    mask = np.ma.getmaskarray(values) if np.ma.isMaskedArray(values) else None
+    values = np.ma.getdata(values)
+    if values.dtype.kind == "S":
+        validity = None if mask is None else pa.array(~mask).buffers()[1]
+        fixed = pa.FixedSizeBinaryArray.from_buffers(
+            pa.binary(values.dtype.itemsize),
+            len(values),
+            [validity, pa.py_buffer(np.ascontiguousarray(values))],
+        )
+        if pa.types.is_decimal128(arrow_type):
+            return fixed.view(arrow_type)
+        return fixed.cast(arrow_type)
+    if values.dtype == object and not pa.types.is_string(arrow_type):
+        # variable sized binary comes back as memoryviews
+        values = [None if value is None else bytes(value) for value in values]
+    return pa.array(values, arrow_type, mask=mask)
+
+
+def read_table(array: tiledb.Array, cells: dict | None) -> pl.DataFrame:
+    """Cells read from an array as a DataFrame in the schema it was written with"""
+    schema = pa.ipc.read_schema(pa.py_buffer(array.meta["arrow_schema"]))
+    if cells is None:
+        return pl.from_arrow(schema.empty_table())
+    columns = [from_tiledb(cells[field.name], field.type) for field in schema]
+    return pl.from_arrow(pa.table(columns, schema=schema))
+
+
+def tx_hash_prefix(tx_hashes: np.ndarray) -> np.ndarray:
+    """First bytes of every hash as a big endian integer, the index coordinate"""
+    prefixes = np.array(np.ma.getdata(tx_hashes), dtype=f"S{HASH_PREFIX}")
+    # the domain is inclusive, keep the largest value free for the upper bound
+    return np.minimum(prefixes.view(">u8").astype(np.uint64), np.uint64(2**64 - 2))
+
+
+class TileDBProvider:
+    def __init__(
+        self,
+        sorted_by_block: bool = False,
+        block_tile: int = BLOCK_TILE,
+        capacity: int = CAPACITY,
+        batch_size: int = BATCH_SIZE,
+    ):
+        """Sparse array over (block_number, log_index), capacity is the number of
+        cells per data tile and every batch_size rows are written as one fragment"""
+        self.sorted_by_block = sorted_by_block
+        self.block_tile = block_tile
+        self.capacity = capacity
+        self.batch_size = batch_size
+        # TileDB resolves relative URIs against the directory its context was
+        # created in, not the current one
+        self.data_dir = (ROOT_DATA_DIR / "tiledb").absolute()
+        self.uri = str(self.data_dir / "transfers")
+        self.labels_uri = str(self.data_dir / "labels")
+        self.index_uri = str(self.data_dir / "tx_hash_index")
+        self.indexed = False
 
     def setup(self) -> None:
-        """Create an empty TileDB array if it doesn't exist"""
+        """Create a fresh data folder, the arrays are created on the first write"""
         self.teardown()
-        # Ensure the data directory exists
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self._create_array()
+
+    def open(self, read_only: bool = False) -> None:
+        """Nothing to open, every read opens the arrays at their latest fragments"""
+
+    def close(self) -> None:
+        """No handles are held between calls"""
+
+    def reader(self) -> "TileDBProvider":
+        """TileDB arrays can be read from several threads at once"""
+        return self
 
     def teardown(self) -> None:
         """Delete the data folder if it exists"""
+        self.indexed = False
         if self.data_dir.exists():
             shutil.rmtree(self.data_dir)
 
-    def add(self, block_numbers: np.ndarray, log_indices: np.ndarray) -> None:
-        """Add new data to the existing dataset"""
-        # Prepare the data dictionary for TileDB
-        data_dict = {
-            "log_index": log_indices.astype(np.uint64),
-        }
-
-        # Write the data to the TileDB array
-        with tiledb.SparseArray(str(self.path), mode="w") as A:
-            A[block_numbers] = data_dict
-
-    def read(self) -> dict:
-        """Read data from the TileDB array"""
-        with tiledb.SparseArray(str(self.path), mode="r") as A:
-            data = A[:]
-            return {
-                "block_number": data["block_number"],
-                "log_index": data["log_index"],
-            }
+    def _create_array(self, table: pa.Table) -> None:
+        """Create the sparse array with an attribute for every non dimension column
+
+        Duplicate coordinates are allowed, scaled copies of the dataset repeat
+        the same blocks. The Arrow schema is kept in the array metadata so
+        reads return the exact column types and order.
+        """
+        domain = tiledb.Domain(
+            tiledb.Dim(
+                "block_number",
+                domain=(0, 2**63 - 1),
+                tile=self.block_tile,
+                dtype=np.uint64,
+                filters=[tiledb.DoubleDeltaFilter(), tiledb.ZstdFilter()],
+            ),
+            tiledb.Dim(
+                "log_index",
+                domain=(0, 2**32 - 1),
+                tile=2**32,
+                dtype=np.uint64,
+                filters=[tiledb.ZstdFilter()],
+            ),
+        )
+        attrs = [
+            attribute(field, table[field.name])
+            for field in table.schema
+            if field.name not in DIMENSIONS
+        ]
+        schema = tiledb.ArraySchema(
+            domain=domain,
+            sparse=True,
+            attrs=attrs,
+            capacity=self.capacity,
+            allows_duplicates=True,
+        )
+        tiledb.Array.create(self.uri, schema)
+        with tiledb.open(self.uri, "w") as array:
+            array.meta["arrow_schema"] = table.schema.serialize().to_pybytes()
+
+    def add(self, data: pl.DataFrame) -> None:
+        """Write the data in batches of batch_size rows, one fragment each"""
+        if self.sorted_by_block:
+            data = data.sort("block_number")
+        self.add_batches(data.to_arrow().to_batches(self.batch_size))
+
+    def add_batches(self, batches: Iterable[pa.RecordBatch]) -> None:
+        """Write every record batch as its own fragment"""
+        for batch in batches:
+            self._write(pa.Table.from_batches([batch]))
+
+    def _write(self, table: pa.Table) -> None:
+        if not tiledb.array_exists(self.uri):
+            self._create_array(table)
+        with tiledb.open(self.uri, "w") as array:
+            attrs = [array.attr(i) for i in range(array.nattr)]
+            array[
+                table["block_number"].to_numpy(), table["log_index"].to_numpy()
+            ] = {attr.name: to_tiledb(table[attr.name], attr) for attr in attrs}
+        if self.indexed:
+            self._index(
+                table["transaction_hash"].to_numpy(zero_copy_only=False),
+                table["block_number"].to_numpy(),
+                table["log_index"].to_numpy(),
+            )
+
+    def compact(self) -> None:
+        """Consolidate the fragments and their metadata, then remove the old ones"""
+        for uri in [self.uri, self.index_uri]:
+            if not tiledb.array_exists(uri):
+                continue
+            for mode in ["fragments", "fragment_meta"]:
+                config = tiledb.Config({"sm.consolidation.mode": mode})
+                tiledb.consolidate(uri, config=config)
+                tiledb.vacuum(uri, config=config)
+
+    def replace_blocks(self, start: int, end: int, data: pl.DataFrame) -> None:
+        """Delete blocks [start, end) and write the data as a new fragment
+
+        A delete is a small commit holding the condition, reads filter the
+        cells it covers until consolidation drops them. The block is an
+        attribute of the hash index, so its entries are deleted the same way.
+        """
+        condition = f"block_number >= {start} and block_number < {end}"
+        uris = [self.uri, self.index_uri] if self.indexed else [self.uri]
+        for uri in uris:
+            with tiledb.open(uri, "d") as array:
+                array.query(cond=condition).submit()
+        if data.height:
+            self.add(data)
+
+    def add_labels(self, labels: pl.DataFrame) -> None:
+        """Store the address labels as a dense array over the row number"""
+        if tiledb.array_exists(self.labels_uri):
+            shutil.rmtree(self.labels_uri)
+        table = labels.to_arrow()
+        domain = tiledb.Domain(
+            tiledb.Dim("row", domain=(0, max(0, table.num_rows - 1)), dtype=np.uint64)
+        )
+        attrs = [attribute(field, table[field.name]) for field in table.schema]
+        tiledb.Array.create(
+            self.labels_uri, tiledb.ArraySchema(domain=domain, attrs=attrs)
+        )
+        with tiledb.open(self.labels_uri, "w") as array:
+            array[:] = {attr.name: to_tiledb(table[attr.name], attr) for attr in attrs}
+            array.meta["arrow_schema"] = table.schema.serialize().to_pybytes()
 
     def disk_usage(self) -> str:
         """Return the size of the data folder"""
         return disk_usage(self.data_dir)
 
-    def _create_array(self):
-        block_number = tiledb.Dim(
-            name="block_number", domain=(0, 2**63 - 1), tile=10_000_000, dtype=np.uint64
-        )
-        domain = tiledb.Domain(block_number)
+    def build_index(self) -> None:
+        """Sparse array from the transaction hash prefix to the coordinates of its rows
 
-        attributes = [
-            tiledb.Attr(name="log_index", dtype=np.uint64),
+        TileDB has no secondary indexes and query conditions don't support
+        binary attributes, so the index is another sparse array that is read
+        like the transfers.
+        """
+        if tiledb.array_exists(self.index_uri):
+            shutil.rmtree(self.index_uri)
+        domain = tiledb.Domain(
+            tiledb.Dim(
+                "tx_hash_prefix",
+                domain=(0, 2**64 - 2),
+                tile=2**48,
+                dtype=np.uint64,
+            )
+        )
+        attrs = [
+            tiledb.Attr(name, dtype=np.uint64, filters=filters(pa.uint64()))
+            for name in DIMENSIONS
         ]
+        schema = tiledb.ArraySchema(
+            domain=domain,
+            sparse=True,
+            attrs=attrs,
+            capacity=self.capacity,
+            allows_duplicates=True,
+        )
+        tiledb.Array.create(self.index_uri, schema)
+        with tiledb.open(self.uri) as array:
+            hashes = array.query(attrs=["transaction_hash"])[:]
+        self._index(
+            hashes["transaction_hash"], hashes["block_number"], hashes["log_index"]
+        )
+        self.indexed = True
 
-        schema = tiledb.ArraySchema(domain=domain, sparse=True, attrs=attributes)
-        tiledb.Array.create(str(self.path), schema)
+    def _index(
+        self, tx_hashes: np.ndarray, block_numbers: np.ndarray, log_indices: np.ndarray
+    ) -> None:
+        """Add the coordinates of new rows to the hash index"""
+        with tiledb.open(self.index_uri, "w") as index:
+            index[tx_hash_prefix(tx_hashes)] = {
+                "block_number": block_numbers,
+                "log_index": log_indices,
+            }
 
+    def lookup_by_tx_hash(self, tx_hash: bytes) -> pl.DataFrame:
+        """Return all rows with the given transaction hash
 
-if __name__ == "__main__":
-    # Generate some simple test data
-    block_numbers = np.array([1, 2, 3, 4, 5], dtype=np.uint64)
-    log_indices = np.array([10, 20, 30, 40, 50], dtype=np.uint64)
+        With the index only the cells at the indexed coordinates are read,
+        without it the hash attribute is scanned for them first.
+        """
+        if self.indexed:
+            prefix = int(tx_hash_prefix(np.array([tx_hash]))[0])
+            with tiledb.open(self.index_uri) as index:
+                coordinates = index[prefix : prefix + 1]
+        else:
+            with tiledb.open(self.uri) as array:
+                hashes = array.query(attrs=["transaction_hash"])[:]
+            matches = np.ma.getdata(hashes["transaction_hash"]) == tx_hash
+            coordinates = {name: hashes[name][matches] for name in DIMENSIONS}
 
-    db = SimpleTileDBProvider()
-    db.setup()
-    db.add(block_numbers, log_indices)
+        with tiledb.open(self.uri) as array:
+            parts = [read_table(array, None)] + [
+                read_table(array, array[block : block + 1])
+                for block in np.unique(coordinates["block_number"]).tolist()
+            ]
+        return pl.concat(parts).filter(pl.col("transaction_hash") == tx_hash)
 
-    # Read the data
-    read_data = db.read()
+    def scan_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.DataFrame:
+        """Return all rows in blocks [start, end), optionally only for one contract"""
+        return self.scan_region(start, end, address=address)
 
-    # Verify the data
-    is_correct = np.array_equal(
-        read_data["block_number"], block_numbers
-    ) and np.array_equal(read_data["log_index"], log_indices)
+    def scan_region(
+        self,
+        start: int,
+        end: int,
+        first_log: int = 0,
+        end_log: int = 2**32,
+        address: bytes | None = None,
+    ) -> pl.DataFrame:
+        """Rows in blocks [start, end) with log_index in [first_log, end_log)
 
-    if is_correct:
-        print("Data verification successful!")
-    else:
-        print("Data verification failed!")
+        A range on both dimensions, TileDB only reads the tiles that intersect
+        the rectangle. The address is filtered after the read.
+        """
+        with tiledb.open(self.uri) as array:
+            if end <= start or end_log <= first_log:
+                return read_table(array, None)
+            data = read_table(array, array[start:end, first_log:end_log])
+        if address is not None:
+            data = data.filter(pl.col("address") == address)
+        return data
+
+    def lazy_block_range(
+        self, start: int, end: int, address: bytes | None = None
+    ) -> pl.LazyFrame:
+        """Blocks [start, end) read by TileDB, queries continue in Polars"""
+        return self.scan_block_range(start, end, address).lazy()
 
+    def lazy_labels(self) -> pl.LazyFrame:
+        """The address labels, read into Polars for the joins"""
+        with tiledb.open(self.labels_uri) as array:
+            return read_table(array, array[:]).lazy()
+
+
+if __name__ == "__main__":
+    from crypto_data_benchmark.data.usdt_transfers import usdt_transfers
+
+    data = usdt_transfers()
+    db = TileDBProvider()
+    db.setup()
+    db.add(data)
     print(db.disk_usage())
+
+    tx_hash = data["transaction_hash"][0]
+    db.build_index()
+    print(db.lookup_by_tx_hash(tx_hash))
     db.teardown()
@@ -0,0 +1,175 @@
+import itertools
+import os
+import pathlib
+import shutil
+import tomllib
+
+from crypto_data_benchmark.scheduler import limit_threads, schedule
+
+# the provider comparison of scripts/run.py, a config file overrides any key
+DEFAULT_CONFIG = {
+    "providers": [
+        "parquet",
+        "lancedb",
+        "deltalake",
+        "duckdb",
+        "clickhouse",
+        "sqlite",
+        # native sqlite3 bulk loader, the SQLAlchemy path above is the baseline
+        {"name": "sqlite", "native": True},
+        "tiledb",
+        "arcticdb",
+        # in-memory upper bound for the engines on disk
+        "polars",
+    ],
+    # every provider runs once per entry, with the natural order and sorted
+    "sorted_by_block": [False, True],
+    "workloads": ["scan", "lookup", "index", "query"],
+    "scales": [102],
+    # thread limits to sweep, 0 uses every CPU of the job
+    "threads": [0],
+    "distinct_replicas": False,
+    "repetitions": 1,
+    # cells that run at the same time, each pinned to its own CPUs
+    "jobs": 1,
+    # 0 splits the CPUs evenly between the jobs
+    "cpus_per_job": 0,
+    "profiler": "rss",
+    # every cell runs in its own folder below this one, so cells of the same
+    # provider don't share a data folder
+    "work_dir": "data/cells",
+}
+
+
+def load_config(path: pathlib.Path | None = None, **overrides) -> dict:
+    """The default config updated with a TOML file and then with the overrides
+
+    Overrides that are None are ignored, so unset command line options keep
+    the value from the file.
+    """
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        with open(path, "rb") as file:
+            config.update(tomllib.load(file))
+    config.update({key: value for key, value in overrides.items() if value is not None})
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown config keys {sorted(unknown)}")
+    return config
+
+
+def provider_label(spec: str | dict) -> str:
+    """Short name of a provider spec for folder names and progress output"""
+    if isinstance(spec, str):
+        return spec
+    options = "-".join(f"{key}={value}" for key, value in spec.items() if key != "name")
+    return f"{spec['name']}-{options}"
+
+
+def matrix_cells(config: dict, data_paths: dict[int, pathlib.Path]) -> list[dict]:
+    """One cell per repetition, scale, thread limit, provider and sort order
+
+    Repetitions are the outer loop, so an interrupted sweep has complete
+    trials of every provider rather than many of the first ones.
+    """
+    work_dir = pathlib.Path(config["work_dir"]).absolute()
+    cells = []
+    for repetition in range(config["repetitions"]):
+        for scale, threads in itertools.product(config["scales"], config["threads"]):
+            for spec in config["providers"]:
+                for sorted_by_block in config["sorted_by_block"]:
+                    label = provider_label(spec)
+                    if sorted_by_block:
+                        label += "-sorted"
+                    folder = f"{label}-{scale}x-{threads}t-{repetition}"
+                    cells.append(
+                        {
+                            "provider": spec,
+                            "sorted_by_block": sorted_by_block,
+                            "scale": scale,
+                            "threads": threads,
+                            "repetition": repetition,
+                            "workloads": config["workloads"],
+                            "data_path": str(data_paths[scale]),
+                            "work_dir": str(work_dir / folder),
+                        }
+                    )
+    return cells
+
+
+def prepare_datasets(config: dict) -> dict[int, pathlib.Path]:
+    """Write the Arrow IPC file of every scale before any cell maps it"""
+    from crypto_data_benchmark.data.usdt_transfers import scaled_usdt_transfers_path
+
+    return {
+        scale: scaled_usdt_transfers_path(scale, config["distinct_replicas"]).absolute()
+        for scale in config["scales"]
+    }
+
+
+def run_cell(cell: dict) -> dict:
+    """Set up the provider in the cell's folder, run the workloads, tear it down
+
+    Runs in a fresh worker process, the engine modules are imported here
+    after the thread limit of the cell is applied.
+    """
+    if cell["threads"]:
+        limit_threads(set(sorted(os.sched_getaffinity(0))[: cell["threads"]]))
+
+    from crypto_data_benchmark.data.arrow_ipc import read_ipc
+    from crypto_data_benchmark.dbs.registry import get_name, provider_factory
+    from crypto_data_benchmark.workloads.steps import workload_steps
+
+    work_dir = pathlib.Path(cell["work_dir"])
+    work_dir.mkdir(parents=True, exist_ok=True)
+    # providers keep their data below the relative ROOT_DATA_DIR
+    os.chdir(work_dir)
+    data = read_ipc(pathlib.Path(cell["data_path"]))
+    db = provider_factory(cell["provider"])(sorted_by_block=cell["sorted_by_block"])
+    db.setup()
+    metrics = {
+        "name": get_name(db),
+        "scale": cell["scale"],
+        "repetition": cell["repetition"],
+        # the CPUs the cell really got, fewer than asked for on small machines
+        "threads": len(os.sched_getaffinity(0)),
+    }
+    try:
+        for step in workload_steps(cell["workloads"]):
+            metrics.update(step(db, data))
+    finally:
+        db.teardown()
+        os.chdir(work_dir.parent)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return metrics
+
+
+def run_matrix(config: dict) -> list[dict]:
+    """Run every cell of the matrix, config["jobs"] at a time
+
+    Parallel cells compete for memory bandwidth and disk, so compare results
+    of runs with the same jobs setting. A failing cell is reported and
+    skipped instead of ending the sweep.
+    """
+    # the workers inherit the environment, the steps read the profiler from it
+    os.environ["PROFILER"] = config["profiler"]
+    cells = matrix_cells(config, prepare_datasets(config))
+    results = []
+    tasks = schedule(
+        "crypto_data_benchmark.matrix:run_cell",
+        cells,
+        config["jobs"],
+        config["cpus_per_job"],
+    )
+    for i, (cell, future) in enumerate(tasks, start=1):
+        where = f"at scale {cell['scale']}"
+        if cell["threads"]:
+            where += f" with {cell['threads']} threads"
+        try:
+            results.append(future.result())
+        except Exception as e:
+            label = provider_label(cell["provider"])
+            print(f"[{i}/{len(cells)}] {label} {where} failed: {e!r}")
+            continue
+        print(f"[{i}/{len(cells)}] {results[-1]['name']} {where}")
+    return results
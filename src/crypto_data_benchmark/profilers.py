@@ -0,0 +1,144 @@
+import os
+import resource
+import threading
+import time
+import tracemalloc
+from typing import Callable
+
+import pyarrow as pa
+
+PAGE_SIZE = resource.getpagesize()
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def timed(func, *args, **kwargs) -> dict:
+    """Wall clock and CPU time of all threads of the process"""
+    start_time = time.perf_counter_ns()
+    start_cpu = time.process_time_ns()
+    func(*args, **kwargs)
+    return {
+        "ingestion_time": (time.perf_counter_ns() - start_time) / 1e9,
+        "cpu_time": (time.process_time_ns() - start_cpu) / 1e9,
+    }
+
+
+def current_rss() -> int:
+    """Resident set size of the process in bytes"""
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * PAGE_SIZE
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's RSS high water mark, False where that is not allowed"""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """RSS high water mark of the process in bytes"""
+    with open("/proc/self/status") as file:
+        for line in file:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        """Background thread that records the highest RSS it sees"""
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self) -> int:
+        """Stop sampling and return the peak RSS"""
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+def profile_rss(func, *args, **kwargs) -> dict:
+    """Peak RSS above the RSS at the start, covers native allocations of all engines
+
+    Short spikes between two samples are caught by the kernel's high water
+    mark where it can be reset.
+    """
+    start_memory = current_rss()
+    exact_peak = reset_peak_rss()
+    sampler = RSSSampler()
+    sampler.start()
+    try:
+        metrics = timed(func, *args, **kwargs)
+    finally:
+        peak = sampler.stop()
+    if exact_peak:
+        peak = max(peak, peak_rss())
+    metrics["peak_memory"] = peak - start_memory
+    metrics["memory_delta"] = current_rss() - start_memory
+    return metrics
+
+
+def profile_tracemalloc(func, *args, **kwargs) -> dict:
+    """Peak of the allocations made through the Python allocator, misses native code"""
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    try:
+        metrics = timed(func, *args, **kwargs)
+        end_memory, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    metrics["peak_memory"] = peak - start_memory
+    metrics["memory_delta"] = end_memory - start_memory
+    return metrics
+
+
+def profile_arrow(func, *args, **kwargs) -> dict:
+    """Peak of the Arrow C++ memory pool, only sees allocations made by pyarrow"""
+    default_pool = pa.default_memory_pool()
+    # a proxy pool keeps its own statistics, the default pool's peak can't be reset
+    pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(pool)
+    try:
+        metrics = timed(func, *args, **kwargs)
+    finally:
+        pa.set_memory_pool(default_pool)
+    metrics["peak_memory"] = pool.max_memory()
+    metrics["memory_delta"] = pool.bytes_allocated()
+    return metrics
+
+
+def profile_scalene(func, *args, **kwargs) -> dict:
+    """Scalene's footprint, the process has to run under the scalene launcher"""
+    from crypto_data_benchmark.scalene_profiler import profile
+
+    return profile(func, *args, **kwargs)
+
+
+PROFILERS = {
+    "rss": profile_rss,
+    "tracemalloc": profile_tracemalloc,
+    "arrow": profile_arrow,
+    "scalene": profile_scalene,
+}
+
+
+def get_profiler(name: str | None = None) -> Callable[..., dict]:
+    """Profiler by name, defaults to the PROFILER environment variable or rss"""
+    name = name or os.getenv("PROFILER", "rss")
+    if name not in PROFILERS:
+        raise ValueError(f"Unknown profiler {name!r}, use one of {list(PROFILERS)}")
+    return PROFILERS[name]
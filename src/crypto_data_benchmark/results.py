@@ -0,0 +1,240 @@
+import datetime
+import hashlib
+import importlib.metadata
+import json
+import os
+import pathlib
+import platform
+import subprocess
+
+import numpy as np
+import polars as pl
+
+RESULTS_DIR = pathlib.Path("results")
+# engines and libraries whose upgrades runs are compared across
+PACKAGES = [
+    "arcticdb",
+    "chdb",
+    "deltalake",
+    "duckdb",
+    "lancedb",
+    "numpy",
+    "pandas",
+    "polars",
+    "pyarrow",
+    "tiledb",
+]
+FINGERPRINT_SAMPLES = 1_000
+# relative change of a metric that is still considered noise
+NOISE_THRESHOLD = 0.1
+CONFIDENCE = 0.95
+BOOTSTRAP_SAMPLES = 2_000
+# metrics named like this are throughputs or correctness, everything else is
+# a time or a size where lower is better
+HIGHER_IS_BETTER = ("_per_s", "recall", "matches")
+
+
+def package_versions() -> dict[str, str | None]:
+    """Installed version of every benchmarked package, None if it is missing"""
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def host_info() -> dict:
+    """The machine and interpreter the benchmarks ran on"""
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "memory": os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"),
+        "python": platform.python_version(),
+    }
+
+
+def git_commit() -> str | None:
+    """Commit of the benchmark code, None outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_fingerprint(data: pl.DataFrame, samples: int = FINGERPRINT_SAMPLES) -> str:
+    """Hash of the schema, the row count and evenly spaced sample rows
+
+    Python values of the rows hash the same with every Polars version, unlike
+    hash_rows or a serialized file.
+    """
+    sample = data.gather_every(max(1, data.height // samples))
+    digest = hashlib.sha256()
+    schema = [(name, str(dtype)) for name, dtype in data.schema.items()]
+    digest.update(repr(schema).encode())
+    digest.update(str(data.height).encode())
+    for row in sample.iter_rows():
+        digest.update(repr(row).encode())
+    return digest.hexdigest()[:16]
+
+
+def result_records(trials: list[list[dict]], keys: tuple[str, ...]) -> pl.DataFrame:
+    """One row per case, trial and numeric metric
+
+    The key columns identify the case, such as the provider name and the
+    client count. Other non numeric values are left out.
+    """
+    rows = []
+    for trial, results in enumerate(trials):
+        for result in results:
+            case = ", ".join(str(result[key]) for key in keys if key in result)
+            for metric, value in result.items():
+                if metric in keys or isinstance(value, str) or value is None:
+                    continue
+                rows.append((case, trial, metric, float(value)))
+    return pl.DataFrame(
+        rows,
+        schema={
+            "case": pl.String,
+            "trial": pl.Int64,
+            "metric": pl.String,
+            "value": pl.Float64,
+        },
+        orient="row",
+    )
+
+
+def case_frame(records: pl.DataFrame, keys: tuple[str, ...]) -> pl.DataFrame:
+    """Records of one run back in one row per case and trial, with the key
+    columns split out of the case as strings and a column per metric"""
+    return (
+        records.pivot("metric", index=["case", "trial"], values="value")
+        .with_columns(
+            pl.col("case")
+            .str.split_exact(", ", len(keys) - 1)
+            .struct.rename_fields(list(keys))
+        )
+        .unnest("case")
+    )
+
+
+def save_run(
+    mode: str,
+    trials: list[list[dict]],
+    keys: tuple[str, ...] = ("name",),
+    dataset: str | None = None,
+    config: dict | None = None,
+    results_dir: pathlib.Path = RESULTS_DIR,
+) -> pathlib.Path:
+    """Write all trials of a run to one Parquet file, together with the package
+    versions, host, commit, dataset and config needed to compare it later"""
+    started_at = datetime.datetime.now()
+    run_id = f"{started_at:%Y%m%dT%H%M%S.%f}-{mode}"
+    records = result_records(trials, keys).with_columns(
+        run_id=pl.lit(run_id),
+        started_at=pl.lit(started_at),
+        mode=pl.lit(mode),
+        dataset=pl.lit(dataset, pl.String),
+        commit=pl.lit(git_commit(), pl.String),
+        host=pl.lit(json.dumps(host_info())),
+        versions=pl.lit(json.dumps(package_versions())),
+        config=pl.lit(json.dumps(config or {})),
+    )
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"{run_id}.parquet"
+    records.write_parquet(path)
+    return path
+
+
+def load_runs(results_dir: pathlib.Path = RESULTS_DIR) -> pl.DataFrame:
+    """Records of every saved run"""
+    return pl.read_parquet(results_dir / "*.parquet")
+
+
+def change_interval(
+    baseline: np.ndarray,
+    candidate: np.ndarray,
+    confidence: float = CONFIDENCE,
+    samples: int = BOOTSTRAP_SAMPLES,
+    seed: int = 42,
+) -> tuple[float, float, float]:
+    """Relative change of the mean from the baseline to the candidate trials and
+    its bootstrap confidence interval
+
+    With a single trial on each side the interval is just the change.
+    """
+    rng = np.random.default_rng(seed)
+    baseline_means = rng.choice(baseline, (samples, len(baseline))).mean(axis=1)
+    candidate_means = rng.choice(candidate, (samples, len(candidate))).mean(axis=1)
+    changes = candidate_means / baseline_means - 1
+    tail = (1 - confidence) / 2
+    low, high = np.quantile(changes, [tail, 1 - tail])
+    return float(candidate.mean() / baseline.mean() - 1), float(low), float(high)
+
+
+def compare_runs(
+    baseline: pl.DataFrame,
+    candidate: pl.DataFrame,
+    threshold: float = NOISE_THRESHOLD,
+    confidence: float = CONFIDENCE,
+) -> pl.DataFrame:
+    """Change of every metric both runs measured, flagged as a regression or an
+    improvement when the whole confidence interval is beyond the threshold
+
+    Metrics that were zero in the baseline have no relative change and are
+    left out. A side with a single trial has no spread to tell noise from a
+    change, a change beyond the threshold is then marked "no interval" and
+    never flagged.
+    """
+
+    def trials(run: pl.DataFrame) -> pl.DataFrame:
+        return run.group_by("case", "metric").agg(pl.col("value"))
+
+    pairs = trials(baseline).join(
+        trials(candidate), on=["case", "metric"], suffix="_candidate"
+    )
+    rows = []
+    for case, metric, before, after in pairs.iter_rows():
+        before, after = np.array(before), np.array(after)
+        if before.mean() == 0:
+            continue
+        if min(len(before), len(after)) < 2:
+            change = float(after.mean() / before.mean() - 1)
+            status = "no interval" if abs(change) > threshold else ""
+            rows.append(
+                (case, metric, before.mean(), after.mean(), change, None, None, status)
+            )
+            continue
+        change, low, high = change_interval(before, after, confidence)
+        # positive when the candidate got worse
+        if any(name in metric for name in HIGHER_IS_BETTER):
+            worse_low, worse_high = -high, -low
+        else:
+            worse_low, worse_high = low, high
+        status = ""
+        if worse_low > threshold:
+            status = "regression"
+        elif worse_high < -threshold:
+            status = "improvement"
+        rows.append(
+            (case, metric, before.mean(), after.mean(), change, low, high, status)
+        )
+    return pl.DataFrame(
+        rows,
+        schema={
+            "case": pl.String,
+            "metric": pl.String,
+            "baseline": pl.Float64,
+            "candidate": pl.Float64,
+            "change": pl.Float64,
+            "change_low": pl.Float64,
+            "change_high": pl.Float64,
+            "status": pl.String,
+        },
+        orient="row",
+    ).sort("status", "case", "metric", descending=[True, False, False])
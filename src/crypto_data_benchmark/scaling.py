@@ -0,0 +1,114 @@
+import numpy as np
+import polars as pl
+
+from crypto_data_benchmark.results import HIGHER_IS_BETTER
+
+# times, latencies, throughputs and memory are fitted, sizes and counts are not
+SCALING_METRICS = ("_time", "_p50", "_per_s", "_warm", "peak_memory")
+# a segment of a curve steeper than this grows faster than the data, the scale
+# it ends at is where the engine tips over
+TIPPING_EXPONENT = 1.2
+
+
+def scaling_curves(results: pl.DataFrame) -> pl.DataFrame:
+    """Mean cost of every provider, metric, thread limit and scale
+
+    Throughputs are inverted into the time per row, so for every metric a
+    higher cost is worse.
+    """
+    metrics = [
+        column
+        for column in results.columns
+        if any(column.endswith(suffix) for suffix in SCALING_METRICS)
+    ]
+    inverted = pl.col("metric").str.contains("|".join(HIGHER_IS_BETTER))
+    return (
+        results.unpivot(
+            metrics, index=["name", "scale", "threads"], variable_name="metric"
+        )
+        .filter(pl.col("value") > 0)
+        .with_columns(
+            cost=pl.when(inverted).then(1 / pl.col("value")).otherwise(pl.col("value"))
+        )
+        .group_by("name", "metric", "threads", "scale")
+        .agg(pl.col("cost").mean())
+        .sort("name", "metric", "threads", "scale")
+    )
+
+
+def fit_complexity(curves: pl.DataFrame) -> pl.DataFrame:
+    """Exponent k of cost ~ scale^k fitted on the log-log curve of every
+    provider, metric and thread limit with at least two scales
+
+    Total times such as ingestion_time grow linearly with k near 1 and point
+    lookup latencies stay flat with k near 0. Throughputs are fitted as the
+    time per row, so a linear scan has k near 0 as well and k above 0 means
+    every row gets more expensive. The steepest segment shows where a curve
+    bends upwards.
+    """
+    rows = []
+    for (name, metric, threads), curve in curves.group_by(
+        "name", "metric", "threads", maintain_order=True
+    ):
+        if curve.height < 2:
+            continue
+        x = np.log(curve["scale"].to_numpy())
+        y = np.log(curve["cost"].to_numpy())
+        exponent, intercept = np.polyfit(x, y, 1)
+        residuals = y - (exponent * x + intercept)
+        total = ((y - y.mean()) ** 2).sum()
+        r2 = 1 - (residuals**2).sum() / total if total > 0 else 1.0
+        slopes = np.diff(y) / np.diff(x)
+        steepest = int(np.argmax(slopes))
+        tipping = [
+            scale
+            for scale, slope in zip(curve["scale"][1:], slopes)
+            if slope > TIPPING_EXPONENT
+        ]
+        rows.append(
+            (
+                name,
+                metric,
+                threads,
+                float(exponent),
+                float(r2),
+                float(slopes[steepest]),
+                curve["scale"][steepest + 1],
+                tipping[0] if tipping else None,
+            )
+        )
+    return pl.DataFrame(
+        rows,
+        schema={
+            "name": pl.String,
+            "metric": pl.String,
+            "threads": pl.Int64,
+            "exponent": pl.Float64,
+            "r2": pl.Float64,
+            "steepest_exponent": pl.Float64,
+            "steepest_scale": pl.Int64,
+            "tipping_scale": pl.Int64,
+        },
+        orient="row",
+    )
+
+
+def parallel_efficiency(curves: pl.DataFrame) -> pl.DataFrame:
+    """Speedup and parallel efficiency of every thread limit over the smallest
+    one measured, per provider, metric and scale
+
+    Efficiency is the speedup divided by the growth in threads, 1 means the
+    extra cores were fully used.
+    """
+    case = ["name", "metric", "scale"]
+    return (
+        curves.with_columns(
+            base_threads=pl.col("threads").min().over(case),
+            base_cost=pl.col("cost").sort_by("threads").first().over(case),
+        )
+        .with_columns(speedup=pl.col("base_cost") / pl.col("cost"))
+        .with_columns(
+            efficiency=pl.col("speedup") * pl.col("base_threads") / pl.col("threads")
+        )
+        .drop("base_threads", "base_cost")
+    )
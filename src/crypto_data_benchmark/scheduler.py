@@ -0,0 +1,84 @@
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterator
+
+# thread pool sizes every engine reads from the environment when it is imported,
+# DuckDB and chdb have none, their providers set threads from the CPU affinity
+THREAD_VARIABLES = [
+    "POLARS_MAX_THREADS",
+    # Arrow's CPU and IO pools, Delta Lake and Parquet scans run on them
+    "OMP_NUM_THREADS",
+    "ARROW_IO_THREADS",
+    "LANCE_CPU_THREADS",
+    "LANCE_IO_THREADS",
+    "TILEDB_SM_COMPUTE_CONCURRENCY_LEVEL",
+    "TILEDB_SM_IO_CONCURRENCY_LEVEL",
+    "ARCTICDB_VersionStore_NumCPUThreads_int",
+    "ARCTICDB_VersionStore_NumIOThreads_int",
+]
+
+
+def cpu_sets(jobs: int, cpus_per_job: int = 0) -> list[set[int]]:
+    """Disjoint sets of the CPUs this process may run on, one per parallel job
+
+    With cpus_per_job at 0 the CPUs are split evenly. There are fewer sets
+    than jobs when the machine has fewer CPUs than jobs times cpus_per_job.
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    per_job = cpus_per_job or max(1, len(cpus) // max(1, jobs))
+    sets = [
+        set(cpus[start : start + per_job])
+        for start in range(0, len(cpus) - per_job + 1, per_job)
+    ]
+    return sets[:jobs] or [set(cpus)]
+
+
+def limit_threads(cpus: set[int]) -> None:
+    """Pin this process to the CPUs and size the thread pools of the engines to
+    match, only engines imported afterwards see the limit"""
+    os.sched_setaffinity(0, cpus)
+    for variable in THREAD_VARIABLES:
+        os.environ[variable] = str(len(cpus))
+
+
+def run_pinned(target: str, cpus: set[int], *args):
+    """Body of a worker: pin it to the CPUs, then import and call the target
+
+    The target is a "module:function" name that is only imported after
+    pinning, engines that size their thread pools from the CPU affinity at
+    import see just their share.
+    """
+    limit_threads(cpus)
+    module, function = target.split(":")
+    return getattr(importlib.import_module(module), function)(*args)
+
+
+def schedule(
+    target: str, tasks: list, jobs: int = 1, cpus_per_job: int = 0
+) -> Iterator[tuple[object, Future]]:
+    """Run target(task) for every task, each in a fresh interpreter pinned to
+    its own CPU set, and yield the tasks with their futures as they finish
+
+    A task only starts once a CPU set is free, so at most one task runs on
+    each CPU set at a time.
+    """
+    free = cpu_sets(jobs, cpus_per_job)
+    pending = list(tasks)
+    running = {}
+    with ProcessPoolExecutor(
+        len(free),
+        mp_context=multiprocessing.get_context("spawn"),
+        max_tasks_per_child=1,
+    ) as pool:
+        while pending or running:
+            while pending and free:
+                task, cpus = pending.pop(0), free.pop(0)
+                future = pool.submit(run_pinned, target, cpus, task)
+                running[future] = (task, cpus)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, cpus = running.pop(future)
+                free.append(cpus)
+                yield task, future
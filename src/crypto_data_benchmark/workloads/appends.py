@@ -0,0 +1,82 @@
+import pathlib
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.workloads.block_scan import benchmark_scans
+from crypto_data_benchmark.workloads.common import bytes_written, latency_percentiles
+
+APPEND_BLOCKS = 2_000
+# points at which file count, disk usage and write amplification are recorded
+GROWTH_SAMPLES = 10
+
+
+def block_batches(data: pl.DataFrame, blocks: int) -> list[pl.DataFrame]:
+    """The first blocks of the data as one frame per block, in block order"""
+    first_block = data["block_number"].min()
+    data = data.filter(pl.col("block_number") < first_block + blocks)
+    return data.sort("block_number").partition_by("block_number", maintain_order=True)
+
+
+def file_count(path: pathlib.Path) -> int:
+    """Number of files below a folder"""
+    return sum(1 for child in path.rglob("*") if child.is_file())
+
+
+def benchmark_appends(
+    db: DatabaseInterface,
+    data: pl.DataFrame,
+    blocks: int = APPEND_BLOCKS,
+    samples: int = GROWTH_SAMPLES,
+) -> tuple[dict, list[dict]]:
+    """Append one block at a time, then compact and compare scans before and after
+
+    Write amplification is the bytes written by this process divided by the
+    in memory size of the appended rows. Returns the summary and the growth
+    of latency, files and write amplification over the appends.
+    """
+    batches = block_batches(data, blocks)
+    appended = pl.concat(batches)
+    every = max(1, len(batches) // samples)
+
+    latencies = []
+    growth = []
+    appended_size = 0
+    written_before = bytes_written()
+    for i, batch in enumerate(batches, start=1):
+        start_time = time.perf_counter()
+        db.add(batch)
+        latencies.append(time.perf_counter() - start_time)
+        appended_size += batch.estimated_size()
+
+        if i % every == 0 or i == len(batches):
+            sample = {
+                "appends": i,
+                "files": file_count(db.data_dir),
+                "disk_usage": db.disk_usage(),
+                "write_amplification": (
+                    (bytes_written() - written_before) / appended_size
+                    if written_before is not None
+                    else None
+                ),
+            }
+            # latency of the appends since the previous sample
+            sample.update(latency_percentiles(latencies[-every:], "append"))
+            growth.append(sample)
+
+    metrics = latency_percentiles(latencies, "append")
+    metrics["appends"] = len(batches)
+    for key in ["files", "disk_usage", "write_amplification"]:
+        metrics[key] = growth[-1][key]
+    metrics["scan_rows_per_s"] = benchmark_scans(db, appended)["scan_medium_rows_per_s"]
+
+    start_time = time.perf_counter()
+    db.compact()
+    metrics["compact_time"] = time.perf_counter() - start_time
+    metrics["compacted_files"] = file_count(db.data_dir)
+    metrics["compacted_disk_usage"] = db.disk_usage()
+    metrics["compacted_scan_rows_per_s"] = benchmark_scans(db, appended)[
+        "scan_medium_rows_per_s"
+    ]
+    return metrics, growth
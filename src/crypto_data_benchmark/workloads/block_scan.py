@@ -0,0 +1,62 @@
+import random
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.workloads.common import bytes_read, evict_page_cache
+
+# width of the scanned range as a fraction of all blocks in the dataset
+SCAN_RANGES = {
+    "narrow": 0.001,
+    "medium": 0.01,
+    "wide": 0.1,
+}
+
+
+def sample_block_ranges(
+    data: pl.DataFrame, fraction: float, n: int, seed: int = 42
+) -> list[tuple[int, int]]:
+    """Draw n random [start, end) block ranges covering a fraction of the dataset"""
+    first_block = data["block_number"].min()
+    last_block = data["block_number"].max() + 1
+    width = max(1, int((last_block - first_block) * fraction))
+    rng = random.Random(seed)
+    starts = [rng.randrange(first_block, last_block - width + 1) for _ in range(n)]
+    return [(start, start + width) for start in starts]
+
+
+def benchmark_scans(
+    db: DatabaseInterface, data: pl.DataFrame, repetitions: int = 5
+) -> dict:
+    """Scan random narrow, medium and wide block ranges and report rows/s and bytes read
+
+    The timed scans run as warm as the steps before left the page cache. Bytes
+    read are measured by one more scan of the first range after the provider's
+    files were evicted from the page cache. Engines that cache pages themselves
+    may still read less than a cold start would.
+    """
+    metrics = {}
+    for name, fraction in SCAN_RANGES.items():
+        rows = 0
+        elapsed = 0.0
+        ranges = sample_block_ranges(data, fraction, repetitions)
+        for start, end in ranges:
+            start_time = time.perf_counter()
+            result = db.scan_block_range(start, end)
+            elapsed += time.perf_counter() - start_time
+            rows += result.height
+
+        metrics[f"scan_{name}_rows_per_s"] = rows / elapsed
+        metrics[f"scan_{name}_bytes_read"] = cold_bytes_read(db, *ranges[0])
+    return metrics
+
+
+def cold_bytes_read(db: DatabaseInterface, start: int, end: int) -> int | None:
+    """Bytes fetched from storage by one scan with the provider's files evicted"""
+    if db.data_dir.exists():
+        evict_page_cache(db.data_dir)
+    read_before = bytes_read()
+    db.scan_block_range(start, end)
+    read_after = bytes_read()
+    return read_after - read_before if read_before is not None else None
@@ -0,0 +1,57 @@
+import os
+import pathlib
+
+import numpy as np
+
+
+def latency_percentiles(latencies: list[float], prefix: str) -> dict:
+    """p50/p99 of a list of latencies in seconds, keyed with the given prefix"""
+    return {
+        f"{prefix}_p50": float(np.percentile(latencies, 50)),
+        f"{prefix}_p99": float(np.percentile(latencies, 99)),
+    }
+
+
+def bytes_read() -> int | None:
+    """Bytes this process has fetched from storage, None where /proc is missing
+
+    Unlike rchar this includes pages faulted in through memory maps, which is
+    how Polars reads Parquet and Arrow IPC. Reads served from the page cache
+    count nothing, evict the files first to measure them.
+    """
+    return proc_io("read_bytes")
+
+
+def bytes_written() -> int | None:
+    """Bytes this process has written through write syscalls, None where /proc is missing"""
+    return proc_io("wchar")
+
+
+def proc_io(field: str) -> int | None:
+    """A counter from /proc/self/io"""
+    try:
+        with open("/proc/self/io") as file:
+            for line in file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1])
+    except FileNotFoundError:
+        return None
+
+
+def evict_page_cache(path: pathlib.Path) -> None:
+    """Drop the cached pages of a file or of every file below a folder
+
+    Dirty pages are flushed first, the kernel only drops clean ones. Unlike
+    writing to /proc/sys/vm/drop_caches this needs no root and leaves the
+    cache of everything else alone.
+    """
+    files = path.rglob("*") if path.is_dir() else [path]
+    for file in files:
+        if not file.is_file():
+            continue
+        fd = os.open(file, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
@@ -0,0 +1,61 @@
+import multiprocessing
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import polars as pl
+
+from crypto_data_benchmark.data.arrow_ipc import read_ipc
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.workloads.common import evict_page_cache
+from crypto_data_benchmark.workloads.steps import READ_STEPS
+
+Step = Callable[[DatabaseInterface, pl.DataFrame], dict]
+
+
+def run_step(
+    step: Step,
+    db: DatabaseInterface,
+    data_path: pathlib.Path,
+    setup: bool,
+    cold: bool,
+) -> tuple[dict, DatabaseInterface]:
+    """Body of the child process: map the data, open the provider, run the step
+
+    The input is faulted in before the step, as in process runs where it is
+    already resident, so the peak memory of the step doesn't count it.
+    """
+    data = read_ipc(data_path, resident=True)
+    if setup:
+        db.setup()
+    else:
+        if cold and step in READ_STEPS:
+            evict_page_cache(db.data_dir)
+        db.open()
+    try:
+        metrics = step(db, data)
+    finally:
+        db.close()
+    return metrics, db
+
+
+def run_isolated(
+    step: Step,
+    db: DatabaseInterface,
+    data_path: pathlib.Path,
+    setup: bool = False,
+    cold: bool = False,
+) -> tuple[dict, DatabaseInterface]:
+    """Run one workload step on a provider in a fresh interpreter
+
+    Nothing the previous steps allocated, imported or cached in process
+    survives, the child starts from a clean heap and engine caches. The
+    provider is closed at the end of the step and sent back to the parent,
+    so paths and counters set by setup reach the next step. With cold the
+    provider's files are evicted from the OS page cache before it is opened
+    for one of the READ_STEPS.
+    """
+    with ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        return pool.submit(run_step, step, db, data_path, setup, cold).result()
@@ -0,0 +1,112 @@
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.workloads.common import latency_percentiles
+
+CONCURRENCY_LEVELS = [1, 2, 4, 8]
+# share of point lookups in the request mix, the rest are narrow block range scans
+LOOKUP_FRACTION = 0.8
+
+
+def client_loop(
+    db: DatabaseInterface,
+    tx_hashes: list,
+    block_ranges: list[tuple[int, int]],
+    duration: float,
+    seed: int,
+) -> dict[str, list[float]]:
+    """Fire random lookups and scans until the duration is over, one at a time"""
+    rng = random.Random(seed)
+    latencies = {"lookup": [], "scan": []}
+    deadline = time.perf_counter() + duration
+    while (start_time := time.perf_counter()) < deadline:
+        if rng.random() < LOOKUP_FRACTION:
+            db.lookup_by_tx_hash(rng.choice(tx_hashes))
+            latencies["lookup"].append(time.perf_counter() - start_time)
+        else:
+            db.scan_block_range(*rng.choice(block_ranges))
+            latencies["scan"].append(time.perf_counter() - start_time)
+    return latencies
+
+
+def thread_client(db: DatabaseInterface, *args) -> dict[str, list[float]]:
+    """Run a client on its own reader handle"""
+    reader = db.reader()
+    try:
+        return client_loop(reader, *args)
+    finally:
+        # shared readers are the provider itself and stay open
+        if reader is not db:
+            reader.close()
+
+
+def process_client(db: DatabaseInterface, *args) -> dict[str, list[float]]:
+    """Run a client in a worker process on a read only handle"""
+    db.open(read_only=True)
+    try:
+        return client_loop(db, *args)
+    finally:
+        db.close()
+
+
+def run_clients(
+    db: DatabaseInterface,
+    mode: str,
+    clients: int,
+    tx_hashes: list,
+    block_ranges: list[tuple[int, int]],
+    duration: float,
+) -> dict:
+    """Run concurrent clients in threads or processes and aggregate their latencies"""
+    # one seed per client, map stops after the last one
+    args = (repeat(db), repeat(tx_hashes), repeat(block_ranges), repeat(duration))
+    args += (range(clients),)
+    if mode == "threads":
+        with ThreadPoolExecutor(clients) as pool:
+            results = list(pool.map(thread_client, *args))
+    else:
+        # the parent has to let go of the data so the workers can open it
+        db.close()
+        try:
+            with ProcessPoolExecutor(
+                clients, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                results = list(pool.map(process_client, *args))
+        finally:
+            db.open()
+
+    # clients start at slightly different times but each runs for the duration
+    lookups = [latency for result in results for latency in result["lookup"]]
+    scans = [latency for result in results for latency in result["scan"]]
+    metrics = {
+        "mode": mode,
+        "clients": clients,
+        "ops_per_s": (len(lookups) + len(scans)) / duration,
+    }
+    metrics.update(latency_percentiles(lookups or [float("nan")], "lookup"))
+    metrics.update(latency_percentiles(scans or [float("nan")], "scan"))
+    return metrics
+
+
+def benchmark_load(
+    db: DatabaseInterface,
+    tx_hashes: list,
+    block_ranges: list[tuple[int, int]],
+    concurrency_levels: list[int] = CONCURRENCY_LEVELS,
+    duration: float = 10.0,
+) -> list[dict]:
+    """Throughput and latency as the number of thread and process clients grows"""
+    results = []
+    modes = ["threads"]
+    if getattr(db, "process_safe", True):
+        modes.append("processes")
+    for mode in modes:
+        for clients in concurrency_levels:
+            results.append(
+                run_clients(db, mode, clients, tx_hashes, block_ranges, duration)
+            )
+    return results
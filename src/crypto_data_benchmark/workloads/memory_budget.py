@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import pathlib
+import resource
+import threading
+import time
+from multiprocessing.connection import Connection
+
+import polars as pl
+
+from crypto_data_benchmark.data.arrow_ipc import read_ipc
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.profilers import PAGE_SIZE, profile_rss
+from crypto_data_benchmark.workloads.queries import (
+    QUERIES,
+    address_labels,
+    query_parameters,
+    results_match,
+    run_query,
+)
+
+# budgets in MiB, each one halves the previous
+MEMORY_BUDGETS = [4096, 2048, 1024, 512]
+# aggregations whose state grows with the number of distinct addresses
+HEAVY_QUERIES = ["top_senders", "distinct_counterparties", "labeled_volume"]
+# thread stacks and allocator arenas reserve address space they never touch,
+# the address space limit is this many budgets above what the engines mapped
+ADDRESS_SPACE_HEADROOM = 2
+# the limits that cap a run, the engine's own setting or RLIMIT_AS
+ENGINE_LIMIT = "engine"
+ADDRESS_SPACE_LIMIT = "address space"
+SPILL_SAMPLE_INTERVAL = 0.01
+# seconds before a budget is given up, a Polars thread that hits the address
+# space limit dies and leaves the main thread waiting for it forever
+BUDGET_TIMEOUT = 1_800
+
+
+def directory_size(path: pathlib.Path) -> int:
+    """Bytes allocated on disk by the files below path, 0 if it doesn't exist"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_blocks * 512
+            except FileNotFoundError:
+                # spill files are deleted while we walk
+                pass
+    return total
+
+
+class SpillSampler(threading.Thread):
+    def __init__(
+        self, path: pathlib.Path | None, interval: float = SPILL_SAMPLE_INTERVAL
+    ):
+        """Background thread that records the largest size of the spill folder,
+        engines delete their spill files as soon as an operator finishes"""
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while self.path is not None and not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, directory_size(self.path))
+
+    def stop(self) -> int:
+        """Stop sampling and return the peak size"""
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def budget_limit(db: DatabaseInterface) -> str:
+    """The limit that caps the provider, its own memory setting if it enforces one
+
+    Engines with such a setting aren't capped by RLIMIT_AS too, the address
+    space their thread stacks and arenas reserve would fail them at budgets
+    their memory use stays under. A limit_memory that only changes how the
+    queries run, like the streaming engine of Parquet and Delta, caps nothing.
+    """
+    return ENGINE_LIMIT if getattr(db, "caps_memory", False) else ADDRESS_SPACE_LIMIT
+
+
+def limit_address_space(budget: int) -> None:
+    """Backstop for engines without a memory setting, allocations beyond the
+    address space mapped so far plus ADDRESS_SPACE_HEADROOM budgets fail"""
+    with open("/proc/self/statm") as file:
+        mapped = int(file.read().split()[0]) * PAGE_SIZE
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = mapped + ADDRESS_SPACE_HEADROOM * budget
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def full_range_parameters(data: pl.DataFrame) -> dict:
+    """Query parameters covering every block, the aggregations see all rows"""
+    params = query_parameters(data)
+    params["start"] = data["block_number"].min()
+    params["end"] = data["block_number"].max() + 1
+    return params
+
+
+def run_under_budget(
+    db: DatabaseInterface,
+    data_path: pathlib.Path,
+    budget: int,
+    params: dict,
+    reference: dict[str, pl.DataFrame],
+) -> dict:
+    """Body of the child process: ingest and run the heavy aggregations with
+    the provider's memory capped at budget bytes
+
+    The first failing step ends the run, its name and error are recorded next
+    to the metrics of the steps before it.
+    """
+    data = read_ipc(data_path)
+    db.setup()
+    if hasattr(db, "limit_memory"):
+        db.limit_memory(budget)
+    if budget_limit(db) == ADDRESS_SPACE_LIMIT:
+        limit_address_space(budget)
+    metrics = {"failed_step": None, "error": None}
+    spill_dir = getattr(db, "spill_dir", None)
+
+    def measure(step: str, func, *args) -> dict:
+        sampler = SpillSampler(spill_dir)
+        sampler.start()
+        try:
+            return profile_rss(func, *args)
+        finally:
+            metrics[f"{step}_spill"] = sampler.stop()
+
+    step = "ingest"
+    try:
+        ingest = measure(step, db.add, data)
+        metrics["ingestion_time"] = ingest["ingestion_time"]
+        metrics["ingest_peak_memory"] = ingest["peak_memory"]
+        db.add_labels(address_labels(data))
+        for query in QUERIES:
+            if query.name not in HEAVY_QUERIES:
+                continue
+            step = f"query_{query.name}"
+            results = []
+            timing = measure(
+                step, lambda: results.append(run_query(db, query, params))
+            )
+            metrics[f"{step}_time"] = timing["ingestion_time"]
+            metrics[f"{step}_peak_memory"] = timing["peak_memory"]
+            metrics[f"{step}_matches"] = results_match(
+                results[0], reference[query.name]
+            )
+    except Exception as e:
+        metrics["failed_step"] = step
+        metrics["error"] = f"{type(e).__name__}: {e}"[:200]
+    finally:
+        db.teardown()
+    return metrics
+
+
+def send_metrics(connection: Connection, *args) -> None:
+    """Body of the child process, sends the metrics of run_under_budget back"""
+    connection.send(run_under_budget(*args))
+    connection.close()
+
+
+def run_in_child(args: tuple, timeout: float) -> dict:
+    """run_under_budget in a fresh interpreter that is killed after timeout
+
+    A plain process instead of a pool, so a hung child can be killed and a
+    crashed one is noticed as soon as its end of the pipe closes.
+    """
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=send_metrics, args=(sender, *args))
+    process.start()
+    sender.close()
+    try:
+        if receiver.poll(timeout):
+            return receiver.recv()
+        return {"failed_step": "unknown", "error": f"timed out after {timeout} s"}
+    except EOFError:
+        return {"failed_step": "unknown", "error": "process crashed"}
+    finally:
+        process.kill()
+        process.join()
+
+
+def benchmark_memory_budgets(
+    db: DatabaseInterface,
+    data: pl.DataFrame,
+    data_path: pathlib.Path,
+    budgets: list[int] = MEMORY_BUDGETS,
+    timeout: float = BUDGET_TIMEOUT,
+) -> list[dict]:
+    """Run ingestion and the heavy aggregations at budgets in MiB, each in
+    a fresh interpreter so a budget never inherits the caches of a larger one
+
+    Engines that abort on allocation failure take their process with them,
+    the budget is then recorded as crashed or timed out without metrics.
+    """
+    params = full_range_parameters(data)
+    labels = address_labels(data)
+    reference = {
+        query.name: query.polars(data.lazy(), labels.lazy(), params).collect()
+        for query in QUERIES
+        if query.name in HEAVY_QUERIES
+    }
+    results = []
+    for budget in budgets:
+        start_time = time.perf_counter()
+        args = (db, data_path, budget * 2**20, params, reference)
+        metrics = run_in_child(args, timeout)
+        # recorded for crashed children too, to tell which limit failed them
+        metrics["limit"] = budget_limit(db)
+        metrics["budget"] = budget
+        metrics["total_time"] = time.perf_counter() - start_time
+        results.append(metrics)
+    # setup deletes whatever a crashed child left behind
+    db.setup()
+    db.teardown()
+    return results
@@ -0,0 +1,69 @@
+import itertools
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.dbs.parquet_provider import ParquetProvider
+from crypto_data_benchmark.workloads.block_scan import benchmark_scans
+
+# (codec, level) pairs, lz4 and snappy have no levels
+PARQUET_CODECS = [
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 9),
+    ("lz4", None),
+    ("snappy", None),
+]
+PARQUET_ROW_GROUP_SIZES = [100_000, 1_000_000]
+
+
+def parquet_write_configs() -> list[dict]:
+    """All ParquetProvider write options in the matrix
+
+    The native Polars writer can't turn dictionary encoding off, so those
+    combinations only run with pyarrow.
+    """
+    configs = []
+    for (codec, level), row_group_size, statistics, dictionary, use_pyarrow in (
+        itertools.product(
+            PARQUET_CODECS,
+            PARQUET_ROW_GROUP_SIZES,
+            [True, False],
+            [True, False],
+            [False, True],
+        )
+    ):
+        if not dictionary and not use_pyarrow:
+            continue
+        configs.append(
+            {
+                "compression": codec,
+                "compression_level": level,
+                "row_group_size": row_group_size,
+                "statistics": statistics,
+                "dictionary": dictionary,
+                "use_pyarrow": use_pyarrow,
+            }
+        )
+    return configs
+
+
+def benchmark_parquet_matrix(data: pl.DataFrame) -> list[dict]:
+    """Write the data with every config and report size, write throughput and scan speed"""
+    data_size = data.estimated_size()
+    results = []
+    for config in parquet_write_configs():
+        db = ParquetProvider(**config)
+        db.setup()
+        start_time = time.perf_counter()
+        db.add(data)
+        write_time = time.perf_counter() - start_time
+
+        metrics = dict(config)
+        metrics["disk_usage"] = db.disk_usage()
+        metrics["write_time"] = write_time
+        metrics["write_mb_per_s"] = data_size / write_time / 1e6
+        metrics.update(benchmark_scans(db, data))
+        results.append(metrics)
+        db.teardown()
+    return results
@@ -0,0 +1,25 @@
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.dbs.common import DatabaseInterface
+from crypto_data_benchmark.workloads.common import latency_percentiles
+
+
+def sample_tx_hashes(data: pl.DataFrame, n: int, seed: int = 42) -> list:
+    """Draw n random transaction hashes that exist in the dataset"""
+    return (
+        data["transaction_hash"].sample(n, with_replacement=True, seed=seed).to_list()
+    )
+
+
+def benchmark_lookups(db: DatabaseInterface, tx_hashes: list, prefix: str) -> dict:
+    """Time one lookup per hash and return the latency percentiles"""
+    latencies = []
+    for tx_hash in tx_hashes:
+        start_time = time.perf_counter()
+        result = db.lookup_by_tx_hash(tx_hash)
+        latencies.append(time.perf_counter() - start_time)
+        if result.height == 0:
+            raise ValueError(f"Lookup of {tx_hash!r} returned no rows")
+    return latency_percentiles(latencies, prefix)
@@ -0,0 +1,310 @@
+import time
+from typing import Callable
+
+import numpy as np
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from crypto_data_benchmark.workloads.block_scan import sample_block_ranges
+
+LABELS = ["exchange", "defi", "bridge", "mev", "wallet"]
+
+# table names and binary literal syntax for each SQL engine, SQLite has no unhex
+# before 3.41 and DuckDB reads X'..' as a string
+SQL_DIALECTS = {
+    "duckdb": {
+        "transfers": "transfers",
+        "labels": "address_labels",
+        "binary": "from_hex('{}')",
+    },
+    "sqlite": {
+        "transfers": "transfers",
+        "labels": "address_labels",
+        "binary": "X'{}'",
+    },
+    "clickhouse": {
+        "transfers": "benchmarks.transfers",
+        "labels": "benchmarks.address_labels",
+        "binary": "unhex('{}')",
+    },
+}
+
+
+class Query:
+    def __init__(
+        self,
+        name: str,
+        sql: str,
+        polars: Callable[[pl.LazyFrame, pl.LazyFrame, dict], pl.LazyFrame],
+    ):
+        """A query as a SQL template and the same query on Polars lazy frames
+
+        The SQL template is formatted with the dialect table names and the
+        parameters, {addresses} becomes a list of binary literals. The Polars
+        version gets the transfers, the address labels and the parameters.
+        """
+        self.name = name
+        self.sql = sql
+        self.polars = polars
+
+    def to_sql(self, dialect: str, params: dict) -> str:
+        """Render the SQL template for one engine"""
+        tables = SQL_DIALECTS[dialect]
+        addresses = ", ".join(
+            tables["binary"].format(address.hex()) for address in params["addresses"]
+        )
+        return self.sql.format(
+            transfers=tables["transfers"],
+            labels=tables["labels"],
+            start=params["start"],
+            end=params["end"],
+            addresses=addresses,
+        )
+
+
+def in_range(params: dict) -> pl.Expr:
+    return (pl.col("block_number") >= params["start"]) & (
+        pl.col("block_number") < params["end"]
+    )
+
+
+def top_by_volume(column: str) -> Callable:
+    def query(transfers: pl.LazyFrame, labels: pl.LazyFrame, params: dict):
+        return (
+            transfers.filter(in_range(params))
+            .group_by(pl.col(column).alias("address"))
+            .agg(volume=pl.col("value").sum(), transfers=pl.len())
+            .sort(["volume", "address"], descending=[True, False])
+            .head(10)
+        )
+
+    return query
+
+
+def transfers_per_block(transfers: pl.LazyFrame, labels: pl.LazyFrame, params: dict):
+    return (
+        transfers.filter(in_range(params))
+        .group_by("block_number")
+        .agg(transfers=pl.len())
+        .sort("block_number")
+    )
+
+
+def net_flow(transfers: pl.LazyFrame, labels: pl.LazyFrame, params: dict):
+    addresses = pl.lit(params["addresses"], dtype=pl.List(pl.Binary)).explode()
+    transfers = transfers.filter(in_range(params))
+    inflow = transfers.filter(pl.col("to").is_in(addresses)).select(
+        address=pl.col("to"), amount=pl.col("value")
+    )
+    outflow = transfers.filter(pl.col("from").is_in(addresses)).select(
+        address=pl.col("from"), amount=-pl.col("value")
+    )
+    return (
+        pl.concat([inflow, outflow])
+        .group_by("address")
+        .agg(net_flow=pl.col("amount").sum())
+        .sort("address")
+    )
+
+
+def distinct_counterparties(
+    transfers: pl.LazyFrame, labels: pl.LazyFrame, params: dict
+):
+    return (
+        transfers.filter(in_range(params))
+        .group_by(pl.col("from").alias("address"))
+        .agg(counterparties=pl.col("to").n_unique())
+        .sort(["counterparties", "address"], descending=[True, False])
+        .head(10)
+    )
+
+
+def labeled_volume(transfers: pl.LazyFrame, labels: pl.LazyFrame, params: dict):
+    return (
+        transfers.filter(in_range(params))
+        .join(labels, left_on="to", right_on="address")
+        .group_by("label")
+        .agg(volume=pl.col("value").sum(), transfers=pl.len())
+        .sort("label")
+    )
+
+
+RANGE = "block_number >= {start} AND block_number < {end}"
+
+QUERIES = [
+    Query(
+        "top_senders",
+        f"""
+        SELECT "from" AS address, sum(value) AS volume, count(*) AS transfers
+        FROM {{transfers}} WHERE {RANGE}
+        GROUP BY "from" ORDER BY volume DESC, address LIMIT 10
+        """,
+        top_by_volume("from"),
+    ),
+    Query(
+        "top_receivers",
+        f"""
+        SELECT "to" AS address, sum(value) AS volume, count(*) AS transfers
+        FROM {{transfers}} WHERE {RANGE}
+        GROUP BY "to" ORDER BY volume DESC, address LIMIT 10
+        """,
+        top_by_volume("to"),
+    ),
+    Query(
+        "transfers_per_block",
+        f"""
+        SELECT block_number, count(*) AS transfers
+        FROM {{transfers}} WHERE {RANGE}
+        GROUP BY block_number ORDER BY block_number
+        """,
+        transfers_per_block,
+    ),
+    Query(
+        "net_flow",
+        f"""
+        SELECT address, sum(amount) AS net_flow FROM (
+            SELECT "to" AS address, value AS amount FROM {{transfers}}
+            WHERE {RANGE} AND "to" IN ({{addresses}})
+            UNION ALL
+            SELECT "from" AS address, -value AS amount FROM {{transfers}}
+            WHERE {RANGE} AND "from" IN ({{addresses}})
+        ) AS flows
+        GROUP BY address ORDER BY address
+        """,
+        net_flow,
+    ),
+    Query(
+        "distinct_counterparties",
+        f"""
+        SELECT "from" AS address, count(DISTINCT "to") AS counterparties
+        FROM {{transfers}} WHERE {RANGE}
+        GROUP BY "from" ORDER BY counterparties DESC, address LIMIT 10
+        """,
+        distinct_counterparties,
+    ),
+    Query(
+        "labeled_volume",
+        """
+        SELECT l.label AS label, sum(t.value) AS volume, count(*) AS transfers
+        FROM {transfers} AS t JOIN {labels} AS l ON t."to" = l.address
+        WHERE t.block_number >= {start} AND t.block_number < {end}
+        GROUP BY l.label ORDER BY label
+        """,
+        labeled_volume,
+    ),
+]
+
+
+def address_labels(data: pl.DataFrame, n: int = 1_000, seed: int = 42) -> pl.DataFrame:
+    """Label n random receiving addresses, a stand in for our address label table
+
+    Small datasets with fewer than n receivers get every receiver labeled.
+    """
+    addresses = data["to"].unique().sort()
+    addresses = addresses.sample(
+        min(n, len(addresses)), seed=seed, with_replacement=False
+    )
+    return pl.DataFrame(
+        {
+            "address": addresses,
+            "label": [LABELS[i % len(LABELS)] for i in range(len(addresses))],
+        }
+    )
+
+
+def query_parameters(data: pl.DataFrame, n_addresses: int = 5) -> dict:
+    """A wide block range and the most active senders as the address set"""
+    start, end = sample_block_ranges(data, 0.1, 1)[0]
+    addresses = (
+        data["from"].value_counts(sort=True).head(n_addresses)["from"].sort().to_list()
+    )
+    return {"start": start, "end": end, "addresses": addresses}
+
+
+def run_query(db, query: Query, params: dict) -> pl.DataFrame:
+    """Run a query as SQL or on the provider's lazy frames, whichever it supports"""
+    if hasattr(db, "query_sql"):
+        return db.query_sql(query.to_sql(db.sql_dialect, params))
+    transfers = db.lazy_block_range(params["start"], params["end"])
+    engine = getattr(db, "polars_engine", "auto")
+    return query.polars(transfers, db.lazy_labels(), params).collect(engine=engine)
+
+
+def reference_results(
+    data: pl.DataFrame, labels: pl.DataFrame, params: dict
+) -> dict[str, pl.DataFrame]:
+    """Expected result of every query, computed in memory with Polars"""
+    return {
+        query.name: query.polars(data.lazy(), labels.lazy(), params).collect()
+        for query in QUERIES
+    }
+
+
+def results_match(result: pl.DataFrame, expected: pl.DataFrame) -> bool:
+    """Compare a result to the reference, ignoring integer widths and float summation order
+
+    Columns that are decimals in the reference hold exact values and must
+    match exactly, a float result is converted as is and differs when it lost
+    digits.
+    """
+
+    def normalize(df: pl.DataFrame) -> pl.DataFrame:
+        return df.with_columns(
+            pl.col(name).cast(pl.Float64)
+            for name, dtype in df.schema.items()
+            if dtype.is_numeric()
+        )
+
+    if result.columns != expected.columns or result.height != expected.height:
+        return False
+    if result.height == 0:
+        return True
+    decimals = {
+        name: dtype
+        for name, dtype in expected.schema.items()
+        if isinstance(dtype, pl.Decimal)
+    }
+    try:
+        exact = result.select(
+            pl.col(name).cast(dtype, strict=False) for name, dtype in decimals.items()
+        )
+    except pl.exceptions.PolarsError:
+        return False
+    if not exact.equals(expected.select(*decimals)):
+        return False
+    try:
+        assert_frame_equal(
+            normalize(result.drop(*decimals)),
+            normalize(expected.drop(*decimals)),
+            check_dtypes=False,
+            rel_tol=1e-6,
+        )
+    except AssertionError:
+        return False
+    return True
+
+
+def benchmark_queries(
+    db, params: dict, reference: dict[str, pl.DataFrame], repetitions: int = 5
+) -> dict:
+    """Time the first (cold) and the median of repeated (warm) runs of every query
+
+    The first run still benefits from the OS page cache, it is cold for the
+    engine's own caches only.
+    """
+    metrics = {}
+    for query in QUERIES:
+        start_time = time.perf_counter()
+        result = run_query(db, query, params)
+        metrics[f"query_{query.name}_cold"] = time.perf_counter() - start_time
+
+        latencies = []
+        for _ in range(repetitions):
+            start_time = time.perf_counter()
+            run_query(db, query, params)
+            latencies.append(time.perf_counter() - start_time)
+        metrics[f"query_{query.name}_warm"] = float(np.median(latencies))
+        metrics[f"query_{query.name}_matches"] = results_match(
+            result, reference[query.name]
+        )
+    return metrics
@@ -0,0 +1,106 @@
+import random
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.dbs.common import DatabaseInterface, block_range_filter
+from crypto_data_benchmark.workloads.appends import file_count
+from crypto_data_benchmark.workloads.block_scan import benchmark_scans
+from crypto_data_benchmark.workloads.common import latency_percentiles
+
+REORGS = 20
+# blocks replaced by every reorg, most reorgs on mainnet are one or two deep
+REORG_DEPTH = 3
+# share of the orphaned logs that the canonical fork includes again
+KEPT_LOGS = 0.5
+
+
+def reorg_ranges(
+    data: pl.DataFrame, depth: int, n: int, seed: int = 42
+) -> list[tuple[int, int]]:
+    """n random [start, end) ranges of depth blocks anywhere in the dataset
+
+    Not only the tip, a correction of old blocks has to rewrite the same
+    files and parts as a reorg of new ones once they were compacted.
+    """
+    first_block = data["block_number"].min()
+    last_block = data["block_number"].max() + 1
+    rng = random.Random(seed)
+    starts = [rng.randrange(first_block, last_block - depth + 1) for _ in range(n)]
+    return [(start, start + depth) for start in starts]
+
+
+def canonical_blocks(
+    data: pl.DataFrame, start: int, end: int, seed: int = 42
+) -> pl.DataFrame:
+    """The blocks [start, end) of the winning fork, a random share of their logs"""
+    orphaned = data.filter(block_range_filter(start, end))
+    return orphaned.sample(fraction=KEPT_LOGS, seed=seed).sort(
+        "block_number", "log_index"
+    )
+
+
+def benchmark_reorgs(
+    db: DatabaseInterface,
+    data: pl.DataFrame,
+    reorgs: int = REORGS,
+    depth: int = REORG_DEPTH,
+) -> dict:
+    """Load and compact the data, then alternate replacing and deleting block ranges
+
+    Even reorgs replace the blocks with those of the canonical fork, odd ones
+    retract them without a replacement. Scans are measured before the reorgs,
+    after them and after compacting again.
+    """
+    db.add(data)
+    db.compact()
+    metrics = {
+        "reorgs": reorgs,
+        "depth": depth,
+        "files": file_count(db.data_dir),
+        "disk_usage": db.disk_usage(),
+        "scan_rows_per_s": benchmark_scans(db, data)["scan_medium_rows_per_s"],
+    }
+
+    expected = data
+    replace_latencies = []
+    delete_latencies = []
+    ranges = reorg_ranges(data, depth, reorgs)
+    for i, (start, end) in enumerate(ranges):
+        if i % 2 == 0:
+            replacement = canonical_blocks(data, start, end, seed=i)
+            latencies = replace_latencies
+        else:
+            replacement = data.clear()
+            latencies = delete_latencies
+        start_time = time.perf_counter()
+        db.replace_blocks(start, end, replacement)
+        latencies.append(time.perf_counter() - start_time)
+        expected = pl.concat(
+            [expected.filter(~block_range_filter(start, end)), replacement]
+        )
+
+    # fewer than two reorgs leave deletes or replacements without a sample
+    metrics.update(latency_percentiles(replace_latencies or [float("nan")], "replace"))
+    metrics.update(latency_percentiles(delete_latencies or [float("nan")], "delete"))
+    metrics["reorged_files"] = file_count(db.data_dir)
+    metrics["reorged_disk_usage"] = db.disk_usage()
+    metrics["reorged_scan_rows_per_s"] = benchmark_scans(db, expected)[
+        "scan_medium_rows_per_s"
+    ]
+    # every range holds exactly the rows of the last reorg that touched it
+    metrics["reorg_matches"] = all(
+        db.scan_block_range(start, end).height
+        == expected.filter(block_range_filter(start, end)).height
+        for start, end in ranges
+    )
+
+    start_time = time.perf_counter()
+    db.compact()
+    metrics["compact_time"] = time.perf_counter() - start_time
+    metrics["compacted_files"] = file_count(db.data_dir)
+    metrics["compacted_disk_usage"] = db.disk_usage()
+    metrics["compacted_scan_rows_per_s"] = benchmark_scans(db, expected)[
+        "scan_medium_rows_per_s"
+    ]
+    return metrics
@@ -0,0 +1,175 @@
+import time
+
+import numpy as np
+import polars as pl
+
+from crypto_data_benchmark.workloads.common import latency_percentiles
+
+# orders of magnitude of the transfer value in the sent and received histograms
+VALUE_BINS = 14
+NEIGHBORS = 10
+QUERY_SAMPLES = 100
+# Lance search parameters swept for every index, None keeps the default
+NPROBES = [1, 4, 16, 64]
+REFINE_FACTORS = [None, 4, 16]
+
+
+def address_features(
+    data: pl.DataFrame, bins: int = VALUE_BINS
+) -> tuple[list[bytes], np.ndarray]:
+    """Transfer behavior of every address as a float32 vector
+
+    The share of sent and of received transfers per order of magnitude of the
+    value, followed by the log of the sent and received transfer counts and
+    of the distinct counterparties in each direction.
+    """
+    magnitude = (
+        pl.col("value").cast(pl.Float64).log10().floor().clip(0, bins - 1).cast(pl.Int64)
+    )
+    events = pl.concat(
+        [
+            data.select(address=pl.col("from"), bin=magnitude),
+            data.select(address=pl.col("to"), bin=magnitude + bins),
+        ]
+    )
+    addresses = events["address"].unique().sort()
+    index = pl.DataFrame({"address": addresses, "row": np.arange(len(addresses))})
+    counts = events.group_by("address", "bin").len().join(index, on="address")
+
+    vectors = np.zeros((len(addresses), 2 * bins + 4), dtype=np.float32)
+    vectors[counts["row"].to_numpy(), counts["bin"].to_numpy()] = counts["len"]
+    sent = vectors[:, :bins].sum(axis=1)
+    received = vectors[:, bins : 2 * bins].sum(axis=1)
+    vectors[:, :bins] /= np.maximum(sent, 1)[:, None]
+    vectors[:, bins : 2 * bins] /= np.maximum(received, 1)[:, None]
+
+    counterparties = index.join(
+        data.group_by(address=pl.col("from")).agg(out=pl.col("to").n_unique()),
+        on="address",
+        how="left",
+    ).join(
+        data.group_by(address=pl.col("to")).agg(incoming=pl.col("from").n_unique()),
+        on="address",
+        how="left",
+    )
+    vectors[:, 2 * bins] = np.log1p(sent)
+    vectors[:, 2 * bins + 1] = np.log1p(received)
+    vectors[:, 2 * bins + 2] = np.log1p(counterparties["out"].fill_null(0).to_numpy())
+    vectors[:, 2 * bins + 3] = np.log1p(
+        counterparties["incoming"].fill_null(0).to_numpy()
+    )
+    return addresses.to_list(), vectors
+
+
+class NumpyVectors:
+    def __init__(self):
+        """Brute force nearest neighbors in memory, the exact baseline"""
+        self.addresses: list[bytes] = []
+
+    def add_vectors(self, addresses: list[bytes], vectors: np.ndarray) -> None:
+        self.addresses = addresses
+        self.vectors = vectors
+        self.norms = (vectors**2).sum(axis=1)
+
+    def nearest(self, vector: np.ndarray, k: int) -> list[bytes]:
+        """The k addresses with the smallest L2 distance to the vector"""
+        distances = self.norms - 2 * self.vectors @ vector
+        nearest = np.argpartition(distances, min(k, len(distances)) - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest])]
+        return [self.addresses[i] for i in nearest]
+
+
+def sample_queries(
+    addresses: list[bytes], n: int = QUERY_SAMPLES, seed: int = 42
+) -> np.ndarray:
+    """Rows of n random addresses whose neighbors are searched"""
+    rng = np.random.default_rng(seed)
+    return rng.choice(len(addresses), min(n, len(addresses)), replace=False)
+
+
+def search_recall(
+    db,
+    addresses: list[bytes],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = NEIGHBORS,
+    **search_params,
+) -> dict:
+    """Recall at k against the exact neighbors and the latency of the searches
+
+    Many addresses share the same vector, so a result counts as a hit when it
+    is no farther than the exact k-th neighbor rather than being one of the
+    exact k addresses.
+    """
+    rows = {address: row for row, address in enumerate(addresses)}
+    hits = 0
+    latencies = []
+    for query in queries:
+        vector = vectors[query]
+        distances = ((vectors - vector) ** 2).sum(axis=1)
+        kth_distance = np.partition(distances, k - 1)[k - 1]
+
+        start_time = time.perf_counter()
+        result = db.nearest(vector, k, **search_params)
+        latencies.append(time.perf_counter() - start_time)
+        hits += sum(distances[rows[address]] <= kth_distance + 1e-6 for address in result)
+
+    metrics = {"recall": hits / (k * len(queries))}
+    metrics.update(latency_percentiles(latencies, "search"))
+    return metrics
+
+
+def benchmark_vector_search(
+    db,
+    addresses: list[bytes],
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    index_params: dict | None = None,
+    search_grid: list[dict] | None = None,
+    k: int = NEIGHBORS,
+) -> list[dict]:
+    """Load the vectors, optionally build an index and sweep the search parameters"""
+    search_grid = search_grid or [{}]
+    db.add_vectors(addresses, vectors)
+    build_time = 0.0
+    if index_params is not None:
+        start_time = time.perf_counter()
+        db.build_vector_index(**index_params)
+        build_time = time.perf_counter() - start_time
+
+    def describe(params: dict) -> str:
+        return ", ".join(f"{name}={value}" for name, value in params.items())
+
+    results = []
+    for search_params in search_grid:
+        metrics = {
+            "index": describe(index_params or {}),
+            "search": describe(search_params),
+            "build_time": build_time,
+        }
+        metrics.update(
+            search_recall(db, addresses, vectors, queries, k, **search_params)
+        )
+        results.append(metrics)
+    return results
+
+
+def ivf_pq_configs(n: int, dim: int) -> list[dict]:
+    """IVF-PQ indexes around the usual sqrt(n) partitions, with 4 dimensions per sub vector"""
+    partitions = max(1, int(np.sqrt(n)))
+    return [
+        {"num_partitions": max(1, partitions // 4), "num_sub_vectors": dim // 4},
+        {"num_partitions": partitions, "num_sub_vectors": dim // 4},
+        {"num_partitions": partitions * 4, "num_sub_vectors": dim // 4},
+    ]
+
+
+def lance_search_grid() -> list[dict]:
+    grid = []
+    for nprobes in NPROBES:
+        for refine_factor in REFINE_FACTORS:
+            params = {"nprobes": nprobes}
+            if refine_factor is not None:
+                params["refine_factor"] = refine_factor
+            grid.append(params)
+    return grid
@@ -0,0 +1,92 @@
+import polars as pl
+
+from crypto_data_benchmark.profilers import get_profiler
+from crypto_data_benchmark.workloads.block_scan import benchmark_scans
+from crypto_data_benchmark.workloads.point_lookup import (
+    benchmark_lookups,
+    sample_tx_hashes,
+)
+from crypto_data_benchmark.workloads.queries import (
+    address_labels,
+    benchmark_queries,
+    query_parameters,
+    reference_results,
+)
+
+# the PROFILER environment variable picks rss, tracemalloc, arrow or scalene
+profile = get_profiler()
+LOOKUP_SAMPLES = 2_000
+# without an index every lookup is a full scan, so use fewer samples
+UNINDEXED_LOOKUP_SAMPLES = 50
+
+
+def ingest_step(db, data: pl.DataFrame) -> dict:
+    metrics = profile(db.add, data)
+    metrics["disk_usage"] = db.disk_usage()
+    return metrics
+
+
+def scan_step(db, data: pl.DataFrame) -> dict:
+    return benchmark_scans(db, data)
+
+
+def lookup_step(db, data: pl.DataFrame) -> dict:
+    tx_hashes = sample_tx_hashes(data, LOOKUP_SAMPLES)
+    return benchmark_lookups(db, tx_hashes[:UNINDEXED_LOOKUP_SAMPLES], "lookup")
+
+
+def index_step(db, data: pl.DataFrame) -> dict:
+    disk_usage = db.disk_usage()
+    metrics = profile(db.build_index)
+    return {
+        "index_time": metrics["ingestion_time"],
+        # the size of a separate index, or how much a rewrite of the data
+        # changed its size, Parquet sorts its files by hash and can shrink
+        "index_disk_change": db.disk_usage() - disk_usage,
+    }
+
+
+def indexed_lookup_step(db, data: pl.DataFrame) -> dict:
+    tx_hashes = sample_tx_hashes(data, LOOKUP_SAMPLES)
+    return benchmark_lookups(db, tx_hashes, "indexed_lookup")
+
+
+def query_step(db, data: pl.DataFrame) -> dict:
+    labels = address_labels(data)
+    params = query_parameters(data)
+    db.add_labels(labels)
+    return benchmark_queries(db, params, reference_results(data, labels, params))
+
+
+# the workloads run on every provider in this order, each step sees the state
+# the previous ones left behind, samples are seeded so every step draws the same
+BENCHMARK_STEPS = [
+    ingest_step,
+    scan_step,
+    lookup_step,
+    index_step,
+    indexed_lookup_step,
+    query_step,
+]
+
+# steps that only read the data, cold isolated runs evict the page cache before
+# these and not before the steps that write, like building an index
+READ_STEPS = {scan_step, lookup_step, indexed_lookup_step, query_step}
+
+# workloads that can be selected by name, ingestion always runs first
+WORKLOADS = {
+    "ingest": [ingest_step],
+    "scan": [scan_step],
+    "lookup": [lookup_step],
+    "index": [index_step, indexed_lookup_step],
+    "query": [query_step],
+}
+
+
+def workload_steps(workloads: list[str]) -> list:
+    """The steps of the selected workloads in BENCHMARK_STEPS order"""
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        raise ValueError(f"Unknown workloads {sorted(unknown)}, use {list(WORKLOADS)}")
+    selected = {step for name in ["ingest", *workloads] for step in WORKLOADS[name]}
+    return [step for step in BENCHMARK_STEPS if step in selected]
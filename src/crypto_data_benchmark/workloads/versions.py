@@ -0,0 +1,41 @@
+import time
+
+import polars as pl
+
+from crypto_data_benchmark.workloads.appends import block_batches
+from crypto_data_benchmark.workloads.common import latency_percentiles
+
+VERSION_BLOCKS = 200
+
+
+def benchmark_versions(db, data: pl.DataFrame, blocks: int = VERSION_BLOCKS) -> dict:
+    """Append one block at a time with a snapshot after every append
+
+    Reports the snapshot latency, the bytes that keeping every version costs
+    compared to pruning them and the latency of reading the first snapshot
+    back. The provider needs snapshot, read_snapshot, delete_snapshots and
+    stored_bytes.
+    """
+    batches = block_batches(data, blocks)
+    latencies = []
+    for i, batch in enumerate(batches):
+        db.add(batch)
+        latencies.append(db.snapshot(f"append-{i}"))
+
+    metrics = latency_percentiles(latencies, "snapshot")
+    metrics["snapshots"] = len(batches)
+    metrics["versioned_bytes"] = db.stored_bytes()
+
+    first_block = batches[0]["block_number"][0]
+    start_time = time.perf_counter()
+    first = db.read_snapshot("append-0", first_block, first_block + len(batches))
+    metrics["snapshot_read_time"] = time.perf_counter() - start_time
+    # later appends must not show up in the first snapshot
+    metrics["snapshot_read_matches"] = first.height == batches[0].height
+
+    start_time = time.perf_counter()
+    db.delete_snapshots()
+    db.compact()
+    metrics["prune_time"] = time.perf_counter() - start_time
+    metrics["pruned_bytes"] = db.stored_bytes()
+    return metrics
@@ -0,0 +1,38 @@
+from collections import Counter
+from collections.abc import Iterable
+
+import polars as pl
+import pytest
+
+
+def make_transfers(blocks: Iterable[int], logs_per_block: int = 1) -> pl.DataFrame:
+    """logs_per_block transfers for every entry of blocks, in the given order
+
+    Logs are numbered within their block. The hash of the first log of a block
+    is the block number, the address alternates between two by block parity.
+    """
+    blocks = [block for block in blocks for _ in range(logs_per_block)]
+    seen = Counter()
+    log_indexes = []
+    for block in blocks:
+        log_indexes.append(seen[block])
+        seen[block] += 1
+    return pl.DataFrame(
+        {
+            "block_number": blocks,
+            "log_index": log_indexes,
+            "transaction_hash": [
+                (log_index << 64 | block).to_bytes(32, "big")
+                for block, log_index in zip(blocks, log_indexes)
+            ],
+            "address": [bytes([block % 2]) * 20 for block in blocks],
+            "value": [float(i) for i in range(len(blocks))],
+        },
+        schema_overrides={"block_number": pl.UInt64, "log_index": pl.UInt64},
+    )
+
+
+@pytest.fixture
+def transfers():
+    """Factory of small hand-sized transfer frames, see make_transfers"""
+    return make_transfers
@@ -0,0 +1,44 @@
+import pytest
+from polars.testing import assert_frame_equal
+
+pytest.importorskip("arcticdb")
+
+from crypto_data_benchmark.dbs.arcticdb_provider import ArcticDBProvider  # noqa: E402
+
+
+def test_snapshots_and_block_updates(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = ArcticDBProvider()
+    db.setup()
+    db.add(transfers([10, 10]))
+    db.snapshot("first")
+    db.add(transfers([11, 12]))
+
+    assert db.scan_block_range(10, 12)["block_number"].to_list() == [10, 10, 11]
+    assert db.read_snapshot("first", 0, 100).height == 2
+    assert db.lookup_by_tx_hash((11).to_bytes(32, "big"))["block_number"].to_list() == [11]
+
+    replacement = transfers([11, 11, 11])
+    db.replace_blocks(11, 12, replacement)
+    assert_frame_equal(db.scan_block_range(11, 12), replacement)
+
+    versioned = db.stored_bytes()
+    db.delete_snapshots()
+    db.compact()
+    assert db.stored_bytes() < versioned
+    db.teardown()
+
+
+def test_reads_schema_of_another_handle(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = ArcticDBProvider()
+    db.setup()
+    data = transfers([10, 11])
+    db.add(data)
+    db.close()
+    reader = ArcticDBProvider()
+    reader.data_dir = db.data_dir
+    reader.open()
+    assert_frame_equal(reader.scan_block_range(10, 12), data)
+    assert reader.lookup_by_tx_hash((11).to_bytes(32, "big")).height == 1
+    db.teardown()
@@ -0,0 +1,37 @@
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from crypto_data_benchmark.data.arrow_ipc import read_ipc, write_ipc
+from crypto_data_benchmark.profilers import current_rss
+from crypto_data_benchmark.workloads.common import evict_page_cache
+
+
+def test_ipc_round_trip(tmp_path):
+    data = pl.DataFrame(
+        {
+            "block_number": [1, 2, 3],
+            "transaction_hash": [b"\x01" * 32, b"\x02" * 32, b"\x03" * 32],
+            "value": [1.0, 2.5, 3.0],
+        }
+    )
+    path = write_ipc(data, tmp_path / "nested" / "data.arrow")
+    assert_frame_equal(read_ipc(path), data)
+
+
+def test_evict_page_cache_keeps_data(tmp_path):
+    data = pl.DataFrame({"block_number": range(10_000)})
+    path = write_ipc(data, tmp_path / "data.arrow")
+    evict_page_cache(tmp_path)
+    evict_page_cache(path)
+    assert_frame_equal(read_ipc(path), data)
+
+
+def test_resident_read_faults_in_the_input(tmp_path):
+    data = pl.DataFrame({"block_number": range(1_000_000)})
+    path = write_ipc(data, tmp_path / "data.arrow")
+    evict_page_cache(path)
+    mapped = read_ipc(path, resident=True)
+    start_memory = current_rss()
+    mapped["block_number"].sum()
+    # the column was resident before the sum, reading it maps no new pages
+    assert current_rss() - start_memory < path.stat().st_size // 2
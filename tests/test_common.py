@@ -0,0 +1,13 @@
+import pyarrow as pa
+import pytest
+
+from crypto_data_benchmark.dbs.common import record_batch_reader
+
+
+def test_record_batch_reader_of_empty_stream():
+    with pytest.raises(ValueError):
+        record_batch_reader(iter([]))
+    schema = pa.schema({"block_number": pa.uint64()})
+    assert record_batch_reader([], schema).read_all().num_rows == 0
+    batch = pa.record_batch({"block_number": pa.array([1], pa.uint64())})
+    assert record_batch_reader(iter([batch])).read_all().num_rows == 1
@@ -0,0 +1,135 @@
+import pyarrow as pa
+import pytest
+
+from crypto_data_benchmark.data.hypersync_loader import (
+    TRANSFER_SIGNATURE,
+    download_events,
+    float_fields,
+    read_checkpoint,
+    read_events,
+)
+
+USDT = bytes.fromhex("dac17f958d2ee523a2206206994597c13d831ec7")
+USDC = bytes.fromhex("a0b86991c6218b36c1d19d4a2e9eb0ce3606eb48")
+
+
+class Data:
+    def __init__(self, logs: pa.Table, decoded_logs: pa.Table):
+        self.logs = logs
+        self.decoded_logs = decoded_logs
+
+
+class Response:
+    def __init__(self, start: int, end: int):
+        """Two transfers per block, alternating between two contracts"""
+        blocks = [block for block in range(start, end) for _ in range(2)]
+        self.next_block = end
+        self.data = Data(
+            pa.table(
+                {
+                    "block_number": pa.array(blocks, pa.uint64()),
+                    "log_index": pa.array([0, 1] * (end - start), pa.uint64()),
+                    "address": [USDT, USDC] * (end - start),
+                }
+            ),
+            pa.table(
+                {
+                    "from": [b"\x01" * 20] * len(blocks),
+                    "to": [b"\x02" * 20] * len(blocks),
+                    "value": [float(block) for block in blocks],
+                }
+            ),
+        )
+
+
+class FakeStream:
+    def __init__(self, responses: list, fail_after: int | None):
+        self.responses = responses
+        self.fail_after = fail_after
+        self.closed = False
+
+    async def recv(self):
+        if self.fail_after == 0:
+            raise ConnectionError("stream dropped")
+        if self.fail_after is not None:
+            self.fail_after -= 1
+        return self.responses.pop(0) if self.responses else None
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    def __init__(self, blocks_per_response: int = 10, fail_after: int | None = None):
+        """Serves any block range in fixed size responses like a Hypersync server"""
+        self.blocks_per_response = blocks_per_response
+        self.fail_after = fail_after
+        self.queries = []
+        self.streams = []
+
+    async def stream_arrow(self, query, config):
+        self.queries.append(query)
+        step = self.blocks_per_response
+        responses = [
+            Response(start, min(start + step, query.to_block))
+            for start in range(query.from_block, query.to_block, step)
+        ]
+        self.streams.append(FakeStream(responses, self.fail_after))
+        return self.streams[-1]
+
+
+def test_float_fields():
+    assert float_fields(TRANSFER_SIGNATURE) == ["value"]
+    assert float_fields("Swap(uint256 indexed a, address b, uint256 c)") == ["a", "c"]
+
+
+def test_streams_to_partitioned_parquet(tmp_path):
+    client = FakeClient()
+    rows = download_events(100, 125, output_dir=tmp_path, client=client)
+
+    assert rows == 50
+    files = sorted(path.relative_to(tmp_path) for path in tmp_path.rglob("*.parquet"))
+    # one file per response and contract
+    assert len(files) == 6
+    assert files[0].parts == (
+        "Transfer",
+        f"address={USDC.hex()}",
+        "0000000100-0000000110.parquet",
+    )
+    data = read_events(output_dir=tmp_path).collect()
+    assert data.height == 50
+    assert data["value"].sum() == 2 * sum(range(100, 125))
+    assert read_checkpoint(tmp_path) == {TRANSFER_SIGNATURE: 125}
+    assert client.streams[0].closed
+
+
+def test_resumes_from_checkpoint(tmp_path):
+    with pytest.raises(ConnectionError):
+        client = FakeClient(fail_after=2)
+        download_events(100, 150, output_dir=tmp_path, client=client)
+    assert read_checkpoint(tmp_path) == {TRANSFER_SIGNATURE: 120}
+
+    client = FakeClient(blocks_per_response=7)
+    rows = download_events(100, 150, output_dir=tmp_path, client=client)
+
+    assert client.queries[0].from_block == 120
+    assert rows == 60
+    data = read_events(output_dir=tmp_path).collect()
+    assert data.height == 100
+    assert data.select("block_number", "log_index").is_duplicated().sum() == 0
+
+    # a finished download doesn't query again
+    assert download_events(100, 150, output_dir=tmp_path, client=client) == 0
+    assert len(client.queries) == 1
+
+
+def test_removes_files_of_uncommitted_responses(tmp_path):
+    download_events(100, 120, output_dir=tmp_path, client=FakeClient())
+    # left behind by a run that died before its checkpoint, with other boundaries
+    stray = tmp_path / "Transfer" / f"address={USDT.hex()}" / "0000000120-0000000125.parquet"
+    stray.write_bytes(b"partial")
+
+    download_events(100, 130, output_dir=tmp_path, client=FakeClient())
+
+    assert not stray.exists()
+    assert read_events(output_dir=tmp_path).collect().height == 60
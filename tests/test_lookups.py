@@ -0,0 +1,39 @@
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from crypto_data_benchmark.data.synthetic import synthetic_transfer_batches
+from crypto_data_benchmark.dbs.registry import load_provider, providers
+
+
+@pytest.fixture(scope="module")
+def logs() -> pl.DataFrame:
+    batches = synthetic_transfer_batches(2_000, batch_size=1_000, addresses=100)
+    return pl.from_arrow(pa.Table.from_batches(batches))
+
+
+@pytest.mark.parametrize("name", sorted(providers()))
+def test_lookup_before_and_after_build_index(name, logs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    try:
+        provider = load_provider(name)
+    except ImportError as e:
+        pytest.skip(f"{name} is not installed: {e}")
+    tx_hash = logs["transaction_hash"][1_234]
+    expected = logs.filter(pl.col("transaction_hash") == tx_hash)
+
+    def check_lookups() -> None:
+        rows = db.lookup_by_tx_hash(tx_hash)
+        assert sorted(rows["log_index"]) == sorted(expected["log_index"])
+        assert (rows["block_number"] == expected["block_number"][0]).all()
+        assert db.lookup_by_tx_hash(bytes(32)).height == 0
+
+    db = provider()
+    db.setup()
+    try:
+        db.add(logs)
+        check_lookups()
+        db.build_index()
+        check_lookups()
+    finally:
+        db.teardown()
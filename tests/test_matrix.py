@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from crypto_data_benchmark.dbs import registry
+from crypto_data_benchmark.dbs.registry import (
+    installed_providers,
+    provider_factory,
+    providers,
+)
+from crypto_data_benchmark.matrix import load_config, matrix_cells
+from crypto_data_benchmark.scheduler import cpu_sets
+from crypto_data_benchmark.workloads.steps import workload_steps
+
+
+def test_registry_finds_complete_providers_only():
+    found = providers()
+    assert {"duckdb", "parquet", "polars", "sqlite", "tiledb"} <= set(found)
+    factory = provider_factory({"name": "sqlite", "native": True})
+    assert factory.keywords == {"native": True}
+    with pytest.raises(ValueError):
+        provider_factory("nosuchdb")
+
+
+def test_installed_providers_skip_missing_engines(monkeypatch, capsys):
+    found = dict(providers())
+    found["missing"] = ("crypto_data_benchmark.dbs.missing_provider", "Missing")
+    monkeypatch.setattr(registry, "providers", lambda: found)
+    factories = installed_providers(["missing", "duckdb"])
+    assert [factory.__name__ for factory in factories] == ["DuckDBProvider"]
+    assert "Skipping missing" in capsys.readouterr().out
+
+
+def test_load_config_overrides(tmp_path):
+    path = tmp_path / "matrix.toml"
+    path.write_text('providers = ["duckdb"]\nscales = [1, 2]\n')
+    config = load_config(path, scales=[3], jobs=None)
+    assert config["providers"] == ["duckdb"]
+    assert config["scales"] == [3]
+    assert config["jobs"] == 1
+
+    path.write_text("scale = 1\n")
+    with pytest.raises(ValueError):
+        load_config(path)
+
+
+def test_matrix_cells_have_their_own_folders(tmp_path):
+    config = load_config(
+        providers=["duckdb", {"name": "sqlite", "native": True}],
+        scales=[1],
+        repetitions=2,
+        work_dir=str(tmp_path),
+    )
+    cells = matrix_cells(config, {1: tmp_path / "data.arrow"})
+    assert len(cells) == 2 * 2 * 2
+    assert len({cell["work_dir"] for cell in cells}) == len(cells)
+    assert [cell["repetition"] for cell in cells] == [0] * 4 + [1] * 4
+
+
+def test_workload_steps():
+    names = [step.__name__ for step in workload_steps(["query", "index"])]
+    assert names == ["ingest_step", "index_step", "indexed_lookup_step", "query_step"]
+    with pytest.raises(ValueError):
+        workload_steps(["nosuchworkload"])
+
+
+def test_cpu_sets_are_disjoint():
+    sets = cpu_sets(jobs=len(os.sched_getaffinity(0)))
+    assert sum(len(cpus) for cpus in sets) == len(set().union(*sets))
+    assert cpu_sets(jobs=1) == [os.sched_getaffinity(0)]
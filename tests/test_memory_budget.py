@@ -0,0 +1,48 @@
+from crypto_data_benchmark.dbs.duckdb_provider import DuckDBProvider
+from crypto_data_benchmark.dbs.parquet_provider import ParquetProvider
+from crypto_data_benchmark.dbs.polars_provider import PolarsProvider
+from crypto_data_benchmark.workloads.memory_budget import (
+    ADDRESS_SPACE_LIMIT,
+    ENGINE_LIMIT,
+    budget_limit,
+    directory_size,
+)
+
+
+def test_directory_size(tmp_path):
+    assert directory_size(tmp_path / "missing") == 0
+    (tmp_path / "spill").mkdir()
+    (tmp_path / "spill" / "part").write_bytes(b"x" * 10_000)
+    assert directory_size(tmp_path) >= 10_000
+
+
+def test_duckdb_memory_limit(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = DuckDBProvider()
+    db.setup()
+    db.add(transfers(range(100)))
+    db.limit_memory(64 * 2**20)
+    settings = db.conn.sql(
+        "SELECT current_setting('memory_limit'), current_setting('temp_directory')"
+    ).fetchone()
+    assert settings == ("64.0 MiB", str(db.spill_dir))
+    assert db.scan_block_range(10, 20).height == 10
+    db.teardown()
+
+
+def test_parquet_streaming_engine(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = ParquetProvider()
+    db.setup()
+    db.add(transfers(range(100)))
+    db.limit_memory(64 * 2**20)
+    assert db.polars_engine == "streaming"
+    assert db.scan_block_range(10, 20)["block_number"].to_list() == list(range(10, 20))
+    db.teardown()
+
+
+def test_address_space_limit_only_without_engine_limit():
+    assert budget_limit(DuckDBProvider()) == ENGINE_LIMIT
+    assert budget_limit(PolarsProvider()) == ADDRESS_SPACE_LIMIT
+    # the streaming engine is no cap, RLIMIT_AS still applies
+    assert budget_limit(ParquetProvider()) == ADDRESS_SPACE_LIMIT
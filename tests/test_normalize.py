@@ -0,0 +1,85 @@
+import decimal
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from crypto_data_benchmark.data.normalize import VALUE_LIMBS, normalize
+from crypto_data_benchmark.data.synthetic import synthetic_transfer_batches
+from crypto_data_benchmark.dbs.sqlite_provider import SQLiteProvider
+from crypto_data_benchmark.workloads.queries import results_match
+
+
+@pytest.fixture
+def logs() -> pl.DataFrame:
+    batches = synthetic_transfer_batches(2_000, batch_size=1_000, addresses=100)
+    return pl.from_arrow(pa.Table.from_batches(batches))
+
+
+def test_drops_redundant_columns_and_keeps_exact_value(logs):
+    normalized = normalize(logs)
+
+    assert "topic1" not in normalized.columns
+    assert "topic2" not in normalized.columns
+    assert "data" not in normalized.columns
+    assert normalized.schema["value"] == pl.Decimal(38, 0)
+    assert (normalized["value"].cast(pl.Float64) == logs["value"]).all()
+    unchanged = logs.drop("topic1", "topic2", "data", "value")
+    assert normalized.drop("value").equals(unchanged)
+
+
+def test_limbs(logs):
+    normalized = normalize(logs, "limbs")
+
+    assert normalized.select(VALUE_LIMBS[:3]).sum().row(0) == (0, 0, 0)
+    assert (normalized["value_3"].cast(pl.Float64) == logs["value"]).all()
+    assert normalized["value"].equals(logs["value"])
+
+
+def test_decodes_hex_strings(logs):
+    as_hex = logs.with_columns(
+        pl.concat_str(pl.lit("0x"), pl.col(column).bin.encode("hex")).alias(column)
+        for column in ["transaction_hash", "from", "to", "topic1", "data"]
+    )
+    assert normalize(as_hex).equals(normalize(logs))
+
+
+def test_keeps_topics_that_differ(logs):
+    logs = logs.with_columns(topic2=pl.col("topic1"))
+    normalized = normalize(logs)
+    assert "topic2" in normalized.columns
+    assert "topic1" not in normalized.columns
+
+
+def test_rejects_wrong_widths(logs):
+    with pytest.raises(ValueError, match="transaction_hash"):
+        normalize(logs.with_columns(pl.col("transaction_hash").bin.slice(0, 20)))
+
+
+def test_rejects_values_beyond_decimal(logs):
+    huge = logs.with_columns(pl.lit(b"\x01" * 32).alias("data"))
+    with pytest.raises(ValueError, match="limbs"):
+        normalize(huge)
+    assert normalize(huge, "limbs")["value_0"][0] == int.from_bytes(b"\x01" * 8, "big")
+
+
+def test_sqlite_keeps_large_decimals_exact(logs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    value = decimal.Decimal(2**63 + 12345)
+    data = normalize(logs).head(1).with_columns(
+        value=pl.lit(value, pl.Decimal(38, 0))
+    )
+    db = SQLiteProvider(native=True)
+    db.setup()
+    db.add(data)
+    stored = db.query_sql("SELECT value, typeof(value) FROM transfers").row(0)
+    assert stored == (str(value), "text")
+    db.teardown()
+
+
+def test_results_match_compares_decimals_exactly():
+    expected = pl.DataFrame(
+        {"volume": [2**63 + 12345]}, schema={"volume": pl.Decimal(38, 0)}
+    )
+    assert results_match(expected.cast(pl.String), expected)
+    assert not results_match(expected.cast(pl.Float64), expected)
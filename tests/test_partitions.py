@@ -0,0 +1,50 @@
+import os
+
+import polars as pl
+import pyarrow as pa
+import pytest
+
+from crypto_data_benchmark.data.synthetic import synthetic_transfer_batches
+from crypto_data_benchmark.dbs.common import rows_per_file
+from crypto_data_benchmark.dbs.deltalake_provider import DeltaLakeProvider
+from crypto_data_benchmark.dbs.parquet_provider import ParquetProvider
+
+
+@pytest.fixture(scope="module")
+def logs() -> pl.DataFrame:
+    batches = synthetic_transfer_batches(20_000, batch_size=10_000, addresses=100)
+    return pl.from_arrow(pa.Table.from_batches(batches))
+
+
+def test_rows_per_file_uses_the_compressed_size(logs):
+    in_memory = int(2**20 / (logs.estimated_size() / logs.height))
+    assert rows_per_file(logs, 2**20, {"compression": "zstd"}) > 2 * in_memory
+
+
+@pytest.mark.parametrize("provider", [ParquetProvider, DeltaLakeProvider])
+@pytest.mark.parametrize("partition_by", ["block", "address"])
+def test_partitioned_round_trip(provider, partition_by, logs, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = provider(partition_by=partition_by, bucket_size=100, writers=2)
+    db.setup()
+    try:
+        db.add(logs)
+        start, end = logs["block_number"].min(), logs["block_number"].max() + 1
+        rows = db.scan_block_range(start, end)
+        key = ["transaction_hash", "log_index"]
+        assert rows.select(logs.columns).sort(key).equals(logs.sort(key))
+        address = logs["address"][0]
+        expected = logs.filter(pl.col("address") == address)
+        assert db.scan_block_range(start, end, address).height == expected.height
+    finally:
+        db.teardown()
+
+
+@pytest.mark.parametrize("provider", [ParquetProvider, DeltaLakeProvider])
+def test_writers_follow_the_cpu_affinity(provider):
+    affinity = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, {min(affinity)})
+    try:
+        assert provider(partition_by="block").writers == 1
+    finally:
+        os.sched_setaffinity(0, affinity)
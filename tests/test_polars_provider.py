@@ -0,0 +1,45 @@
+import pytest
+
+from crypto_data_benchmark.dbs.polars_provider import PolarsProvider
+
+
+@pytest.mark.parametrize("sorted_by_block", [False, True])
+def test_lookup_and_block_range(sorted_by_block, transfers):
+    db = PolarsProvider(sorted_by_block=sorted_by_block)
+    db.setup()
+    # two chunks with the blocks out of order
+    db.add(transfers(range(50, 100)))
+    db.add(transfers(range(50)))
+    tx_hash = (7).to_bytes(32, "big")
+    assert db.lookup_by_tx_hash(tx_hash)["block_number"].to_list() == [7]
+    assert db.data.n_chunks() == 1
+    db.build_index()
+    assert db.lookup_by_tx_hash(tx_hash)["block_number"].to_list() == [7]
+    assert db.lookup_by_tx_hash(b"missing").height == 0
+    blocks = db.scan_block_range(45, 55)["block_number"].sort().to_list()
+    assert blocks == list(range(45, 55))
+    rows = db.scan_block_range(45, 55, address=bytes(20))
+    assert rows["block_number"].sort().to_list() == list(range(46, 55, 2))
+    db.teardown()
+
+
+def test_replace_blocks_rebuilds_the_indexes(transfers):
+    db = PolarsProvider()
+    db.setup()
+    db.add(transfers(range(100)))
+    db.build_index()
+    db.replace_blocks(10, 20, transfers([10, 11]))
+    assert db.scan_block_range(0, 100).height == 92
+    assert db.lookup_by_tx_hash((15).to_bytes(32, "big")).height == 0
+    assert db.lookup_by_tx_hash((11).to_bytes(32, "big")).height == 1
+    db.teardown()
+
+
+def test_add_merges_at_ingestion(transfers):
+    db = PolarsProvider()
+    db.setup()
+    db.add_batches(transfers(range(100)).to_arrow().to_batches(10))
+    assert db.chunks == []
+    assert db.data.n_chunks() == 1
+    assert db.block_order is not None
+    db.teardown()
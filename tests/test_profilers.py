@@ -0,0 +1,58 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from crypto_data_benchmark.profilers import (
+    PROFILERS,
+    get_profiler,
+    profile_arrow,
+    profile_rss,
+    profile_tracemalloc,
+)
+
+MB = 1024 * 1024
+
+
+def allocate_numpy(size: int):
+    # touch every page so the allocation shows up in the RSS
+    array = np.ones(size // 8, dtype=np.float64)
+    return float(array.sum())
+
+
+def allocate_python(size: int):
+    chunks = [bytearray(MB) for _ in range(size // MB)]
+    return sum(len(chunk) for chunk in chunks)
+
+
+def allocate_arrow(size: int):
+    array = pa.array(np.arange(size // 8, dtype=np.int64))
+    return pc.sum(pc.add(array, 1)).as_py()
+
+
+def test_rss_sees_native_allocations():
+    metrics = profile_rss(allocate_numpy, 200 * MB)
+    assert 150 * MB < metrics["peak_memory"] < 400 * MB
+    assert metrics["memory_delta"] < 100 * MB
+    assert metrics["ingestion_time"] > 0
+    assert metrics["cpu_time"] > 0
+
+
+def test_tracemalloc_sees_python_allocations():
+    metrics = profile_tracemalloc(allocate_python, 100 * MB)
+    assert 90 * MB < metrics["peak_memory"] < 150 * MB
+    assert metrics["memory_delta"] < 10 * MB
+
+
+def test_arrow_sees_memory_pool_allocations():
+    metrics = profile_arrow(allocate_arrow, 80 * MB)
+    # the input is zero copy from numpy, the result of add is allocated by Arrow
+    assert 70 * MB < metrics["peak_memory"] < 200 * MB
+
+
+def test_get_profiler(monkeypatch):
+    monkeypatch.setenv("PROFILER", "tracemalloc")
+    assert get_profiler() is PROFILERS["tracemalloc"]
+    assert get_profiler("arrow") is profile_arrow
+    with pytest.raises(ValueError):
+        get_profiler("valgrind")
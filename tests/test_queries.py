@@ -0,0 +1,10 @@
+import polars as pl
+
+from crypto_data_benchmark.workloads.queries import address_labels
+
+
+def test_address_labels_of_few_receivers():
+    data = pl.DataFrame({"to": [bytes([i % 7]) * 20 for i in range(100)]})
+    labels = address_labels(data)
+    assert labels.height == 7
+    assert labels["address"].is_unique().all()
@@ -0,0 +1,44 @@
+import math
+
+import pytest
+
+from crypto_data_benchmark.dbs.clickhouse_provider import ClickHouseProvider
+from crypto_data_benchmark.dbs.deltalake_provider import DeltaLakeProvider
+from crypto_data_benchmark.dbs.duckdb_provider import DuckDBProvider
+from crypto_data_benchmark.dbs.parquet_provider import ParquetProvider
+from crypto_data_benchmark.dbs.sqlite_provider import SQLiteProvider
+from crypto_data_benchmark.workloads.reorgs import benchmark_reorgs
+
+
+@pytest.mark.parametrize(
+    "provider",
+    [
+        ParquetProvider,
+        DeltaLakeProvider,
+        DuckDBProvider,
+        lambda: SQLiteProvider(native=True),
+        # no mutations, replace_blocks rewrites the table
+        lambda: ClickHouseProvider(engine="Log"),
+        lambda: ParquetProvider(partition_by="block", bucket_size=10, writers=1),
+    ],
+)
+def test_reorgs_leave_the_canonical_blocks(provider, transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = provider()
+    db.setup()
+    metrics = benchmark_reorgs(db, transfers(range(100, 140), 4), reorgs=6, depth=3)
+    db.teardown()
+
+    assert metrics["reorg_matches"]
+
+
+@pytest.mark.parametrize("reorgs", [0, 1])
+def test_too_few_reorgs_for_both_kinds(reorgs, transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = DuckDBProvider()
+    db.setup()
+    metrics = benchmark_reorgs(db, transfers(range(100, 140), 4), reorgs=reorgs, depth=3)
+    db.teardown()
+
+    assert metrics["reorg_matches"]
+    assert math.isnan(metrics["delete_p50"])
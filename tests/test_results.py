@@ -0,0 +1,66 @@
+import polars as pl
+
+from crypto_data_benchmark.results import (
+    compare_runs,
+    dataset_fingerprint,
+    load_runs,
+    result_records,
+    save_run,
+)
+
+
+def trial(ingestion_time: float, rows_per_s: float) -> list[dict]:
+    return [
+        {
+            "name": "duckdb",
+            "ingestion_time": ingestion_time,
+            "scan_medium_rows_per_s": rows_per_s,
+            "scan_medium_bytes_read": None,
+            "index": "ivf_pq",
+        }
+    ]
+
+
+def test_records_keep_numeric_metrics_per_case():
+    records = result_records(
+        [[{"name": "duckdb", "clients": 4, "ops_per_s": 10, "ok": True, "mode": "x"}]],
+        ("name", "clients"),
+    )
+    assert records.to_dicts() == [
+        {"case": "duckdb, 4", "trial": 0, "metric": "ops_per_s", "value": 10.0},
+        {"case": "duckdb, 4", "trial": 0, "metric": "ok", "value": 1.0},
+    ]
+
+
+def test_saved_runs_flag_regressions_beyond_the_noise(tmp_path):
+    data = pl.DataFrame({"block_number": range(10)})
+    for trials in [
+        [trial(1.0, 100.0), trial(1.1, 104.0), trial(0.9, 96.0)],
+        # slower ingestion, scans within the noise
+        [trial(2.0, 101.0), trial(2.2, 97.0), trial(1.8, 103.0)],
+    ]:
+        fingerprint = dataset_fingerprint(data)
+        save_run("providers", trials, dataset=fingerprint, results_dir=tmp_path)
+
+    runs = load_runs(tmp_path)
+    assert runs["dataset"].n_unique() == 1
+    baseline, candidate = runs.partition_by("run_id", maintain_order=True)
+    comparison = compare_runs(baseline, candidate, threshold=0.1)
+
+    status = dict(zip(comparison["metric"], comparison["status"]))
+    assert status == {"ingestion_time": "regression", "scan_medium_rows_per_s": ""}
+    # lower throughput is a regression too
+    reverse = compare_runs(candidate, baseline.with_columns(pl.col("value") / 2))
+    assert dict(zip(reverse["metric"], reverse["status"])) == {
+        "ingestion_time": "improvement",
+        "scan_medium_rows_per_s": "regression",
+    }
+
+
+def test_single_trials_are_not_flagged():
+    baseline = result_records([trial(1.0, 100.0)], ("name",))
+    candidate = result_records([trial(2.0, 101.0)], ("name",))
+    comparison = compare_runs(baseline, candidate, threshold=0.1)
+    status = dict(zip(comparison["metric"], comparison["status"]))
+    assert status == {"ingestion_time": "no interval", "scan_medium_rows_per_s": ""}
+    assert comparison["change_low"].is_null().all()
@@ -0,0 +1,67 @@
+import polars as pl
+import pytest
+
+from crypto_data_benchmark.results import case_frame, result_records
+from crypto_data_benchmark.scaling import (
+    fit_complexity,
+    parallel_efficiency,
+    scaling_curves,
+)
+
+
+def synthetic_results() -> list[dict]:
+    """A linear engine that uses every thread and a quadratic one that uses one"""
+    results = []
+    for scale in [1, 10, 100]:
+        for threads in [1, 4]:
+            results.append(
+                {
+                    "name": "linear",
+                    "scale": scale,
+                    "threads": threads,
+                    "ingestion_time": scale / threads,
+                    "scan_medium_rows_per_s": 1e6 * threads,
+                    "disk_usage": 1e6 * scale,
+                }
+            )
+            results.append(
+                {
+                    "name": "quadratic",
+                    "scale": scale,
+                    "threads": threads,
+                    "ingestion_time": float(scale**2),
+                    "scan_medium_rows_per_s": 1e6,
+                    "disk_usage": 1e6 * scale,
+                }
+            )
+    return results
+
+
+def test_fit_complexity():
+    fits = fit_complexity(scaling_curves(pl.DataFrame(synthetic_results())))
+    exponents = {
+        (name, metric): exponent
+        for name, metric, exponent in fits.filter(threads=4)
+        .select("name", "metric", "exponent")
+        .iter_rows()
+    }
+    assert exponents[("linear", "ingestion_time")] == pytest.approx(1)
+    assert exponents[("quadratic", "ingestion_time")] == pytest.approx(2)
+    # throughputs are fitted as time per row, constant for both engines
+    assert exponents[("linear", "scan_medium_rows_per_s")] == pytest.approx(0)
+    assert ("linear", "disk_usage") not in exponents
+    tipping = fits.filter(name="quadratic", metric="ingestion_time")["tipping_scale"]
+    assert tipping.to_list() == [10, 10]
+
+
+def test_parallel_efficiency_of_a_saved_run():
+    records = result_records([synthetic_results()], ("name", "scale", "threads"))
+    results = case_frame(records, ("name", "scale", "threads")).with_columns(
+        pl.col("scale", "threads").cast(pl.Int64)
+    )
+    efficiency = parallel_efficiency(scaling_curves(results)).filter(
+        scale=100, threads=4, metric="ingestion_time"
+    )
+    by_name = dict(efficiency.select("name", "efficiency").iter_rows())
+    assert by_name["linear"] == pytest.approx(1)
+    assert by_name["quadratic"] == pytest.approx(0.25)
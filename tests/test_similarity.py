@@ -0,0 +1,49 @@
+import numpy as np
+import polars as pl
+
+from crypto_data_benchmark.workloads.similarity import (
+    NumpyVectors,
+    address_features,
+    benchmark_vector_search,
+    sample_queries,
+)
+
+
+def test_address_features_histograms_are_shares():
+    a, b, c = b"\x0a" * 20, b"\x0b" * 20, b"\x0c" * 20
+    data = pl.DataFrame(
+        {"from": [a, a, b], "to": [b, c, c], "value": [5.0, 5_000.0, 50.0]}
+    )
+    addresses, vectors = address_features(data, bins=4)
+
+    assert addresses == [a, b, c]
+    assert vectors.shape == (3, 12)
+    assert vectors.dtype == np.float32
+    # a sent one transfer of magnitude 0 and one clipped to the top bin
+    assert vectors[0, :4].tolist() == [0.5, 0.0, 0.0, 0.5]
+    assert vectors[0, 4:8].sum() == 0
+    # c only received, from two counterparties
+    assert vectors[2, 4:8].tolist() == [0.0, 0.5, 0.0, 0.5]
+    assert vectors[2, 11] == np.float32(np.log1p(2))
+
+
+def test_exact_search_has_full_recall():
+    rng = np.random.default_rng(0)
+    vectors = rng.random((500, 8), dtype=np.float32)
+    addresses = [i.to_bytes(20, "big") for i in range(500)]
+    queries = sample_queries(addresses, 20)
+
+    [metrics] = benchmark_vector_search(NumpyVectors(), addresses, vectors, queries)
+
+    assert metrics["recall"] == 1.0
+    assert metrics["build_time"] == 0.0
+
+
+def test_nearest_with_no_more_addresses_than_k():
+    vectors = np.array([[0.0, 0.0], [3.0, 0.0], [1.0, 0.0]], dtype=np.float32)
+    addresses = [b"a", b"b", b"c"]
+    db = NumpyVectors()
+    db.add_vectors(addresses, vectors)
+
+    assert db.nearest(vectors[0], 3) == [b"a", b"c", b"b"]
+    assert db.nearest(vectors[0], 10) == [b"a", b"c", b"b"]
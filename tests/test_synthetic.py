@@ -0,0 +1,47 @@
+import polars as pl
+import pyarrow as pa
+
+from crypto_data_benchmark.data.synthetic import (
+    SCHEMA,
+    TRANSFER_TOPIC0,
+    synthetic_transfer_batches,
+)
+
+
+def generate(rows: int, seed: int = 42) -> pl.DataFrame:
+    batches = synthetic_transfer_batches(rows, seed, batch_size=10_000, addresses=1_000)
+    return pl.from_arrow(pa.Table.from_batches(batches, schema=SCHEMA))
+
+
+def test_row_count_and_schema():
+    data = generate(25_000)
+    assert data.height == 25_000
+    assert data.to_arrow().schema == SCHEMA
+    assert data["block_number"].is_sorted()
+
+
+def test_deterministic_given_seed():
+    assert generate(5_000).equals(generate(5_000))
+    assert not generate(5_000).equals(generate(5_000, seed=7))
+
+
+def test_logs_are_consistent():
+    data = generate(10_000)
+    assert data["topic0"].unique().to_list() == [TRANSFER_TOPIC0]
+    assert (data["topic1"].bin.slice(12) == data["from"]).all()
+    assert (data["topic2"].bin.slice(12) == data["to"]).all()
+    # data holds the value as a big endian uint256
+    values = data["data"].bin.slice(24).bin.reinterpret(dtype=pl.UInt64, endianness="big")
+    assert (values.cast(pl.Float64) == data["value"]).all()
+    # one block hash per block and increasing log indexes within a block
+    per_block = data.group_by("block_number").agg(
+        pl.col("block_hash").n_unique(), pl.col("log_index").diff().min()
+    )
+    assert (per_block["block_hash"] == 1).all()
+    assert (per_block["log_index"].drop_nulls() > 0).all()
+
+
+def test_address_popularity_is_skewed():
+    counts = generate(20_000)["from"].value_counts(sort=True)["count"]
+    # the most popular sender makes far more transfers than a typical one
+    assert counts[0] > 20 * counts.median()
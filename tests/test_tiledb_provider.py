@@ -0,0 +1,63 @@
+import decimal
+
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from crypto_data_benchmark.dbs.tiledb_provider import TileDBProvider
+
+
+def nullable_transfers(transfers) -> pl.DataFrame:
+    """Blocks out of order and a column of every kind TileDB stores as nullable"""
+    return transfers([11, 10, 10, 12]).with_columns(
+        removed=pl.Series([False, False, True, False]),
+        topic3=pl.Series([None, None, None, None], dtype=pl.Binary),
+        # the first write fixes which attributes are nullable
+        data=pl.Series([b"\x00" * 31 + b"\x05", None, b"", b"\x07"]),
+        value=pl.Series([5.0, None, 0.0, 7.0]),
+    )
+
+
+def test_round_trip_and_lookups(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = nullable_transfers(transfers)
+    db = TileDBProvider(batch_size=3)
+    db.setup()
+    db.add(data)
+
+    stored = db.scan_block_range(0, 100)
+    assert stored.schema == data.schema
+    assert_frame_equal(stored, data.sort("block_number", "log_index"))
+    rows = db.scan_block_range(10, 12, address=b"\x01" * 20)
+    assert rows["block_number"].to_list() == [11]
+    assert db.scan_region(10, 12, 0, 1)["block_number"].to_list() == [10, 11]
+
+    tx_hash = (11).to_bytes(32, "big")
+    unindexed = db.lookup_by_tx_hash(tx_hash)
+    db.build_index()
+    # rows added after the index was built are indexed as well
+    db.add(data.head(1).with_columns(block_number=pl.lit(20, pl.UInt64)))
+    indexed = db.lookup_by_tx_hash(tx_hash)
+    assert unindexed["block_number"].to_list() == [11]
+    assert indexed["block_number"].to_list() == [11, 20]
+    assert db.lookup_by_tx_hash(b"\x09" * 32).height == 0
+    db.teardown()
+
+
+def test_decimals_and_labels(transfers, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data = nullable_transfers(transfers).with_columns(
+        value=pl.Series(
+            [decimal.Decimal(2**100), None, decimal.Decimal(0), decimal.Decimal(7)],
+            dtype=pl.Decimal(38, 0),
+        )
+    )
+    labels = pl.DataFrame({"address": [b"\x01" * 20], "label": ["exchange"]})
+    db = TileDBProvider()
+    db.setup()
+    db.add(data)
+    db.add_labels(labels)
+    db.compact()
+
+    assert_frame_equal(db.scan_block_range(0, 100), data.sort("block_number", "log_index"))
+    assert_frame_equal(db.lazy_labels().collect(), labels)
+    db.teardown()
@@ -0,0 +1,37 @@
+import pyarrow as pa
+
+from crypto_data_benchmark.data.usdt_transfers import replica_batch
+
+
+def test_replica_batch_shifts_blocks_and_hashes():
+    batch = pa.record_batch(
+        {
+            "block_number": pa.array([10, 11], pa.uint64()),
+            "transaction_hash": pa.array([b"\xaa" * 32, b"\xbb" * 32], pa.large_binary()),
+            "block_hash": pa.array([b"\xcc" * 32, b"\xdd" * 32], pa.large_binary()),
+            "value": pa.array([1.0, 2.0]),
+        }
+    )
+    replica = replica_batch(batch, 3, 100)
+
+    assert replica.schema == batch.schema
+    assert replica["block_number"].to_pylist() == [310, 311]
+    assert replica["transaction_hash"].to_pylist() == [
+        b"\x00\x00\x00\x03" + b"\xaa" * 28,
+        b"\x00\x00\x00\x03" + b"\xbb" * 28,
+    ]
+    assert replica["block_hash"][0].as_py() == b"\x00\x00\x00\x03" + b"\xcc" * 28
+    assert replica["value"] == batch["value"]
+
+
+def test_replica_batch_of_no_rows():
+    batch = pa.record_batch(
+        {
+            "block_number": pa.array([], pa.uint64()),
+            "transaction_hash": pa.array([], pa.large_binary()),
+            "block_hash": pa.array([], pa.large_binary()),
+        }
+    )
+    replica = replica_batch(batch, 3, 100)
+    assert replica.num_rows == 0
+    assert replica.schema == batch.schema